@@ -1,7 +1,41 @@
 from django.contrib import admin
 from .models import ShoppingCart, ShoppingCartItem
 
-# Register your models here.
-admin.site.register(ShoppingCart)
-admin.site.register(ShoppingCartItem)
+# Variation and user foreign keys use autocomplete widgets, and changelists skip the
+# unfiltered COUNT(*), so the pages stay fast on carts and catalogs of millions of rows.
 
+# The related rows ShoppingCartItem.__str__ reads.
+ITEM_RELATED = ['product_variation__product_item__product', 'product_variation__product_item__colour', 'product_variation__size']
+
+class ShoppingCartItemInline(admin.TabularInline):
+    """
+    Lists a cart's items with editable quantities. Items are added from the cart item
+    admin: a variation widget per row would look its variation up once per row.
+    """
+    model = ShoppingCartItem
+    extra = 0
+    fields = ['product_variation', 'qty']
+    readonly_fields = ['product_variation']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(*ITEM_RELATED)
+
+@admin.register(ShoppingCart)
+class ShoppingCartAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'created_at', 'updated_at']
+    list_select_related = ['user']
+    search_fields = ['user__email', '=session_key']
+    autocomplete_fields = ['user']
+    inlines = [ShoppingCartItemInline]
+    show_full_result_count = False
+
+@admin.register(ShoppingCartItem)
+class ShoppingCartItemAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'cart', 'qty']
+    list_select_related = ['cart__user', *ITEM_RELATED]
+    search_fields = ['product_variation__product_item__sku_base', 'cart__user__email']
+    autocomplete_fields = ['cart', 'product_variation']
+    show_full_result_count = False
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:38
+
+from django.conf import settings
+from django.db import migrations, models
+from eCommerce.db_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ('cart', '0003_shoppingcart_session_key_alter_shoppingcart_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='shoppingcart',
+            index=models.Index(fields=['updated_at'], name='cart_updated_at_idx'),
+        ),
+    ]
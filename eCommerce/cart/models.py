@@ -17,6 +17,12 @@ class ShoppingCart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Finding abandoned carts by last activity.
+            models.Index(fields=['updated_at'], name='cart_updated_at_idx'),
+        ]
+
     def __str__(self):
         if self.user:
             return f"Cart for {self.user.email}"
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from product.images import CART_IMAGE_WIDTH, image_srcset, image_url
 from .models import ShoppingCart, ShoppingCartItem
 
 class CartItemReadSerializer(serializers.ModelSerializer):
@@ -12,25 +13,31 @@ class CartItemReadSerializer(serializers.ModelSerializer):
     size = serializers.CharField(source='product_variation.size.size_name')
     price = serializers.DecimalField(source='product_variation.product_item.price', max_digits=10, decimal_places=2)
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     subtotal = serializers.DecimalField(max_digits=10, decimal_places=2)
 
     class Meta:
         model = ShoppingCartItem
         fields = ['id', 'product_variation', 'qty', 'product_name', 'product_brand',
-                  'colour', 'size', 'price', 'image', 'subtotal']
+                  'colour', 'size', 'price', 'image', 'image_srcset', 'subtotal']
 
-    def get_image(self, obj):
-        # Fetch the default image for this specific color variant
+    def _default_image(self, obj):
+        # Fetch the default image for this specific color variant.
+        # Iterating .all() uses the images prefetched by the cart views instead of a query per item.
         item = obj.product_variation.product_item
-        default_image = item.images.filter(is_default=True).first()
+        return next((img for img in item.images.all() if img.is_default), None)
+
+    def get_image(self, obj):
+        default_image = self._default_image(obj)
         if default_image:
-            # Return absolute URL if request context is available
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(default_image.image_filename.url)
-            return default_image.image_filename.url
+            # The cart thumbnail rendition once it exists; absolute if request context is available
+            return image_url(default_image, CART_IMAGE_WIDTH, self.context.get('request'))
         return None
 
+    def get_image_srcset(self, obj):
+        default_image = self._default_image(obj)
+        return image_srcset(default_image, self.context.get('request')) if default_image else None
+
 class CartItemWriteSerializer(serializers.ModelSerializer):
     """
     Write serializer for adding/updating items.
@@ -0,0 +1,50 @@
+import uuid
+
+from django.contrib.sessions.backends.signed_cookies import SessionStore as SignedCookieSession
+
+# Session entry holding the guest cart identifier (ShoppingCart.session_key).
+CART_SESSION_KEY = 'cart_key'
+
+def get_guest_cart_key(request, create=False):
+    """
+    Returns the guest cart identifier stored in the session, creating one if asked to.
+
+    The identifier lives inside the session data instead of reusing the session key,
+    because signed-cookie sessions have no stable key. Creating it only modifies the
+    session, so with the cache engine no database work is needed at all. Sessions from
+    before the identifier was stored have their cart under the session key, so that is
+    used (and stored, when creating) instead of a new identifier.
+    """
+    cart_key = request.session.get(CART_SESSION_KEY)
+    if cart_key is None:
+        cart_key = _session_cart_key(request.session)
+        if create:
+            cart_key = cart_key or uuid.uuid4().hex
+            request.session[CART_SESSION_KEY] = cart_key
+    return cart_key
+
+async def aget_guest_cart_key(request, create=False):
+    """Async version of get_guest_cart_key, using the async session API."""
+    cart_key = await request.session.aget(CART_SESSION_KEY)
+    if cart_key is None:
+        cart_key = _session_cart_key(request.session)
+        if create:
+            cart_key = cart_key or uuid.uuid4().hex
+            await request.session.aset(CART_SESSION_KEY, cart_key)
+    return cart_key
+
+def _session_cart_key(session):
+    """
+    Returns the session key older guest carts were stored under, if this session can have one.
+
+    Only engines with server-side storage have a short, stable key. A signed-cookie session's
+    key is the whole cookie, which changes on every write and does not fit the cart column.
+    """
+    from .models import ShoppingCart
+
+    key = session.session_key
+    if key is None or isinstance(session, SignedCookieSession):
+        return None
+    if len(key) > ShoppingCart._meta.get_field('session_key').max_length:
+        return None
+    return key
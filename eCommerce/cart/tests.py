@@ -1,9 +1,20 @@
+import json
+from importlib import import_module
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.test import AsyncRequestFactory, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from perf.testing import QueryBudgetMixin
 from users.models import SiteUser
 from product.models import Product, ProductCategory, Brand, Colour, SizeOption, ProductItem, ProductVariation
-from .models import ShoppingCart
+from .models import ShoppingCart, ShoppingCartItem
+from .session import CART_SESSION_KEY
+from .views import AsyncCartView
 
 class CartAPITests(APITestCase):
     """
@@ -49,7 +60,7 @@ class CartAPITests(APITestCase):
         self.assertEqual(response.data['items'][0]['product_name'], 'Test T-Shirt')
         
         # Verify a cart was created with a session key
-        self.assertTrue(ShoppingCart.objects.filter(session_key=self.client.session.session_key, user=None).exists())
+        self.assertTrue(ShoppingCart.objects.filter(session_key=self.client.session[CART_SESSION_KEY], user=None).exists())
 
     def test_guest_cart_is_persistent_across_requests(self):
         """Test that a guest's cart persists across multiple requests using the same client."""
@@ -145,3 +156,194 @@ class CartAPITests(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('Not enough stock. Only 10 items available.', str(response.data))
+
+    def test_cart_with_many_items_has_no_n_plus_one(self):
+        """Viewing a cart does not query per item (the SQL instrumentation would raise)."""
+        self.client.force_authenticate(user=self.user)
+        product_item = self.variation_m.product_item
+        for index in range(6):
+            variation = ProductVariation.objects.create(product_item=product_item, size=SizeOption.objects.create(size_name=f'X{index}'), qty_in_stock=5)
+            self.client.post(reverse('cart-list'), {'product_variation': variation.id, 'qty': 1}, format='json')
+
+        response = self.client.get(reverse('cart-list'))
+        self.assertEqual(len(response.data['items']), 6)
+
+    # --- Session Engines ---
+
+    def test_guest_cart_works_with_every_session_engine(self):
+        """Guest carts persist, and merge on login, whichever session engine is configured."""
+        url = reverse('cart-list')
+        for mode, engine in settings.SESSION_ENGINES.items():
+            with self.subTest(mode=mode), override_settings(SESSION_ENGINE=engine):
+                ShoppingCart.objects.all().delete()
+                guest = APIClient()
+                guest.post(url, {'product_variation': self.variation_m.id, 'qty': 1}, format='json')
+                response = guest.post(url, {'product_variation': self.variation_l.id, 'qty': 1}, format='json')
+                self.assertEqual(len(response.data['items']), 2)
+
+                login_data = {'email': self.user.email, 'password': 'password123'}
+                self.assertEqual(guest.post(reverse('token_obtain_pair'), login_data, format='json').status_code, status.HTTP_200_OK)
+                self.assertEqual(ShoppingCart.objects.get().user, self.user)
+
+class AsyncCartViewTests(APITestCase):
+    """
+    AsyncCartView must return the same cart payload as CartViewSet.list.
+    """
+    # Same users and products as the sync tests.
+    setUp = CartAPITests.setUp
+
+    def async_get(self, session=None, token=None):
+        """Runs AsyncCartView.get to completion and returns (status_code, decoded JSON)."""
+        headers = {'Authorization': f'Bearer {token}'} if token else None
+        request = AsyncRequestFactory().get(reverse('cart-list'), headers=headers)
+        request.session = session if session is not None else import_module(settings.SESSION_ENGINE).SessionStore()
+        response = async_to_sync(AsyncCartView.as_view())(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_guest_cart_matches_sync_view(self):
+        """A guest sees the items added through the sync API, keyed by their session."""
+        url = reverse('cart-list')
+        self.client.post(url, {'product_variation': self.variation_m.id, 'qty': 2}, format='json')
+        expected = self.client.get(url).json()
+
+        status_code, data = self.async_get(session=self.client.session)
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(data, expected)
+
+    def test_new_guest_gets_empty_cart(self):
+        """A first visit creates an empty guest cart and stores its key in the session."""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        status_code, data = self.async_get(session=session)
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(data['items'], [])
+        self.assertEqual(data['session_key'], session[CART_SESSION_KEY])
+
+    def test_session_keyed_cart_is_adopted(self):
+        """A cart stored under the session key, before the cart key was kept in the session, is still found."""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session.save()
+        cart = ShoppingCart.objects.create(session_key=session.session_key)
+        ShoppingCartItem.objects.create(cart=cart, product_variation=self.variation_m, qty=3)
+
+        status_code, data = self.async_get(session=session)
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual([item['qty'] for item in data['items']], [3])
+        self.assertEqual(session[CART_SESSION_KEY], cart.session_key)
+
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        response = self.client.get(reverse('cart-list'))
+        self.assertEqual(response.data['id'], cart.id)
+        self.assertEqual(ShoppingCart.objects.count(), 1)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_session_gets_own_cart_key(self):
+        """The signed cookie is far longer than the cart column, so it is never used as the cart key."""
+        url = reverse('cart-list')
+        self.client.post(url, {'product_variation': self.variation_m.id, 'qty': 2}, format='json')
+        cart_key = self.client.session[CART_SESSION_KEY]
+        self.assertEqual(len(cart_key), 32)
+        self.assertEqual([item['qty'] for item in self.client.get(url).data['items']], [2])
+
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session['unrelated'] = 'x' * 100
+        session.save()
+        status_code, data = self.async_get(session=session)
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(data['session_key'], session[CART_SESSION_KEY])
+        self.assertEqual(len(session[CART_SESSION_KEY]), 32)
+
+    def test_authenticated_cart_matches_sync_view(self):
+        """A JWT-authenticated user sees their own cart."""
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse('cart-list'), {'product_variation': self.variation_l.id, 'qty': 1}, format='json')
+        expected = self.client.get(reverse('cart-list')).json()
+
+        status_code, data = self.async_get(token=AccessToken.for_user(self.user))
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(data, expected)
+
+    def test_invalid_token_is_rejected(self):
+        """An invalid bearer token is a 401, as with the sync view."""
+        status_code, data = self.async_get(token='not-a-token')
+        self.assertEqual(status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('detail', data['errors'])
+
+class CartQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """
+    Every CartViewSet action runs a fixed number of queries however many items the cart holds.
+    """
+    def setUp(self):
+        self.user = SiteUser.objects.create_user(username='testuser', email='test@example.com', password='password123', is_active=True)
+        category = ProductCategory.objects.create(name='Apparel')
+        product = Product.objects.create(name='Test T-Shirt', category=category, brand=Brand.objects.create(name='TestBrand'))
+        self.product_item = ProductItem.objects.create(product=product, colour=Colour.objects.create(colour_name='Green'), sku_base='TEST-SHIRT-GREEN', original_price=25.00)
+        self.extra_variation = ProductVariation.objects.create(product_item=self.product_item, size=SizeOption.objects.create(size_name='Extra'), qty_in_stock=10)
+        self.client.force_authenticate(user=self.user)
+
+    def populate_cart(self, size):
+        """Gives the user a cart with `size` items and returns the first one."""
+        sizes = SizeOption.objects.bulk_create(SizeOption(size_name=f'S{index}') for index in range(size))
+        variations = ProductVariation.objects.bulk_create(ProductVariation(product_item=self.product_item, size=size_option, qty_in_stock=10) for size_option in sizes)
+        cart = ShoppingCart.objects.create(user=self.user)
+        items = ShoppingCartItem.objects.bulk_create(ShoppingCartItem(cart=cart, product_variation=variation, qty=1) for variation in variations)
+        return items[0]
+
+    def test_list(self):
+        self.assertQueryBudget(3, self.populate_cart, lambda _: self.client.get(reverse('cart-list')))
+
+    def test_create_new_item(self):
+        data = {'product_variation': self.extra_variation.id, 'qty': 1}
+        self.assertQueryBudget(8, self.populate_cart, lambda _: self.client.post(reverse('cart-list'), data, format='json'), status_code=201)
+
+    def test_create_existing_item(self):
+        self.assertQueryBudget(
+            6, self.populate_cart,
+            lambda item: self.client.post(reverse('cart-list'), {'product_variation': item.product_variation_id, 'qty': 1}, format='json'),
+        )
+
+    def test_partial_update(self):
+        self.assertQueryBudget(
+            5, self.populate_cart,
+            lambda item: self.client.patch(reverse('cart-detail', kwargs={'pk': item.id}), {'qty': 2}, format='json'),
+        )
+
+    def test_destroy(self):
+        self.assertQueryBudget(
+            3, self.populate_cart,
+            lambda item: self.client.delete(reverse('cart-detail', kwargs={'pk': item.id})),
+            status_code=204,
+        )
+
+    def test_guest_list(self):
+        """A guest's cart is found through the session."""
+        def populate_guest_cart(size):
+            item = self.populate_cart(size)
+            item.cart.user = None
+            item.cart.session_key = 'guest-cart-key'
+            item.cart.save()
+            # A new session each run: the previous run's session row was rolled back.
+            session = import_module(settings.SESSION_ENGINE).SessionStore()
+            session[CART_SESSION_KEY] = 'guest-cart-key'
+            session.save()
+            self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+        self.client.force_authenticate(user=None)
+        self.assertQueryBudget(4, populate_guest_cart, lambda _: self.client.get(reverse('cart-list')))
+
+    def test_admin_pages(self):
+        """Cart admin changelists and the cart page with its items run a fixed number of queries."""
+        self.client.force_login(SiteUser.objects.create_superuser(email='admin@example.com', username='admin', password='pw'))
+        ContentType.objects.get_for_models(ShoppingCart, ShoppingCartItem)  # Cached for both runs
+
+        def populate_carts(size):
+            users = SiteUser.objects.bulk_create(SiteUser(email=f'shopper{index}@example.com', username=f'shopper{index}') for index in range(size))
+            ShoppingCart.objects.bulk_create(ShoppingCart(user=user) for user in users)
+            return self.populate_cart(size)
+
+        for page, budget, request in [
+            ('cart changelist', 4, lambda _: self.client.get(reverse('admin:cart_shoppingcart_changelist'))),
+            ('cart change', 6, lambda item: self.client.get(reverse('admin:cart_shoppingcart_change', args=[item.cart_id]))),
+            ('item changelist', 4, lambda _: self.client.get(reverse('admin:cart_shoppingcartitem_changelist'))),
+        ]:
+            with self.subTest(page=page):
+                self.assertQueryBudget(budget, populate_carts, request)
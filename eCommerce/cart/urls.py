@@ -1,12 +1,20 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CartViewSet
+from .views import AsyncCartView, CartViewSet
 
 # A router is used to automatically generate the URLs for a ViewSet.
 # This will create endpoints for list, create, retrieve, update, and destroy actions.
 router = DefaultRouter()
 router.register(r'', CartViewSet, basename='cart')
 
-urlpatterns = [
+urlpatterns = []
+
+# Serve cart reads from the async view when running under ASGI.
+# It must come before the router so it takes over the list URL.
+if settings.ASYNC_VIEWS:
+    urlpatterns.append(path('', AsyncCartView.as_view(), name='cart-list'))
+
+urlpatterns += [
     path('', include(router.urls)),
 ]
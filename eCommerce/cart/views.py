@@ -1,8 +1,28 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch, aprefetch_related_objects, prefetch_related_objects
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import viewsets, status, serializers
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from rest_framework_simplejwt.exceptions import InvalidToken
 from .models import ShoppingCart, ShoppingCartItem
 from .serializers import ShoppingCartSerializer, CartItemWriteSerializer
+from .session import aget_guest_cart_key, get_guest_cart_key
+from eCommerce.authentication import AsyncJWTAuthentication
+from eCommerce.throttling import CartWriteRateThrottle
+
+# Everything ShoppingCartSerializer reads, loaded in three queries for the whole cart.
+CART_PREFETCH = [
+    Prefetch('items', queryset=ShoppingCartItem.objects.select_related(
+        'product_variation__product_item__product__brand',
+        'product_variation__product_item__colour',
+        'product_variation__size',
+    ).order_by('id')),
+    'items__product_variation__product_item__images',
+]
 
 def get_cart(request):
     """
@@ -11,13 +31,15 @@ def get_cart(request):
     if request.user.is_authenticated:
         cart, _ = ShoppingCart.objects.get_or_create(user=request.user)
     else:
-        session_key = request.session.session_key
-        if not session_key:
-            request.session.create()
-            session_key = request.session.session_key
-        cart, _ = ShoppingCart.objects.get_or_create(session_key=session_key, user=None)
+        cart_key = get_guest_cart_key(request, create=True)
+        cart, _ = ShoppingCart.objects.get_or_create(session_key=cart_key, user=None)
     return cart
 
+def serialize_cart(cart, request):
+    """Serializes a cart with all of its items' related rows prefetched."""
+    prefetch_related_objects([cart], *CART_PREFETCH)
+    return ShoppingCartSerializer(cart, context={'request': request}).data
+
 class CartViewSet(viewsets.ViewSet):
     """
     A ViewSet for viewing, adding, updating, and removing items from a shopping cart.
@@ -27,14 +49,14 @@ class CartViewSet(viewsets.ViewSet):
     - `destroy`: Removes a specific item from the cart.
     """
     permission_classes = [AllowAny]
+    throttle_classes = [CartWriteRateThrottle]
 
     def list(self, request):
         """
         Retrieves the current user's shopping cart.
         """
         cart = get_cart(request)
-        serializer = ShoppingCartSerializer(cart, context={'request': request})
-        return Response(serializer.data)
+        return Response(serialize_cart(cart, request))
 
     def create(self, request):
         """
@@ -64,8 +86,7 @@ class CartViewSet(viewsets.ViewSet):
         #         f"Not enough stock. Only {product_variation.qty_in_stock} items available."
         #     )
         
-        cart_serializer = ShoppingCartSerializer(cart, context={'request': request})
-        return Response(cart_serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+        return Response(serialize_cart(cart, request), status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
     def partial_update(self, request, pk=None):
         """
@@ -81,8 +102,7 @@ class CartViewSet(viewsets.ViewSet):
         serializer.is_valid(raise_exception=True)
         serializer.save()
         
-        cart_serializer = ShoppingCartSerializer(cart, context={'request': request})
-        return Response(cart_serializer.data)
+        return Response(serialize_cart(cart, request))
 
     def destroy(self, request, pk=None):
         """
@@ -96,3 +116,38 @@ class CartViewSet(viewsets.ViewSet):
         
         cart_item.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+# --- Async variant (served when ASYNC_VIEWS is enabled, e.g. under ASGI) ---
+
+_sync_cart_list_view = CartViewSet.as_view({'get': 'list', 'post': 'create'})
+
+class AsyncCartView(View):
+    """
+    Async variant of CartViewSet.list: the session, cart and items are read with
+    the async session and ORM APIs. Adding items (POST) is delegated to the sync viewset.
+    """
+    authenticator = AsyncJWTAuthentication()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Like DRF views, rely on JWT rather than CSRF cookies.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def get(self, request):
+        try:
+            user = await self.authenticator.aauthenticate(request)
+        except (InvalidToken, AuthenticationFailed) as exc:
+            detail = exc.detail.get('detail', exc.detail) if isinstance(exc.detail, dict) else exc.detail
+            return JsonResponse({'errors': {'detail': str(detail)}}, status=401)
+
+        if user.is_authenticated:
+            cart, _ = await ShoppingCart.objects.aget_or_create(user=user)
+        else:
+            cart_key = await aget_guest_cart_key(request, create=True)
+            cart, _ = await ShoppingCart.objects.aget_or_create(session_key=cart_key, user=None)
+
+        await aprefetch_related_objects([cart], *CART_PREFETCH)
+        return JsonResponse(ShoppingCartSerializer(cart, context={'request': request}).data)
+
+    async def post(self, request):
+        return await sync_to_async(_sync_cart_list_view)(request)
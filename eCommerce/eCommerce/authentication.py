@@ -0,0 +1,23 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication usable from plain Django async views.
+    Token parsing and validation are CPU-only; only the user lookup touches the
+    database and it runs off the event loop, with all of simplejwt's user checks.
+    """
+    async def aauthenticate(self, request):
+        """
+        Returns the authenticated user, or AnonymousUser when no token is sent.
+        Raises InvalidToken / AuthenticationFailed like the sync authenticate().
+        """
+        header = self.get_header(request)
+        if header is None:
+            return AnonymousUser()
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return AnonymousUser()
+        validated_token = self.get_validated_token(raw_token)
+        return await sync_to_async(self.get_user)(validated_token)
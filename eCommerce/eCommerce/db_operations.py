@@ -0,0 +1,24 @@
+"""
+Migration operations shared by the apps.
+"""
+from django.contrib.postgres.operations import AddIndexConcurrently as PostgresAddIndexConcurrently
+from django.db.migrations import AddIndex
+
+class AddIndexConcurrently(PostgresAddIndexConcurrently):
+    """
+    Adds an index with CREATE INDEX CONCURRENTLY on PostgreSQL, so indexing a large table
+    does not block writes to it while the index builds; other databases (SQLite in
+    development and tests) get a plain CREATE INDEX. Migrations using it must set
+    `atomic = False`.
+    """
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
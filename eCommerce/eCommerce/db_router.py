@@ -0,0 +1,159 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+Reads of the catalog apps (settings.DATABASE_REPLICA_APPS) go to a healthy replica from
+settings.DATABASE_REPLICAS. Everything else goes to `default`, and so does every read that
+must see a recent write:
+  - any read during an unsafe (POST/PUT/PATCH/DELETE) request,
+  - any read for a client that wrote within DB_REPLICA_STICKY_SECONDS,
+  - any read inside a transaction on the primary, which may depend on its own writes,
+  - any read inside pin_to_primary(), for tasks and commands that read what they just wrote.
+Clients are identified by their Authorization header or their session, and their pins are
+kept in the shared cache so they hold across workers.
+"""
+import hashlib
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+
+# Process-local replica health: {alias: (healthy, checked_at)}
+_replica_health = {}
+
+@contextmanager
+def pin_to_primary():
+    """Routes every read in the block to the primary database."""
+    token = _pinned_to_primary.set(True)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+def replica_is_healthy(alias):
+    """
+    Returns whether a replica accepted a connection, re-checking at most once every
+    DB_REPLICA_HEALTH_CHECK_INTERVAL seconds per process. Replica connections time out
+    after DB_REPLICA_CONNECT_TIMEOUT seconds (see settings), which bounds the check.
+    """
+    now = time.monotonic()
+    healthy, checked_at = _replica_health.get(alias, (None, 0.0))
+    if healthy is not None and now - checked_at < settings.DB_REPLICA_HEALTH_CHECK_INTERVAL:
+        return healthy
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        healthy = True
+    except Exception:
+        logger.warning("Read replica %s is unavailable; reading from the primary.", alias, exc_info=True)
+        connections[alias].close()
+        healthy = False
+    _replica_health[alias] = (healthy, now)
+    return healthy
+
+class ReplicaRouter:
+    """Sends catalog reads to replicas and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        # Related lookups from an instance stay on the database the instance came from.
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if model._meta.app_label not in settings.DATABASE_REPLICA_APPS or _pinned_to_primary.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if replica_is_healthy(alias)]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary, so objects from any of them may be related.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # No opinion: `migrate` targets `default`, and replicas receive schema changes through replication.
+        return None
+
+class ReplicaStickinessMiddleware:
+    """
+    Pins a request's reads to the primary when it writes, or when its client wrote
+    within the last DB_REPLICA_STICKY_SECONDS, and records the pin after each write.
+    Must come after SessionMiddleware. Sync and async capable, so ASGI requests stay on
+    the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        keys = self._client_keys(request)
+        pinned = request.method in UNSAFE_METHODS or (bool(keys) and bool(cache.get_many(keys)))
+        token = _pinned_to_primary.set(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned_to_primary.reset(token)
+
+        if self._wrote(request, response):
+            keys = self._client_keys(request)  # A guest's first write may have created the session
+            if keys:
+                cache.set_many(dict.fromkeys(keys, True), timeout=settings.DB_REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        keys = self._client_keys(request)  # No session is modified yet, so this touches no database
+        pinned = request.method in UNSAFE_METHODS or (bool(keys) and bool(await cache.aget_many(keys)))
+        token = _pinned_to_primary.set(pinned)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned_to_primary.reset(token)
+
+        if self._wrote(request, response):
+            keys = await sync_to_async(self._client_keys)(request)  # May save a new session
+            if keys:
+                await cache.aset_many(dict.fromkeys(keys, True), timeout=settings.DB_REPLICA_STICKY_SECONDS)
+        return response
+
+    def _wrote(self, request, response):
+        return request.method in UNSAFE_METHODS and response.status_code < 400
+
+    def _client_keys(self, request):
+        """Cache keys for each identity of the client (its token and/or session)."""
+        keys = []
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if authorization:
+            keys.append('db:pin:auth:' + hashlib.sha256(authorization.encode()).hexdigest())
+        session = getattr(request, 'session', None)
+        if session is not None and session.session_key is None and session.modified:
+            # A guest's first write creates the session; save it now to learn its key.
+            session.save()
+        if session is not None and session.session_key:
+            keys.append(f'db:pin:session:{session.session_key}')
+        return keys
@@ -70,7 +70,9 @@ def custom_exception_handler(exc, context):
         # If DRF provided a response, we use its status code but format the data.
         # This catches other generic DRF errors.
         error_payload["errors"] = {'detail': response.data.get('detail', 'An error occurred.')}
-        return Response(error_payload, status=response.status_code)
+        # Keep headers clients rely on, e.g. Retry-After on 429 Too Many Requests.
+        headers = {'Retry-After': response['Retry-After']} if response.has_header('Retry-After') else None
+        return Response(error_payload, status=response.status_code, headers=headers)
 
     # For all other unhandled exceptions, this is a 500 server error.
     # Log the full exception traceback for debugging purposes.
@@ -0,0 +1,166 @@
+"""
+Serving MEDIA_ROOT files in production.
+
+Behind nginx, MEDIA_PUBLIC_DIRS are served straight from disk with the same cache
+headers as below (see the README), so only staff-only files reach this view there.
+serve_media() checks that a file may be served and leaves the transfer to the front
+proxy when MEDIA_ACCEL is set: nginx reads the file named in X-Accel-Redirect (an
+`internal` location aliasing MEDIA_ROOT), Apache and lighttpd the one in X-Sendfile.
+The proxy then streams it with sendfile() and handles range requests itself, so no
+worker is tied up by large or slow downloads. Without MEDIA_ACCEL the file is sent by
+Django, answering single byte-range requests.
+
+Image renditions have a content hash in their name (see product/images.py) and never
+change, so they are cached for a year as immutable; other files for MEDIA_CACHE_SECONDS. Every response has an ETag and Last-Modified, and
+conditional requests get 304 without reading the file.
+"""
+import mimetypes
+import os
+import re
+import stat
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .streaming import aiterate
+
+# Content-hashed file names, as written by product/images.py: "<16 hex digits>-<width>w".
+HASHED_NAME = re.compile(r'[0-9a-f]{16}-\d+w')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+RANGE_BLOCK_SIZE = 64 * 1024
+
+def is_public(path):
+    """Files under MEDIA_PUBLIC_DIRS are served to anyone; the rest only to staff."""
+    return any(path.startswith(f'{directory.strip("/")}/') for directory in settings.MEDIA_PUBLIC_DIRS)
+
+def is_staff(request):
+    """Staff signed in to the admin (session) or sending an API access token (JWT)."""
+    if request.user.is_staff:
+        return True
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:  # Also covers simplejwt's InvalidToken
+        return False
+    return bool(authenticated and authenticated[0].is_staff)
+
+def parse_range(header, size):
+    """
+    Returns the (first, last) byte positions of a single `bytes=` range, or None to send
+    the whole file (no header, several ranges, or one that does not parse, which the
+    HTTP spec says to ignore). Raises ValueError if the range starts past the end.
+    """
+    match = re.fullmatch(r'\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*', header or '')
+    if not match or match.group(1) == match.group(2) == '' or size == 0:
+        return None
+    first, last = match.groups()
+    if first == '':
+        # A suffix range: the last N bytes.
+        if int(last) == 0:
+            raise ValueError(header)
+        return max(size - int(last), 0), size - 1
+    first, last = int(first), min(int(last), size - 1) if last else size - 1
+    if first >= size:
+        raise ValueError(header)
+    if last < first:
+        return None
+    return first, last
+
+def _read_range(file, first, last):
+    """Yields bytes first..last of an open file, closing it at the end."""
+    with file:
+        file.seek(first)
+        remaining = last - first + 1
+        while remaining > 0 and (block := file.read(min(RANGE_BLOCK_SIZE, remaining))):
+            remaining -= len(block)
+            yield block
+
+def _range_applies(request, etag, last_modified):
+    """If-Range: only honour the range if the client's copy is still current."""
+    condition = request.headers.get('If-Range')
+    if not condition:
+        return True
+    if condition.startswith('"'):
+        return condition == etag
+    return parse_http_date_safe(condition) == last_modified
+
+@require_safe
+def serve_media(request, path):
+    """Serves MEDIA_ROOT/<path> (see the module docstring)."""
+    try:
+        fullpath = Path(safe_join(settings.MEDIA_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404()
+    # Checked on the normalised path, so "products/../private.pdf" is not public.
+    path = Path(os.path.relpath(fullpath, settings.MEDIA_ROOT)).as_posix()
+    if not is_public(path) and not is_staff(request):
+        raise Http404()
+    try:
+        status = fullpath.stat()
+    except OSError:
+        raise Http404()
+    if not stat.S_ISREG(status.st_mode):
+        raise Http404()
+
+    etag = f'"{status.st_mtime_ns:x}-{status.st_size:x}"'
+    last_modified = int(status.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, path, fullpath, status.st_size, etag, last_modified)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if not is_public(path):
+        patch_cache_control(response, private=True, no_cache=True)
+    elif HASHED_NAME.fullmatch(fullpath.stem):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_SECONDS)
+    return response
+
+def _file_response(request, path, fullpath, size, etag, last_modified):
+    content_type, encoding = mimetypes.guess_type(fullpath.name)
+    content_type = content_type or 'application/octet-stream'
+
+    if settings.MEDIA_ACCEL:
+        # The proxy sends the body (and handles Range), keeping the headers set here.
+        response = HttpResponse(content_type=content_type)
+        if settings.MEDIA_ACCEL == 'nginx':
+            response['X-Accel-Redirect'] = quote(f"{settings.MEDIA_ACCEL_PREFIX.rstrip('/')}/{path}")
+        elif settings.MEDIA_ACCEL == 'sendfile':
+            response['X-Sendfile'] = str(fullpath)
+        else:
+            raise ValueError(f"Unknown MEDIA_ACCEL {settings.MEDIA_ACCEL!r}; expected nginx or sendfile.")
+    else:
+        byte_range = None
+        if _range_applies(request, etag, last_modified):
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+        if byte_range is None and not isinstance(request, ASGIRequest):
+            # Sent with the server's file wrapper (os.sendfile under gunicorn) when it has one.
+            response = FileResponse(fullpath.open('rb'), content_type=content_type)
+        else:
+            first, last = byte_range or (0, size - 1)
+            content = _read_range(fullpath.open('rb'), first, last)
+            if isinstance(request, ASGIRequest):
+                content = aiterate(content)  # Django would otherwise read the whole file into memory
+            response = StreamingHttpResponse(content, content_type=content_type)
+            response['Content-Length'] = last - first + 1
+            if byte_range:
+                response.status_code = 206
+                response['Content-Range'] = f'bytes {first}-{last}/{size}'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -1,6 +1,7 @@
 """
 Django settings for eCommerce project.
 """
+import sys
 import environ
 from pathlib import Path
 from datetime import timedelta
@@ -22,6 +23,7 @@ if env.bool('DEBUG', default=False):
 # Security settings
 SECRET_KEY = env('SECRET_KEY')
 DEBUG = env.bool('DEBUG', default=False)
+TESTING = sys.argv[1:2] == ['test']
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', default=['localhost', '127.0.0.1'])
 
 # Application definition
@@ -46,12 +48,16 @@ INSTALLED_APPS = [
     'users',
     'product',
     'cart',
+    'perf',
 ]
 
 MIDDLEWARE = [
+    'healthcheck.middleware.PrometheusMiddleware',  # Outermost, so latency covers the whole request
+    'perf.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'eCommerce.db_router.ReplicaStickinessMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -83,12 +89,69 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'eCommerce.wsgi.application'
+ASGI_APPLICATION = 'eCommerce.asgi.application'
+
+# --- Server mode ---
+#   wsgi - sync gunicorn workers running eCommerce.wsgi (default)
+#   asgi - gunicorn with uvicorn workers running eCommerce.asgi
+# ASYNC_VIEWS swaps the hot read endpoints (product list/detail, cart) for their async
+# variants. It defaults to on under ASGI, where sync views would run in a thread pool.
+SERVER_MODE = env('SERVER_MODE', default='wsgi')
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=SERVER_MODE == 'asgi')
 
 # --- Database ---
 # Build the DB URL from individual environment variables for security and flexibility.
 DB_URL = env.str('DB_URL', default=f"postgres://{env('DB_USER')}:{env('DB_PASSWORD')}@{env('DB_HOST')}:{env('DB_PORT')}/{env('DB_NAME')}")
 DATABASES = {'default': env.db_url_config(DB_URL)}
 
+# --- Read replicas ---
+# Comma-separated replica URLs, added as replica_1, replica_2, ... Catalog reads (the apps in
+# DATABASE_REPLICA_APPS) go to a healthy replica; everything else, every write, and every read
+# made for a client within DB_REPLICA_STICKY_SECONDS of its last write, uses `default`.
+# In tests each replica mirrors `default`.
+DB_REPLICA_URLS = env.list('DB_REPLICA_URLS', default=[])
+# Seconds before a connection to an unreachable PostgreSQL replica gives up (libpq's minimum is 2),
+# so its health check cannot hold up a request for the OS's TCP timeout.
+DB_REPLICA_CONNECT_TIMEOUT = env.int('DB_REPLICA_CONNECT_TIMEOUT', default=2)
+DATABASE_REPLICAS = []
+for index, replica_url in enumerate(DB_REPLICA_URLS, start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {**env.db_url_config(replica_url), 'TEST': {'MIRROR': 'default'}}
+    if DATABASES[alias]['ENGINE'] == 'django.db.backends.postgresql':
+        DATABASES[alias].setdefault('OPTIONS', {}).setdefault('connect_timeout', DB_REPLICA_CONNECT_TIMEOUT)
+    DATABASE_REPLICAS.append(alias)
+DATABASE_REPLICA_APPS = ['product']
+DATABASE_ROUTERS = ['eCommerce.db_router.ReplicaRouter']
+DB_REPLICA_STICKY_SECONDS = env.int('DB_REPLICA_STICKY_SECONDS', default=10)
+DB_REPLICA_HEALTH_CHECK_INTERVAL = env.float('DB_REPLICA_HEALTH_CHECK_INTERVAL', default=5.0)  # seconds between replica checks
+
+# Connection reuse. By default each worker keeps its connections open for DB_CONN_MAX_AGE
+# seconds and checks they are still alive before reusing them. With DB_POOL_ENABLED (PostgreSQL
+# only) each worker instead keeps a psycopg connection pool per database, which replaces persistent connections.
+# Under ASGI the ORM runs in executor threads that Django's per-request connection cleanup does
+# not reach, so persistent connections pile up until the database's connection limit is hit (see
+# Django's ASGI deployment notes). Without the pool, SERVER_MODE=asgi therefore closes connections
+# after each use (CONN_MAX_AGE=0) and ignores DB_CONN_MAX_AGE.
+DB_POOL_ENABLED = env.bool('DB_POOL_ENABLED', default=False)
+for database in DATABASES.values():
+    if DB_POOL_ENABLED and database['ENGINE'] == 'django.db.backends.postgresql':
+        from psycopg_pool import ConnectionPool
+
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+            'max_size': env.int('DB_POOL_MAX_SIZE', default=10),
+            'max_lifetime': env.float('DB_POOL_MAX_LIFETIME', default=1800.0),  # seconds
+            'max_idle': env.float('DB_POOL_MAX_IDLE', default=300.0),  # seconds
+            'timeout': env.float('DB_POOL_TIMEOUT', default=10.0),  # seconds to wait for a free connection
+            'check': ConnectionPool.check_connection,  # health check on checkout
+        }
+    elif SERVER_MODE == 'asgi':
+        database['CONN_MAX_AGE'] = 0
+    else:
+        database['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=60)
+        database['CONN_HEALTH_CHECKS'] = True
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -109,6 +172,18 @@ STATIC_ROOT = PROJECT_ROOT / 'staticfiles' # Collect static files at the project
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = PROJECT_ROOT / 'media' # Store user-uploaded media at the project root
+# Widths (px) of the resized copies rendered in the background for every product image (see product/images.py).
+IMAGE_RENDITION_WIDTHS = env.list('IMAGE_RENDITION_WIDTHS', cast=int, default=[160, 320, 640])
+# Media is served by eCommerce/media.py. With MEDIA_ACCEL the proxy sends the file:
+#   nginx    - X-Accel-Redirect to MEDIA_ACCEL_PREFIX + path (an `internal` location aliasing MEDIA_ROOT)
+#   sendfile - X-Sendfile with the absolute path (Apache mod_xsendfile, lighttpd)
+# Empty (default) streams the file from Django. Files outside MEDIA_PUBLIC_DIRS are staff-only
+# (admin session or JWT access token); in production nginx serves the public dirs itself.
+MEDIA_ACCEL = env('MEDIA_ACCEL', default='')
+MEDIA_ACCEL_PREFIX = env('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+MEDIA_PUBLIC_DIRS = env.list('MEDIA_PUBLIC_DIRS', default=['products'])
+# Browser cache lifetime of media without a content hash in the name; hashed names are cached for a year.
+MEDIA_CACHE_SECONDS = env.int('MEDIA_CACHE_SECONDS', default=3600)
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -121,6 +196,82 @@ CELERY_BROKER_URL = env('CELERY_BROKER_URL')
 CELERY_RESULT_BACKEND = env('CELERY_RESULT_BACKEND')
 CELERY_TASK_ALWAYS_EAGER = env.bool('CELERY_TASK_ALWAYS_EAGER', default=False)
 
+# --- Redis ---
+# Shared Redis instance for throttling and caching. Optional: features that use it
+# fall back to process-local state when it is not configured or unreachable.
+REDIS_URL = env('REDIS_URL', default=None)
+
+# --- Cache ---
+# Redis when REDIS_URL (or CACHE_URL) is set, otherwise a per-process memory cache. Run more
+# than one process with a shared cache: cache invalidations (e.g. users/cache.py) only reach
+# other processes through it.
+CACHES = {'default': env.cache_url('CACHE_URL', default=REDIS_URL or 'locmemcache://')}
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', default=60)  # seconds a cached catalog response is served
+
+# --- Sessions ---
+# Sessions are only used to identify guest carts (the API itself authenticates with JWT).
+#   db             - django_session table (default)
+#   cache          - cache only; fastest, but sessions are lost if Redis evicts or restarts
+#   cached_db      - read from cache, write through to the database
+#   signed_cookies - no server-side storage; the session lives in a signed cookie
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODE = env('SESSION_MODE', default='db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+
+# --- SQL instrumentation (perf.middleware) ---
+# Per-request query counts and DB time in a Server-Timing header, slow-request logging, and
+# N+1 detection: the same SELECT run SQL_N_PLUS_ONE_THRESHOLD+ times in one request raises
+# in tests and is only logged otherwise. It runs after the view, so raising on a running server
+# would turn writes that already committed into 500s. Batch views opt out (perf.middleware).
+SQL_INSTRUMENTATION = env.bool('SQL_INSTRUMENTATION', default=True)
+# The Server-Timing header exposes query counts and DB time to every client; off in production by default.
+SQL_SERVER_TIMING = env.bool('SQL_SERVER_TIMING', default=DEBUG)
+SQL_SLOW_REQUEST_MS = env.float('SQL_SLOW_REQUEST_MS', default=500.0)
+SQL_N_PLUS_ONE_THRESHOLD = env.int('SQL_N_PLUS_ONE_THRESHOLD', default=5)
+SQL_N_PLUS_ONE_RAISE = env.bool('SQL_N_PLUS_ONE_RAISE', default=TESTING)
+
+# --- Readiness probe (healthcheck.readiness) ---
+READINESS_CHECK_TIMEOUT = env.float('READINESS_CHECK_TIMEOUT', default=1.0)  # seconds before a dependency check counts as failed
+READINESS_CACHE_SECONDS = env.float('READINESS_CACHE_SECONDS', default=5.0)  # seconds a readiness report is reused
+
+# --- Metrics (healthcheck.metrics) ---
+# When set, /metrics/ requires "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+# --- Throttling ---
+THROTTLE_REDIS_URL = env('THROTTLE_REDIS_URL', default=REDIS_URL)
+THROTTLE_REDIS_TIMEOUT = env.float('THROTTLE_REDIS_TIMEOUT', default=0.1)  # seconds per Redis call
+THROTTLE_REDIS_RETRY = env.float('THROTTLE_REDIS_RETRY', default=30.0)  # seconds before retrying Redis after a failure
+
+# Periodic tasks (run by `celery -A eCommerce.celery beat`)
+CELERY_BEAT_SCHEDULE = {
+    'relay-email-outbox': {
+        'task': 'users.tasks.relay_email_outbox',
+        'schedule': env.float('EMAIL_OUTBOX_RELAY_INTERVAL', default=5.0),  # seconds
+    },
+    'send-low-stock-alert': {
+        'task': 'product.tasks.send_low_stock_changes_task',
+        'schedule': env.float('LOW_STOCK_CHECK_INTERVAL', default=300.0),  # seconds
+    },
+}
+
+# Maximum number of outbox emails published per relay transaction
+EMAIL_OUTBOX_BATCH_SIZE = env.int('EMAIL_OUTBOX_BATCH_SIZE', default=100)
+
+# Stock at or below this level is reported by check_stock, unless a variation sets its own low_stock_threshold
+LOW_STOCK_THRESHOLD = env.int('LOW_STOCK_THRESHOLD', default=5)
+# Who receives the periodic low-stock email; no email is sent when empty
+LOW_STOCK_ALERT_RECIPIENTS = env.list('LOW_STOCK_ALERT_RECIPIENTS', default=[])
+# Stock changes younger than this many seconds wait for the next alert run, so rows from transactions still in flight are not skipped
+LOW_STOCK_ALERT_LAG = env.int('LOW_STOCK_ALERT_LAG', default=60)
+# Processed inventory change log rows are deleted after this many days
+INVENTORY_LOG_RETENTION_DAYS = env.int('INVENTORY_LOG_RETENTION_DAYS', default=30)
+
 
 # DRF and JWT Settings
 REST_FRAMEWORK = {
@@ -138,6 +289,13 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 12,
+    # Token-bucket rates ("<requests>/<period>") used by eCommerce.throttling
+    'DEFAULT_THROTTLE_RATES': {
+        'login': env('THROTTLE_RATE_LOGIN', default='20/min'),
+        'register': env('THROTTLE_RATE_REGISTER', default='20/hour'),
+        'cart_write': env('THROTTLE_RATE_CART_WRITE', default='120/min'),
+        'feed': env('THROTTLE_RATE_FEED', default='30/hour'),
+    },
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
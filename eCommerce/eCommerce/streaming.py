@@ -0,0 +1,14 @@
+"""Helpers for streaming responses served under both WSGI and ASGI."""
+from asgiref.sync import sync_to_async
+
+async def aiterate(iterator):
+    """
+    Serves a sync generator to an ASGI server one item at a time. Django would otherwise
+    read a sync StreamingHttpResponse into memory in full before sending it.
+    """
+    iterator = iter(iterator)
+    # Thread-sensitive, so every step runs in the thread that owns the database connection.
+    step = sync_to_async(next, thread_sensitive=True)
+    sentinel = object()
+    while (item := await step(iterator, sentinel)) is not sentinel:
+        yield item
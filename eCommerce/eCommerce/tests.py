@@ -1,13 +1,25 @@
 import logging
-from unittest.mock import patch
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import ANY, MagicMock, patch
 
-from django.test import TestCase, override_settings
+from django.apps import apps
+from django.conf import settings
+from django.db import NotSupportedError, models
+from django.db.migrations.state import ProjectState
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.urls import path, reverse
 from rest_framework import status, views
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from eCommerce import db_router, throttling
+from eCommerce.db_operations import AddIndexConcurrently
+from product.models import Brand, Product, ProductCategory
 from users.models import SiteUser
 
 # --- Test-specific views and URLs for triggering exceptions ---
@@ -23,10 +35,21 @@ class ServerErrorView(views.APIView):
     def get(self, request):
         raise Exception("This is a deliberate test server error.")
 
+class ReadDatabaseView(views.APIView):
+    """A dummy view that reports where a catalog read would be routed; POST also writes to the session."""
+    authentication_classes = []
+    permission_classes = []
+    def get(self, request):
+        return Response({'db': db_router.ReplicaRouter().db_for_read(Product)})
+    def post(self, request):
+        request.session['touched'] = True
+        return self.get(request)
+
 # Define a temporary URL configuration for these tests.
 urlpatterns = [
     path('test/admin-only/', AdminOnlyView.as_view(), name='test-admin-only'),
     path('test/server-error/', ServerErrorView.as_view(), name='test-server-error'),
+    path('test/read-database/', ReadDatabaseView.as_view(), name='test-read-database'),
 ]
 
 # --- Test Suite ---
@@ -90,3 +113,328 @@ class ExceptionHandlerIntegrationTests(APITestCase):
         self.assertTrue(mock_logger.error.called)
         log_call_args = mock_logger.error.call_args[0][0]
         self.assertIn("Unhandled exception caught: This is a deliberate test server error.", log_call_args)
+
+THROTTLED_REST_FRAMEWORK = {
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'login': '2/min', 'register': '2/min', 'cart_write': '2/min', 'feed': '2/min'},
+}
+
+@override_settings(REST_FRAMEWORK=THROTTLED_REST_FRAMEWORK, THROTTLE_REDIS_URL=None)
+class TokenBucketThrottleTests(APITestCase):
+    """
+    Tests for the token-bucket throttles on login, registration, cart writes and the product feed.
+    """
+    def setUp(self):
+        throttling.memory_bucket.clear()
+        self.addCleanup(throttling.memory_bucket.clear)
+
+    def test_login_is_throttled_before_authentication(self):
+        """Over-limit login attempts get a 429 with Retry-After, without checking credentials."""
+        url = reverse('token_obtain_pair')
+        data = {'email': 'nobody@example.com', 'password': 'wrong'}
+        for _ in range(2):
+            response = self.client.post(url, data, format='json', REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with patch('users.serializers.CustomTokenObtainPairSerializer.validate') as mock_validate:
+            response = self.client.post(url, data, format='json', REMOTE_ADDR='10.0.0.1')
+            mock_validate.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('errors', response.data)
+        self.assertIn('Retry-After', response)
+
+        # Other clients have their own bucket
+        response = self.client.post(url, data, format='json', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cart_reads_are_not_throttled(self):
+        """Only cart writes consume tokens."""
+        url = reverse('cart-list')
+        for _ in range(4):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.3').status_code, status.HTTP_200_OK)
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, {}, format='json', REMOTE_ADDR='10.0.0.3').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url, {}, format='json', REMOTE_ADDR='10.0.0.3').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_feed_downloads_are_throttled(self):
+        url = reverse('product-feed', args=['csv'])
+        for _ in range(2):
+            response = self.client.get(url, REMOTE_ADDR='10.0.0.5')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            b''.join(response.streaming_content)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.5').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(THROTTLE_REDIS_URL='redis://127.0.0.1:1/0')
+    @patch('eCommerce.throttling.logger')
+    def test_falls_back_to_memory_when_redis_is_down(self, mock_logger):
+        """An unreachable Redis degrades to the in-memory limiter instead of failing requests."""
+        self.addCleanup(setattr, throttling, '_redis_down_until', 0.0)
+        url = reverse('user-register')
+        statuses = [self.client.post(url, {}, format='json', REMOTE_ADDR='10.0.0.4').status_code for _ in range(3)]
+        self.assertEqual(statuses, [status.HTTP_400_BAD_REQUEST, status.HTTP_400_BAD_REQUEST, status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertTrue(mock_logger.warning.called)
+
+    def test_token_bucket_refills_over_time(self):
+        """Tokens come back at the configured rate."""
+        bucket = throttling.MemoryTokenBucket()
+        with patch('eCommerce.throttling.time.monotonic', return_value=100.0):
+            self.assertTrue(bucket.consume('k', 1, 0.5)[0])
+            allowed, wait = bucket.consume('k', 1, 0.5)
+            self.assertFalse(allowed)
+            self.assertAlmostEqual(wait, 2.0)
+        with patch('eCommerce.throttling.time.monotonic', return_value=102.0):
+            self.assertTrue(bucket.consume('k', 1, 0.5)[0])
+
+@override_settings(ROOT_URLCONF='eCommerce.tests', DATABASE_REPLICAS=['replica_1'], DB_REPLICA_STICKY_SECONDS=10)
+@patch('eCommerce.db_router.replica_is_healthy', return_value=True)
+class ReplicaRouterTests(APITransactionTestCase):
+    """
+    Tests for the read-replica router and its read-your-writes stickiness.
+    Replica health is patched, so no second database is needed. Not a TestCase, whose
+    wrapping transaction would send every read to the primary.
+    """
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('test-read-database')
+
+    def test_catalog_reads_go_to_replica(self, mock_health):
+        router = db_router.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Product), 'replica_1')
+        self.assertEqual(router.db_for_read(SiteUser), 'default')
+        self.assertEqual(router.db_for_write(Product), 'default')
+
+    def test_falls_back_to_primary_when_replicas_are_unhealthy(self, mock_health):
+        mock_health.return_value = False
+        self.assertEqual(db_router.ReplicaRouter().db_for_read(Product), 'default')
+
+    def test_pin_to_primary(self, mock_health):
+        with db_router.pin_to_primary():
+            self.assertEqual(db_router.ReplicaRouter().db_for_read(Product), 'default')
+        self.assertEqual(db_router.ReplicaRouter().db_for_read(Product), 'replica_1')
+
+    def test_reads_in_a_transaction_use_primary(self, mock_health):
+        with transaction.atomic():
+            self.assertEqual(db_router.ReplicaRouter().db_for_read(Product), 'default')
+        self.assertEqual(db_router.ReplicaRouter().db_for_read(Product), 'replica_1')
+
+    def test_reads_stick_to_primary_after_a_write_in_the_same_session(self, mock_health):
+        self.assertEqual(self.client.get(self.url).data['db'], 'replica_1')
+        # Reads during the write itself, then later reads by the same guest, use the primary.
+        self.assertEqual(self.client.post(self.url).data['db'], 'default')
+        self.assertEqual(self.client.get(self.url).data['db'], 'default')
+        # Other clients are unaffected.
+        self.assertEqual(self.client_class().get(self.url).data['db'], 'replica_1')
+        # Once the sticky window has passed, reads return to the replica.
+        cache.clear()
+        self.assertEqual(self.client.get(self.url).data['db'], 'replica_1')
+
+    async def test_reads_stick_to_primary_under_asgi(self, mock_health):
+        self.assertEqual((await self.async_client.get(self.url)).data['db'], 'replica_1')
+        self.assertEqual((await self.async_client.post(self.url)).data['db'], 'default')
+        self.assertEqual((await self.async_client.get(self.url)).data['db'], 'default')
+
+    def test_reads_stick_to_primary_per_access_token(self, mock_health):
+        self.client_class().post(self.url, HTTP_AUTHORIZATION='Bearer token-a')
+        self.assertEqual(self.client_class().get(self.url, HTTP_AUTHORIZATION='Bearer token-a').data['db'], 'default')
+        self.assertEqual(self.client_class().get(self.url, HTTP_AUTHORIZATION='Bearer token-b').data['db'], 'replica_1')
+
+@override_settings(DATABASE_REPLICAS=['replica_test'])
+class ReplicaDatabaseTests(TransactionTestCase):
+    """
+    Routes reads across `default` and a real second SQLite database standing in for a
+    replica. The two hold different rows, so each read shows which database served it.
+    """
+    def setUp(self):
+        db_router._replica_health.clear()
+        self.addCleanup(db_router._replica_health.clear)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def add_replica(self, path):
+        """Registers `replica_test` as an SQLite database at `path` for this test."""
+        configured = connections.configure_settings({
+            DEFAULT_DB_ALIAS: {},
+            'replica_test': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(path)},
+        })
+        connections.settings['replica_test'] = configured['replica_test']
+        # Allowed like the databases a test case declares, which must exist before it starts.
+        self.enterContext(patch.object(type(self), 'databases', self.databases | {'replica_test'}))
+
+        def remove():
+            connections['replica_test'].close()
+            del connections['replica_test']
+            del connections.settings['replica_test']
+        self.addCleanup(remove)
+
+    def names(self):
+        return list(Product.objects.order_by('name').values_list('name', flat=True))
+
+    def test_reads_and_writes_are_routed_across_databases(self):
+        self.add_replica(self.directory / 'replica.sqlite3')
+        with connections['replica_test'].schema_editor() as editor:
+            for model in (ProductCategory, Brand, Product):
+                editor.create_model(model)
+        for alias in ('replica_test', DEFAULT_DB_ALIAS):
+            category = ProductCategory.objects.using(alias).create(name='Shoes')
+            brand = Brand.objects.using(alias).create(name='Nike')
+            Product.objects.using(alias).create(name=f'On {alias}', category=category, brand=brand)
+
+        self.assertEqual(self.names(), ['On replica_test'])
+        # Writes, and the reads that must see them, use the primary.
+        Product.objects.create(name='Written', category_id=category.id, brand_id=brand.id)
+        self.assertEqual(self.names(), ['On replica_test'])
+        with db_router.pin_to_primary():
+            self.assertEqual(self.names(), ['On default', 'Written'])
+        with transaction.atomic():
+            self.assertEqual(self.names(), ['On default', 'Written'])
+        # Only catalog apps are read from replicas.
+        self.assertEqual(db_router.ReplicaRouter().db_for_read(SiteUser), DEFAULT_DB_ALIAS)
+
+    @patch('eCommerce.db_router.logger')
+    def test_unreachable_replica_falls_back_to_primary(self, mock_logger):
+        self.add_replica(self.directory / 'missing' / 'replica.sqlite3')
+        Product.objects.create(
+            name='On default', category=ProductCategory.objects.create(name='Shoes'), brand=Brand.objects.create(name='Nike'),
+        )
+        self.assertEqual(self.names(), ['On default'])
+        mock_logger.warning.assert_called_once()
+
+class AddIndexConcurrentlyTests(SimpleTestCase):
+    """
+    Tests for the AddIndexConcurrently migration operation, against a mocked schema editor.
+    """
+    def run_operation(self, vendor, in_atomic_block=False):
+        operation = AddIndexConcurrently(model_name='product', index=models.Index(fields=['name'], name='test_name_idx'))
+        schema_editor = MagicMock()
+        schema_editor.connection.vendor = vendor
+        schema_editor.connection.alias = 'default'
+        schema_editor.connection.in_atomic_block = in_atomic_block
+        state = ProjectState.from_apps(apps)
+        operation.database_forwards('product', schema_editor, state, state)
+        return schema_editor, operation.index
+
+    def test_postgresql_builds_the_index_concurrently(self):
+        schema_editor, index = self.run_operation('postgresql')
+        schema_editor.add_index.assert_called_once_with(ANY, index, concurrently=True)
+        with self.assertRaises(NotSupportedError):
+            self.run_operation('postgresql', in_atomic_block=True)
+
+    def test_other_databases_build_a_plain_index(self):
+        schema_editor, index = self.run_operation('sqlite', in_atomic_block=True)
+        schema_editor.add_index.assert_called_once_with(ANY, index)
+
+class ReplicaHealthTests(TestCase):
+    """
+    Tests for the cached replica health check.
+    """
+    def setUp(self):
+        db_router._replica_health.clear()
+
+    @patch('eCommerce.db_router.logger')
+    def test_unreachable_replica_is_unhealthy(self, mock_logger):
+        self.assertTrue(db_router.replica_is_healthy('default'))
+        with patch('eCommerce.db_router.connections') as mock_connections:
+            mock_connections.__getitem__.return_value.cursor.side_effect = OperationalError('connection refused')
+            self.assertFalse(db_router.replica_is_healthy('replica_1'))
+        mock_logger.warning.assert_called_once()
+
+    def test_health_is_cached_between_checks(self):
+        db_router._replica_health['default'] = (False, time.monotonic())
+        self.assertFalse(db_router.replica_is_healthy('default'))
+        with override_settings(DB_REPLICA_HEALTH_CHECK_INTERVAL=0):
+            self.assertTrue(db_router.replica_is_healthy('default'))
+
+class MediaServingTests(TestCase):
+    """
+    Tests for serving MEDIA_ROOT files, from a temporary MEDIA_ROOT.
+    """
+    content = bytes(range(256)) * 40
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = Path(media_root.name)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, MEDIA_ACCEL='', MEDIA_PUBLIC_DIRS=['products'], MEDIA_CACHE_SECONDS=600)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for name in ('products/shoe.jpg', 'products/IMG_20240101123456.jpg', 'products/renditions/0123456789abcdef-320w.webp', 'exports/orders.csv'):
+            (self.media_root / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.media_root / name).write_bytes(self.content)
+
+    def get(self, name, **headers):
+        response = self.client.get(reverse('media', args=[name]), headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def test_streams_file_with_validators_and_cache_headers(self):
+        response, body = self.get('products/shoe.jpg')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(body, self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=600')
+        # The validators answer conditional requests without the body.
+        not_modified, body = self.get('products/shoe.jpg', if_none_match=response['ETag'])
+        self.assertEqual((not_modified.status_code, body), (status.HTTP_304_NOT_MODIFIED, b''))
+
+    def test_content_hashed_names_are_immutable(self):
+        response, _ = self.get('products/renditions/0123456789abcdef-320w.webp')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        # Only the renditions' naming counts; a camera's timestamp is not a content hash.
+        response, _ = self.get('products/IMG_20240101123456.jpg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=600')
+
+    def test_range_requests(self):
+        response, body = self.get('products/shoe.jpg', range='bytes=100-199')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual((body, response['Content-Range'], response['Content-Length']), (self.content[100:200], f'bytes 100-199/{len(self.content)}', '100'))
+        response, body = self.get('products/shoe.jpg', range='bytes=-10')
+        self.assertEqual(body, self.content[-10:])
+        response, body = self.get('products/shoe.jpg', range='bytes=10000-')
+        self.assertEqual(body, self.content[10000:])
+        response, _ = self.get('products/shoe.jpg', range=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+        # Several ranges, or an If-Range that no longer matches, get the whole file.
+        response, body = self.get('products/shoe.jpg', range='bytes=0-1,5-6')
+        self.assertEqual((response.status_code, body), (status.HTTP_200_OK, self.content))
+        response, body = self.get('products/shoe.jpg', range='bytes=0-1', if_range='"stale"')
+        self.assertEqual((response.status_code, body), (status.HTTP_200_OK, self.content))
+
+    async def test_range_request_under_asgi(self):
+        response = await self.async_client.get(reverse('media', args=['products/shoe.jpg']), headers={'range': 'bytes=0-9'})
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual((response.status_code, body), (status.HTTP_206_PARTIAL_CONTENT, self.content[:10]))
+
+    def test_private_files_and_traversal(self):
+        self.assertEqual(self.get('exports/orders.csv')[0].status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get('products/../exports/orders.csv')[0].status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get('products/missing.jpg')[0].status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get('products/renditions')[0].status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_login(SiteUser.objects.create_superuser(username='admin', email='admin@example.com', password='password'))
+        response, body = self.get('exports/orders.csv')
+        self.assertEqual((response.status_code, body), (status.HTTP_200_OK, self.content))
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_private_files_for_staff_api_tokens(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        user = SiteUser.objects.create_user(username='shopper', email='shopper@example.com', password='password')
+        self.assertEqual(self.get('exports/orders.csv', authorization=f'Bearer {RefreshToken.for_user(user).access_token}')[0].status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get('exports/orders.csv', authorization='Bearer not-a-token')[0].status_code, status.HTTP_404_NOT_FOUND)
+        user.is_staff = True
+        user.save()
+        response, body = self.get('exports/orders.csv', authorization=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.assertEqual((response.status_code, body), (status.HTTP_200_OK, self.content))
+
+    def test_hands_transfer_to_the_proxy(self):
+        with override_settings(MEDIA_ACCEL='nginx', MEDIA_ACCEL_PREFIX='/protected-media/'):
+            response, body = self.get('products/renditions/0123456789abcdef-320w.webp', range='bytes=0-9')
+        self.assertEqual((response.status_code, body), (status.HTTP_200_OK, b''))
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/products/renditions/0123456789abcdef-320w.webp')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        with override_settings(MEDIA_ACCEL='sendfile'):
+            response, _ = self.get('products/shoe.jpg')
+        self.assertEqual(response['X-Sendfile'], str(self.media_root / 'products/shoe.jpg'))
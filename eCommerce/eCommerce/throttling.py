@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+# Get an instance of a logger for this module
+logger = logging.getLogger(__name__)
+
+# Atomically refills and takes one token from the bucket stored at KEYS[1].
+# ARGV: capacity, refill rate (tokens/second). Uses the Redis clock so that all
+# gunicorn workers agree on time. Returns {allowed (0/1), seconds until next token}.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill_rate)
+
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / refill_rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill_rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+class MemoryTokenBucket:
+    """
+    Process-local token bucket, used when Redis is not configured or unreachable.
+    Limits are per worker process, so the effective limit is multiplied by the worker count.
+    """
+    max_keys = 100_000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, key, capacity, refill_rate):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            tokens, ts = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - ts) * refill_rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            return False, (1 - tokens) / refill_rate
+
+    def _prune(self, now):
+        # Drop buckets idle long enough to be full again; they behave like new keys.
+        self._buckets = {
+            key: (tokens, ts) for key, (tokens, ts) in self._buckets.items()
+            if now - ts < 3600
+        }
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+class RedisTokenBucket:
+    """Token bucket shared by all processes, implemented as a single Lua script call."""
+    def __init__(self, url):
+        import redis  # Imported here so processes without Redis throttling skip its import cost.
+
+        self.client = redis.Redis.from_url(
+            url,
+            socket_timeout=settings.THROTTLE_REDIS_TIMEOUT,
+            socket_connect_timeout=settings.THROTTLE_REDIS_TIMEOUT,
+        )
+        self.script = self.client.register_script(TOKEN_BUCKET_LUA)
+
+    def consume(self, key, capacity, refill_rate):
+        allowed, wait = self.script(keys=[key], args=[capacity, refill_rate])
+        return bool(allowed), float(wait)
+
+memory_bucket = MemoryTokenBucket()
+_redis_buckets = {}
+_redis_down_until = 0.0
+
+def consume_token(key, capacity, refill_rate):
+    """
+    Takes one token from the bucket for `key`. Uses Redis when THROTTLE_REDIS_URL is set
+    and falls back to the in-memory bucket (for THROTTLE_REDIS_RETRY seconds) when it fails.
+    """
+    global _redis_down_until
+    url = settings.THROTTLE_REDIS_URL
+    if url and time.monotonic() >= _redis_down_until:
+        from redis import RedisError
+
+        bucket = _redis_buckets.get(url)
+        if bucket is None:
+            bucket = _redis_buckets[url] = RedisTokenBucket(url)
+        try:
+            return bucket.consume(key, capacity, refill_rate)
+        except RedisError as exc:
+            logger.warning(f"Throttle Redis unavailable, using in-memory limiter: {exc}")
+            _redis_down_until = time.monotonic() + settings.THROTTLE_REDIS_RETRY
+    return memory_bucket.consume(key, capacity, refill_rate)
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token-bucket throttle keyed per scope and per user (or client IP for anonymous requests).
+
+    Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope] using DRF's
+    "<requests>/<period>" format: the bucket holds <requests> tokens and refills
+    evenly over <period>, so short bursts are allowed but the long-run rate is capped.
+    """
+    scope = None
+    durations = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def parse_rate(self, rate):
+        num, period = rate.split('/')
+        capacity = int(num)
+        return capacity, capacity / self.durations[period[0]]
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return f"throttle:{self.scope}:{ident}"
+
+    def allow_request(self, request, view):
+        rate = self.get_rate()
+        if rate is None:
+            return True
+        capacity, refill_rate = self.parse_rate(rate)
+        allowed, self.wait_seconds = consume_token(self.get_cache_key(request, view), capacity, refill_rate)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+class LoginRateThrottle(TokenBucketThrottle):
+    """Limits token requests before any password hashing happens."""
+    scope = 'login'
+
+class RegistrationRateThrottle(TokenBucketThrottle):
+    """Limits account creation per client."""
+    scope = 'register'
+
+class FeedRateThrottle(TokenBucketThrottle):
+    """Limits full product feed downloads, each of which reads the whole catalog."""
+    scope = 'feed'
+
+class CartWriteRateThrottle(TokenBucketThrottle):
+    """Limits cart modifications; cart reads are not throttled."""
+    scope = 'cart_write'
+
+    def allow_request(self, request, view):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return True
+        return super().allow_request(request, view)
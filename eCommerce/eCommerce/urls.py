@@ -4,14 +4,16 @@ URL configuration for eCommerce project.
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from eCommerce.media import serve_media
+from healthcheck.views import metrics
 from users.views import CustomTokenObtainPairView
 from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('healthz/', include('healthcheck.urls')), # Health check endpoint
+    path('metrics/', metrics, name='metrics'), # Prometheus scrape endpoint
 
     # API v1 URLs
     path('api/v1/auth/', include('users.urls')),
@@ -29,6 +31,7 @@ urlpatterns = [
     path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
 ]
 
-# Serve media files during development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media files, handed to the proxy with X-Accel-Redirect/X-Sendfile when MEDIA_ACCEL is set
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", serve_media, name='media'),
+]
@@ -0,0 +1,37 @@
+"""
+Gunicorn configuration shared by the Docker entrypoint and the compose files.
+
+SERVER_MODE picks the application and worker class:
+  wsgi - sync workers serving eCommerce.wsgi (default)
+  asgi - uvicorn workers serving eCommerce.asgi, so async views can overlap I/O waits
+
+Workers write their Prometheus metrics to PROMETHEUS_MULTIPROC_DIR, which is emptied when
+gunicorn starts, so /metrics/ reports totals across every worker of this server.
+"""
+import os
+import shutil
+
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+
+bind = '0.0.0.0:8000'
+# The worker count keeps gunicorn's default; set WEB_CONCURRENCY to change it.
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'eCommerce.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'eCommerce.wsgi:application'
+    worker_class = 'sync'
+
+# Must be set before the workers import prometheus_client.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus-multiproc')
+
+def on_starting(server):
+    # Values left by a previous run would otherwise be added to this run's.
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 class HealthcheckConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'healthcheck'
+
+    def ready(self):
+        # Count Celery task events in both the web and worker processes.
+        from .metrics import connect_celery_signals
+        connect_celery_signals()
@@ -0,0 +1,91 @@
+"""
+Prometheus metrics for the web and Celery processes.
+
+Gunicorn runs several worker processes, each with its own copy of these metrics. When
+PROMETHEUS_MULTIPROC_DIR is set (gunicorn.conf.py sets it), prometheus_client keeps the
+values in memory-mapped files in that directory, and the /metrics/ view aggregates the
+files of every worker, so whichever worker answers the scrape reports totals for the
+whole server. Without it (runserver, tests) each process reports only its own values.
+
+Celery workers export their own metrics: set CELERY_METRICS_PORT to serve them over HTTP
+from the worker's main process, aggregated across its pool processes the same way.
+"""
+import os
+
+from celery import signals
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess, start_http_server,
+)
+
+# --- HTTP ---
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by route.',
+    ['method', 'route'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS = Counter('http_requests', 'Responses by route and status code.', ['method', 'route', 'status'])
+
+# --- Database ---
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries run per request.',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+DB_QUERIES = Counter('db_queries', 'Database queries by connection alias.', ['alias'])
+DB_QUERY_SECONDS = Counter('db_query_seconds', 'Time spent in database queries by connection alias.', ['alias'])
+
+# --- Cache ---
+CACHE_REQUESTS = Counter('cache_requests', 'Application cache lookups; hit ratio = hit / (hit + miss).', ['cache', 'result'])
+
+# --- Celery ---
+CELERY_TASKS = Counter('celery_tasks', 'Celery task events (published, succeeded, failed, retried).', ['task', 'event'])
+
+def record_cache_lookup(cache_name, hit):
+    CACHE_REQUESTS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+def metrics_registry():
+    """Returns the registry to export: every process's values in multiprocess mode, else this process's."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+def render_metrics():
+    """Returns (body, content type) in the Prometheus text exposition format."""
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+# --- Celery signal handlers (connected in HealthcheckConfig.ready) ---
+
+def _task_name(sender):
+    # before_task_publish sends the task name; the other signals send the task itself.
+    return sender if isinstance(sender, str) else getattr(sender, 'name', 'unknown')
+
+def task_published(sender=None, **kwargs):
+    CELERY_TASKS.labels(_task_name(sender), 'published').inc()
+
+def task_succeeded(sender=None, **kwargs):
+    CELERY_TASKS.labels(_task_name(sender), 'succeeded').inc()
+
+def task_failed(sender=None, **kwargs):
+    CELERY_TASKS.labels(_task_name(sender), 'failed').inc()
+
+def task_retried(sender=None, **kwargs):
+    CELERY_TASKS.labels(_task_name(sender), 'retried').inc()
+
+def worker_ready(**kwargs):
+    port = os.environ.get('CELERY_METRICS_PORT')
+    if port:
+        start_http_server(int(port), registry=metrics_registry())
+
+def worker_process_shutdown(pid=None, **kwargs):
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+def connect_celery_signals():
+    signals.before_task_publish.connect(task_published, weak=False)
+    signals.task_success.connect(task_succeeded, weak=False)
+    signals.task_failure.connect(task_failed, weak=False)
+    signals.task_retry.connect(task_retried, weak=False)
+    signals.worker_ready.connect(worker_ready, weak=False)
+    signals.worker_process_shutdown.connect(worker_process_shutdown, weak=False)
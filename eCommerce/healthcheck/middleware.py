@@ -0,0 +1,21 @@
+from perf.middleware import QueryRecordingMiddleware
+from .metrics import DB_QUERIES, DB_QUERY_SECONDS, REQUEST_LATENCY, REQUEST_QUERIES, REQUESTS
+
+class PrometheusMiddleware(QueryRecordingMiddleware):
+    """
+    Records per-route latency, status codes and database usage for the /metrics/ endpoint.
+
+    Requests are labelled by their URL pattern (e.g. `api/v1/products/<int:id>/`) rather
+    than their path, so the number of time series stays bounded. Queries are counted by
+    the same recorder QueryInstrumentationMiddleware reports from.
+    """
+    def record(self, request, response, recorder, elapsed):
+        match = request.resolver_match
+        route = match.route if match else '<unmatched>'
+        REQUEST_LATENCY.labels(request.method, route).observe(elapsed)
+        REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+        REQUEST_QUERIES.labels(route).observe(recorder.count)
+        for alias, count in recorder.alias_counts.items():
+            DB_QUERIES.labels(alias).inc(count)
+            DB_QUERY_SECONDS.labels(alias).inc(recorder.alias_durations[alias])
+        return response
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BootstrapState',
+            fields=[
+                ('step', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('completed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
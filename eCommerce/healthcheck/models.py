@@ -0,0 +1,13 @@
+from django.db import models
+
+class BootstrapState(models.Model):
+    """
+    The fingerprint of each container bootstrap step (migrate, superuser, seed) when it
+    last completed, so restarts can skip steps whose inputs have not changed.
+    """
+    step = models.CharField(max_length=50, primary_key=True)
+    fingerprint = models.CharField(max_length=64)
+    completed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.step} ({self.fingerprint[:12]})"
@@ -0,0 +1,97 @@
+"""
+Readiness checks for the load balancer.
+
+Each dependency check runs in a small thread pool so the checks overlap and one that hangs
+cannot hold up the others: a check still running after READINESS_CHECK_TIMEOUT seconds is
+reported as timed out. Results are kept in process memory (not in Django's cache, which
+may be the dependency that is down) for READINESS_CACHE_SECONDS, and concurrent probes
+wait for a single round of checks, so probe traffic never turns into database traffic.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from eCommerce.celery import app as celery_app
+
+def check_database(alias=DEFAULT_DB_ALIAS):
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    finally:
+        # The check runs in a pool thread; don't leave its connection open.
+        connection.close()
+
+def check_cache():
+    cache.set('healthcheck:ready', 1, timeout=10)
+    if cache.get('healthcheck:ready') != 1:
+        raise RuntimeError('The cache did not return the value just written.')
+
+def check_broker():
+    with celery_app.connection_for_read(connect_timeout=settings.READINESS_CHECK_TIMEOUT) as connection:
+        connection.connect()
+
+def readiness_checks():
+    """Returns {name: (check, critical)}. Replicas are not critical: reads fall back to the primary."""
+    checks = {
+        'database': (check_database, True),
+        'cache': (check_cache, True),
+        'broker': (check_broker, True),
+    }
+    for alias in settings.DATABASE_REPLICAS:
+        checks[f'database:{alias}'] = (lambda alias=alias: check_database(alias), False)
+    return checks
+
+def _timed(check):
+    """Runs a check, returning (seconds, exception or None)."""
+    started = time.perf_counter()
+    try:
+        check()
+    except Exception as exc:
+        return time.perf_counter() - started, exc
+    return time.perf_counter() - started, None
+
+class ReadinessProbe:
+    """Runs the readiness checks concurrently and caches the report; see the module docstring."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='readiness')
+        self._running = {}  # name -> (future, started) for checks that have not finished
+        self._report = None
+        self._checked_at = 0.0
+
+    def report(self):
+        """Returns (ready, report), running the checks if the cached report is stale."""
+        with self._lock:
+            if self._report is None or time.monotonic() - self._checked_at >= settings.READINESS_CACHE_SECONDS:
+                self._report = self._run_checks()
+                self._checked_at = time.monotonic()
+            return self._report['status'] == 'ok', self._report
+
+    def _run_checks(self):
+        checks = readiness_checks()
+        for name, (check, _) in checks.items():
+            # A check still hanging from an earlier probe is not started again.
+            if name not in self._running:
+                self._running[name] = (self._executor.submit(_timed, check), time.perf_counter())
+        wait([self._running[name][0] for name in checks], timeout=settings.READINESS_CHECK_TIMEOUT)
+
+        results, ready = {}, True
+        for name, (_, critical) in checks.items():
+            future, started = self._running[name]
+            if future.done():
+                del self._running[name]
+                seconds, error = future.result()
+                result = {'status': 'error', 'error': str(error) or type(error).__name__} if error else {'status': 'ok'}
+            else:
+                seconds = time.perf_counter() - started
+                result = {'status': 'timeout'}
+            result.update(latency_ms=round(seconds * 1000, 1), critical=critical)
+            results[name] = result
+            ready = ready and (result['status'] == 'ok' or not critical)
+        return {'status': 'ok' if ready else 'unavailable', 'checks': results}
+
+probe = ReadinessProbe()
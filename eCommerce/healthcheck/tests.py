@@ -0,0 +1,196 @@
+import os
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from perf.middleware import QueryRecorder
+from prometheus_client import REGISTRY
+from product.cache import aget_cached_response, aset_cached_response
+from users.tasks import send_confirmation_email_task
+from .models import BootstrapState
+from .readiness import ReadinessProbe
+
+@patch('healthcheck.management.commands.bootstrap.call_command')
+class BootstrapCommandTests(TestCase):
+    """
+    Tests for the `bootstrap` management command. The wrapped commands are patched out;
+    only which of them run is checked.
+    """
+    def run_bootstrap(self, **options):
+        call_command('bootstrap', stdout=StringIO(), **options)
+
+    def commands_run(self, mock_call_command):
+        return [call.args[0] for call in mock_call_command.call_args_list]
+
+    def test_first_run_runs_every_step(self, mock_call_command):
+        self.run_bootstrap()
+        self.assertEqual(self.commands_run(mock_call_command), ['migrate', 'create_superuser', 'seed_db'])
+        self.assertEqual(set(BootstrapState.objects.values_list('step', flat=True)), {'migrate', 'superuser', 'seed'})
+
+    def test_unchanged_steps_are_skipped(self, mock_call_command):
+        self.run_bootstrap()
+        mock_call_command.reset_mock()
+        with self.assertNumQueries(1):
+            self.run_bootstrap()
+        self.assertEqual(self.commands_run(mock_call_command), [])
+
+    def test_changed_fingerprint_reruns_only_that_step(self, mock_call_command):
+        self.run_bootstrap()
+        mock_call_command.reset_mock()
+        with patch.dict(os.environ, {'SUPERUSER_EMAIL': 'new-admin@example.com'}):
+            self.run_bootstrap()
+        self.assertEqual(self.commands_run(mock_call_command), ['create_superuser'])
+
+    def test_new_migration_reruns_migrate(self, mock_call_command):
+        self.run_bootstrap()
+        BootstrapState.objects.filter(step='migrate').update(fingerprint='stale')
+        mock_call_command.reset_mock()
+        self.run_bootstrap()
+        self.assertEqual(self.commands_run(mock_call_command), ['migrate'])
+
+    def test_force_and_skip_seed(self, mock_call_command):
+        self.run_bootstrap()
+        mock_call_command.reset_mock()
+        self.run_bootstrap(force=True, skip_seed=True)
+        self.assertEqual(self.commands_run(mock_call_command), ['migrate', 'create_superuser'])
+
+class MetricsTests(TestCase):
+    """
+    Tests for the Prometheus metrics middleware and /metrics/ endpoint.
+    """
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_recorded_by_route(self):
+        labels = {'method': 'GET', 'route': 'healthz/'}
+        before = self.sample('http_requests_total', status='200', **labels)
+        latency_before = self.sample('http_request_duration_seconds_count', **labels)
+
+        self.client.get(reverse('health-check'))
+
+        self.assertEqual(self.sample('http_requests_total', status='200', **labels), before + 1)
+        self.assertEqual(self.sample('http_request_duration_seconds_count', **labels), latency_before + 1)
+
+    def test_unmatched_paths_share_one_route(self):
+        labels = {'method': 'GET', 'route': '<unmatched>', 'status': '404'}
+        before = self.sample('http_requests_total', **labels)
+        self.client.get('/no-such-page/')
+        self.client.get('/another-missing-page/')
+        self.assertEqual(self.sample('http_requests_total', **labels), before + 2)
+
+    def test_database_queries_are_counted(self):
+        before = self.sample('db_queries_total', alias='default')
+        self.client.get(reverse('product-list'))
+        self.assertGreater(self.sample('db_queries_total', alias='default'), before)
+
+    def test_one_recorder_serves_both_query_middlewares(self):
+        with patch.object(QueryRecorder, 'installed', autospec=True, side_effect=QueryRecorder.installed) as mock_installed:
+            self.client.get(reverse('product-list'))
+        self.assertEqual(mock_installed.call_count, 1)
+
+    async def test_async_requests_are_recorded(self):
+        labels = {'method': 'GET', 'route': 'healthz/', 'status': '200'}
+        before = self.sample('http_requests_total', **labels)
+        queries_before = self.sample('db_queries_total', alias='default')
+        await self.async_client.get(reverse('product-list'))
+        await self.async_client.get(reverse('health-check'))
+        self.assertEqual(self.sample('http_requests_total', **labels), before + 1)
+        self.assertGreater(self.sample('db_queries_total', alias='default'), queries_before)
+
+    def test_catalog_cache_hits_and_misses(self):
+        request = RequestFactory().get('/api/v1/products/1/')
+        hits, misses = self.sample('cache_requests_total', cache='catalog', result='hit'), self.sample('cache_requests_total', cache='catalog', result='miss')
+        key, payload = async_to_sync(aget_cached_response)(request)
+        async_to_sync(aset_cached_response)(key, '{}')
+        async_to_sync(aget_cached_response)(request)
+        self.assertEqual(self.sample('cache_requests_total', cache='catalog', result='miss'), misses + 1)
+        self.assertEqual(self.sample('cache_requests_total', cache='catalog', result='hit'), hits + 1)
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_celery_task_events(self):
+        task = 'users.tasks.send_confirmation_email_task'
+        before = self.sample('celery_tasks_total', task=task, event='succeeded')
+        send_confirmation_email_task.apply(args=('Subject', 'Body', 'from@example.com', ['to@example.com']))
+        self.assertEqual(self.sample('celery_tasks_total', task=task, event='succeeded'), before + 1)
+
+    def test_endpoint_exposes_prometheus_text(self):
+        self.client.get(reverse('health-check'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'http_request_duration_seconds_bucket{', response.content)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_endpoint_requires_token_when_configured(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer scrape-secret'})
+        self.assertEqual(response.status_code, 200)
+
+@override_settings(READINESS_CACHE_SECONDS=0, READINESS_CHECK_TIMEOUT=1.0)
+class ReadinessCheckTests(TestCase):
+    """
+    Tests for the readiness endpoint. Each test gets its own probe, so nothing is cached between tests.
+    """
+    def setUp(self):
+        patcher = patch('healthcheck.views.probe', ReadinessProbe())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self):
+        response = self.client.get(reverse('readiness-check'))
+        return response.status_code, response.json()
+
+    def test_ready_when_every_dependency_is_up(self):
+        status_code, report = self.get()
+        self.assertEqual(status_code, 200)
+        self.assertEqual(report['status'], 'ok')
+        self.assertEqual(set(report['checks']), {'database', 'cache', 'broker'})
+        for check in report['checks'].values():
+            self.assertEqual(check['status'], 'ok')
+            self.assertGreaterEqual(check['latency_ms'], 0)
+
+    @patch('healthcheck.readiness.check_cache', side_effect=ConnectionError('Connection refused'))
+    def test_unavailable_when_a_critical_dependency_fails(self, mock_check):
+        status_code, report = self.get()
+        self.assertEqual(status_code, 503)
+        self.assertEqual(report['checks']['cache'], {'status': 'error', 'error': 'Connection refused', 'latency_ms': report['checks']['cache']['latency_ms'], 'critical': True})
+        self.assertEqual(report['checks']['database']['status'], 'ok')
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_replica_failure_is_reported_but_not_fatal(self):
+        def check_database(alias='default'):
+            if alias != 'default':
+                raise ConnectionError('replica down')
+        with patch('healthcheck.readiness.check_database', check_database):
+            status_code, report = self.get()
+        self.assertEqual(status_code, 200)
+        self.assertEqual(report['checks']['database:replica_1']['status'], 'error')
+        self.assertFalse(report['checks']['database:replica_1']['critical'])
+
+    @override_settings(READINESS_CHECK_TIMEOUT=0.05)
+    def test_hanging_check_times_out_and_is_not_restarted(self):
+        release = threading.Event()
+        calls = []
+        def hang():
+            calls.append(1)
+            release.wait(5)
+        self.addCleanup(release.set)
+
+        with patch('healthcheck.readiness.check_broker', hang):
+            status_code, report = self.get()
+            self.assertEqual(status_code, 503)
+            self.assertEqual(report['checks']['broker']['status'], 'timeout')
+
+            self.get()
+            self.assertEqual(len(calls), 1)
+
+    @override_settings(READINESS_CACHE_SECONDS=60)
+    def test_reports_are_cached(self):
+        with patch('healthcheck.readiness.check_database') as mock_check:
+            for _ in range(3):
+                self.assertEqual(self.get()[0], 200)
+        self.assertEqual(mock_check.call_count, 1)
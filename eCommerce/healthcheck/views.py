@@ -1,4 +1,9 @@
-from django.http import JsonResponse
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from .metrics import render_metrics
+from .readiness import probe
 
 def health_check(request):
     """
@@ -6,3 +11,24 @@ def health_check(request):
     This is used by Render for health checks.
     """
     return JsonResponse({"status": "ok"})
+
+def readiness_check(request):
+    """
+    Reports whether this instance can serve traffic: the database, cache and Celery broker
+    are checked concurrently with tight timeouts, and the result is cached for a few
+    seconds. Returns 503 when a critical dependency is down, with per-dependency latency.
+    """
+    ready, report = probe.report()
+    return JsonResponse(report, status=200 if ready else 503)
+
+def metrics(request):
+    """
+    Exposes request, database, cache and Celery metrics in the Prometheus text format,
+    aggregated across every gunicorn worker. Protected by METRICS_TOKEN when it is set.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return HttpResponse(status=401)
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
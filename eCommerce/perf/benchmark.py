@@ -0,0 +1,105 @@
+"""
+Shared helpers for the benchmark management commands.
+
+Requests are replayed in-process through Django's test client, so the numbers include
+the full middleware/view/serializer/ORM stack but not network or WSGI server overhead.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client, override_settings
+
+def percentile(values, pct):
+    """Returns the pct-th percentile (0-100) of values using linear interpolation."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+class EndpointStats:
+    """Collects latency (seconds) and query counts for one endpoint or scenario."""
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.queries = []
+        self.statuses = {}
+
+    def record(self, elapsed, num_queries, status_code):
+        self.latencies.append(elapsed)
+        self.queries.append(num_queries)
+        self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+
+    def summary(self):
+        total = sum(self.latencies)
+        return {
+            'name': self.name,
+            'requests': len(self.latencies),
+            'p50_ms': percentile(self.latencies, 50) * 1000,
+            'p95_ms': percentile(self.latencies, 95) * 1000,
+            'p99_ms': percentile(self.latencies, 99) * 1000,
+            'mean_queries': statistics.fmean(self.queries) if self.queries else 0.0,
+            'max_queries': max(self.queries, default=0),
+            'throughput_rps': len(self.latencies) / total if total else 0.0,
+            'statuses': dict(self.statuses),
+        }
+
+def make_client(**defaults):
+    """Returns a test client whose Host header passes ALLOWED_HOSTS."""
+    host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+    return Client(HTTP_HOST=host, **defaults)
+
+def timed_request(client, method, path, stats=None, **kwargs):
+    """Performs one request, returning (response, elapsed_seconds, num_queries)."""
+    # Counted with a wrapper rather than connection.queries, whose log is capped at 9000 entries.
+    num_queries = 0
+    def count(execute, sql, params, many, context):
+        nonlocal num_queries
+        num_queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        started = time.perf_counter()
+        response = getattr(client, method)(path, **kwargs)
+        elapsed = time.perf_counter() - started
+    if stats is not None:
+        stats.record(elapsed, num_queries, response.status_code)
+    return response, elapsed, num_queries
+
+@contextmanager
+def benchmark_environment(rollback=True):
+    """
+    Disables API throttling, slow-request logging and raising on N+1 queries (which are
+    still logged) for the duration of a benchmark and, by default, rolls back every
+    database change it makes so benchmarks can run against a real database.
+    """
+    rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+    with override_settings(REST_FRAMEWORK=rest_framework, SQL_N_PLUS_ONE_RAISE=False, SQL_SLOW_REQUEST_MS=float('inf')):
+        if not rollback:
+            yield
+            return
+        with transaction.atomic():
+            yield
+            transaction.set_rollback(True)
+
+def format_table(rows, columns):
+    """Renders a list of dicts as a fixed-width text table."""
+    widths = {
+        column: max([len(column)] + [len(_format_cell(row[column])) for row in rows])
+        for column in columns
+    }
+    lines = ['  '.join(column.ljust(widths[column]) for column in columns)]
+    lines.append('  '.join('-' * widths[column] for column in columns))
+    for row in rows:
+        lines.append('  '.join(_format_cell(row[column]).ljust(widths[column]) for column in columns))
+    return '\n'.join(lines)
+
+def _format_cell(value):
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
@@ -0,0 +1,32 @@
+"""
+A deterministic catalog for benchmarks.
+
+seed_dataset() builds the same products, prices, stock levels and user for a given
+(size, seed) pair on every run and every database, so numbers from different releases
+are comparable. The catalog comes from product.seeding, the generator behind `seed_db`,
+without image files: images are only file names.
+"""
+from django.contrib.auth import get_user_model
+from product.seeding import BRANDS, CATEGORIES, seed_catalog
+
+BENCHMARK_USER_EMAIL = 'bench@example.com'
+BENCHMARK_USER_PASSWORD = 'bench-password'
+
+# One search term per product type, e.g. 'tee', 'hoodie', 'jeans'.
+SEARCH_TERMS = sorted({product_type.split()[-1].lower() for product_types in CATEGORIES.values() for product_type in product_types})
+
+__all__ = ['BENCHMARK_USER_EMAIL', 'BENCHMARK_USER_PASSWORD', 'BRANDS', 'CATEGORIES', 'SEARCH_TERMS', 'seed_dataset']
+
+def seed_dataset(products, seed=0, batch_size=1000):
+    """
+    Creates `products` products plus the lookup tables and the benchmark user.
+    Expects a database without catalog rows. Returns a dict of row counts.
+    """
+    counts = seed_catalog(products, seed=seed, batch_size=batch_size, images=False)
+    User = get_user_model()
+    if not User.objects.filter(email=BENCHMARK_USER_EMAIL).exists():
+        User.objects.create_user(
+            email=BENCHMARK_USER_EMAIL, username='bench', password=BENCHMARK_USER_PASSWORD,
+            first_name='Bench', last_name='User',
+        )
+    return counts
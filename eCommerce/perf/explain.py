@@ -0,0 +1,81 @@
+"""
+Query plan analysis for the `explain_queries` command.
+
+Plans are read with EXPLAIN (ANALYZE, FORMAT JSON) on PostgreSQL and EXPLAIN QUERY PLAN on
+SQLite, and reduced to a list of findings:
+  seq_scan      - a full table scan of a table with at least `min_rows` rows
+  temp_sort     - SQLite sorts for ORDER BY in a temporary B-tree (no usable index) in a
+                  query reading a table with at least `min_rows` rows
+  row_estimate  - the planner's row estimate is off by `blowup_factor` or more (PostgreSQL)
+"""
+import json
+from dataclasses import dataclass
+
+@dataclass
+class Finding:
+    kind: str
+    table: str
+    detail: str
+
+def explain(connection, sql, params, analyze=True):
+    """
+    Returns the raw plan for one SELECT: a dict on PostgreSQL, a list of rows on SQLite.
+    Raises ValueError for other databases.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            options = 'ANALYZE, FORMAT JSON' if analyze else 'FORMAT JSON'
+            cursor.execute(f'EXPLAIN ({options}) {sql}', params)
+            plan = cursor.fetchone()[0]
+            return (json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan']
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return cursor.fetchall()
+    raise ValueError(f'EXPLAIN analysis is not supported on {connection.vendor}.')
+
+def table_rows(connection, table):
+    """Returns the (estimated) number of rows in a table."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [table])
+            row = cursor.fetchone()
+            return max(int(row[0]), 0) if row else 0
+        cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0]
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _plan_nodes(child)
+
+def postgresql_findings(plan, row_counts, min_rows, blowup_factor):
+    """Analyses a PostgreSQL JSON plan. row_counts maps table name -> row count."""
+    findings = []
+    for node in _plan_nodes(plan):
+        table = node.get('Relation Name', '')
+        if node['Node Type'] == 'Seq Scan' and row_counts(table) >= min_rows:
+            findings.append(Finding('seq_scan', table, f"Seq Scan on {table} (~{node['Plan Rows']} rows returned)"))
+        if 'Actual Rows' in node:
+            loops = node.get('Actual Loops', 1) or 1
+            estimated, actual = node['Plan Rows'] * loops, node['Actual Rows'] * loops
+            ratio = max(estimated, actual) / max(min(estimated, actual), 1)
+            if ratio >= blowup_factor and max(estimated, actual) >= 100:
+                findings.append(Finding('row_estimate', table, f"{node['Node Type']}: estimated {estimated} rows, got {actual}"))
+    return findings
+
+def sqlite_findings(plan, row_counts, min_rows):
+    """Analyses SQLite EXPLAIN QUERY PLAN rows of (id, parent, notused, detail)."""
+    findings = []
+    largest_table = 0
+    for row in plan:
+        detail = row[-1]
+        if detail.startswith(('SCAN ', 'SEARCH ')):
+            table = detail.split()[1]
+            rows = row_counts(table)
+            largest_table = max(largest_table, rows)
+            if detail.startswith('SCAN ') and 'USING' not in detail and rows >= min_rows:
+                findings.append(Finding('seq_scan', table, detail))
+        elif detail.startswith('USE TEMP B-TREE FOR ORDER BY'):
+            findings.append(Finding('temp_sort', '', detail))
+    # Sorting a handful of rows is not worth reporting.
+    return [f for f in findings if f.kind != 'temp_sort' or largest_table >= min_rows]
@@ -0,0 +1,72 @@
+"""
+Helpers for profiling Django's cold start with `python -X importtime`.
+
+A fresh interpreter is started for each profile, because imports are only timed once per
+process. The child reports how long each start-up phase took, and its importtime output
+(on stderr) is parsed into per-module timings.
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+# Run in the child interpreter. Prints the phase timings (seconds) as JSON on stdout.
+PHASES_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from django.conf import settings
+settings.INSTALLED_APPS
+settings_loaded = time.perf_counter()
+import django
+django.setup()
+apps_loaded = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_loaded = time.perf_counter()
+print(json.dumps({
+    'settings': settings_loaded - started,
+    'apps': apps_loaded - settings_loaded,
+    'urls': urls_loaded - apps_loaded,
+    'total': urls_loaded - started,
+}))
+"""
+
+def parse_importtime(output):
+    """
+    Parses `-X importtime` output into a list of dicts with module, self_us,
+    cumulative_us and depth (0 for modules imported directly by the profiled code).
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue
+        stripped = name.lstrip(' ')
+        modules.append({
+            'module': stripped,
+            'self_us': self_us,
+            'cumulative_us': cumulative_us,
+            'depth': (len(name) - len(stripped) - 1) // 2,
+        })
+    return modules
+
+def self_time_by_package(modules):
+    """Sums self time by top-level package, slowest first: [(package, self_us), ...]."""
+    totals = defaultdict(int)
+    for module in modules:
+        totals[module['module'].split('.')[0]] += module['self_us']
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+def profile_startup(settings_module=None):
+    """Starts Django in a fresh interpreter and returns (phase timings, parsed modules)."""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module or os.environ.get('DJANGO_SETTINGS_MODULE', 'eCommerce.settings')}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PHASES_SCRIPT],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
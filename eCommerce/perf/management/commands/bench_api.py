@@ -0,0 +1,251 @@
+import json
+import random
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import setup_databases, teardown_databases
+from django.urls import reverse
+from eCommerce.db_router import pin_to_primary
+from perf.benchmark import EndpointStats, benchmark_environment, format_table, make_client, timed_request
+from perf.dataset import BENCHMARK_USER_EMAIL, BENCHMARK_USER_PASSWORD, BRANDS, CATEGORIES, SEARCH_TERMS, seed_dataset
+from product.models import Product, ProductVariation
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.models import SiteUser
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'baselines.json'
+
+# (scenario, weight). A cart scenario is four requests: add, view, change quantity, remove.
+REQUEST_MIX = [
+    ('product_list', 30),
+    ('product_list_filtered', 15),
+    ('product_detail', 30),
+    ('cart', 20),
+    ('token', 5),
+]
+
+_SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+class Command(BaseCommand):
+    """
+    Benchmarks every API endpoint against a deterministic catalog.
+
+    By default a throwaway test database is created, seeded with --products products
+    (see perf/dataset.py), and a weighted mix of catalog, cart and token requests chosen
+    by --seed is replayed through the test client. Each endpoint reports p50/p95/p99
+    latency, queries per request and throughput. With --check the results are compared
+    with the stored baseline for the same dataset size, and the command fails if an
+    endpoint got slower than the baseline by more than --latency-tolerance, runs more
+    queries, or returns server errors.
+
+    --url replays the same mix over HTTP against a running server instead; seed the
+    server's database first with --seed-only. Queries per request are then read from
+    the Server-Timing header (run the server with SQL_SERVER_TIMING=True), and login
+    throttling on the server applies to token requests.
+    """
+    help = 'Benchmarks latency, queries and throughput of every API endpoint and checks them against stored baselines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000, help='Products in the benchmark dataset (default: 1000).')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the dataset and the request mix (default: 0).')
+        parser.add_argument('--requests', type=int, default=500, help='Scenarios to replay (default: 500).')
+        parser.add_argument('--warmup', type=int, default=20, help='Unrecorded scenarios to run first (default: 20).')
+        parser.add_argument('--in-place', action='store_true', help='Seed the configured database inside a transaction that is rolled back, instead of creating a test database.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database (and its dataset) between runs.')
+        parser.add_argument('--url', help='Base URL of a running server to benchmark instead of the test client.')
+        parser.add_argument('--seed-only', action='store_true', help='Seed the configured database with the dataset and exit (for --url).')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline file (default: perf/baselines.json).')
+        parser.add_argument('--check', action='store_true', help='Fail if any endpoint regressed against the baseline.')
+        parser.add_argument('--update-baseline', action='store_true', help='Store these results as the baseline for this dataset size.')
+        parser.add_argument('--latency-tolerance', type=float, default=0.5, help='Allowed p95 increase over the baseline, as a fraction (default: 0.5).')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        if options['seed_only']:
+            self._seed(options, require_empty=True)
+            return
+
+        with pin_to_primary(), self._dataset(options):
+            results, wall_time = self._run(options)
+
+        total_requests = sum(result['requests'] for result in results)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.stdout.write(format_table(results, ['name', 'requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_queries', 'throughput_rps']))
+            self.stdout.write(f'\n{total_requests} requests in {wall_time:.1f}s ({total_requests / max(wall_time, 1e-9):.1f} req/s overall)')
+
+        if options['update_baseline']:
+            self._write_baseline(options, results)
+        if options['check']:
+            failures = self._check(options, results)
+            if failures:
+                raise CommandError('Benchmark regressions:\n' + '\n'.join(failures))
+            self.stdout.write(self.style.SUCCESS('All endpoints are within their baselines.'))
+
+    # --- Dataset ---
+
+    @contextmanager
+    def _dataset(self, options):
+        """Provides a database holding the benchmark dataset for the duration of the run."""
+        if options['url']:
+            # The server reads its own database; it must already hold the dataset (see --seed-only).
+            yield
+        elif options['in_place']:
+            with transaction.atomic():
+                self._seed(options, require_empty=False)
+                yield
+                transaction.set_rollback(True)
+        else:
+            old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'], aliases={'default'}, serialized_aliases=set())
+            try:
+                if not Product.objects.exists():
+                    self._seed(options, require_empty=True)
+                yield
+            finally:
+                teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+    def _seed(self, options, require_empty):
+        if require_empty and Product.objects.exists():
+            raise CommandError(f'The {connection.alias} database already has products; seed an empty database.')
+        started = time.perf_counter()
+        with transaction.atomic():
+            counts = seed_dataset(options['products'], seed=options['seed'])
+        self.stderr.write(
+            f"Seeded {counts['products']} products, {counts['items']} colours and {counts['variations']} "
+            f"variations in {time.perf_counter() - started:.1f}s."
+        )
+
+    # --- Replay ---
+
+    def _run(self, options):
+        rng = random.Random(options['seed'])
+        variation_ids = list(ProductVariation.objects.filter(qty_in_stock__gte=2).order_by('id').values_list('id', flat=True))
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+        if not product_ids or not variation_ids:
+            raise CommandError('The database holds no benchmark dataset. Run with --seed-only first.')
+
+        scenarios, weights = zip(*REQUEST_MIX)
+        plan = rng.choices(scenarios, weights, k=options['warmup'] + options['requests'])
+        stats = {}
+        with benchmark_environment(rollback=not options['url']):
+            send = self._http_sender(options['url']) if options['url'] else self._client_sender()
+            started = None
+            for index, scenario in enumerate(plan):
+                if index == options['warmup']:
+                    stats.clear()
+                    started = time.perf_counter()
+                getattr(self, f'_scenario_{scenario}')(send, stats, rng, product_ids, variation_ids)
+            wall_time = time.perf_counter() - (started or time.perf_counter())
+
+        results = []
+        for name, endpoint_stats in stats.items():
+            summary = endpoint_stats.summary()
+            summary['errors'] = sum(count for status, count in summary['statuses'].items() if status >= 400)
+            results.append(summary)
+        return sorted(results, key=lambda result: result['name']), wall_time
+
+    def _client_sender(self):
+        client = make_client()
+        user = SiteUser.objects.get(email=BENCHMARK_USER_EMAIL)
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+        def send(stats, name, method, path, data=None, authenticated=False):
+            kwargs = dict(auth) if authenticated else {}
+            if data is not None:
+                kwargs.update(data=data, content_type='application/json')
+            response, _, _ = timed_request(client, method, path, stats.setdefault(name, EndpointStats(name)), **kwargs)
+            return response.status_code, (response.json() if response.content else None)
+        return send
+
+    def _http_sender(self, base_url):
+        session = requests.Session()
+        token = session.post(base_url.rstrip('/') + reverse('token_obtain_pair'), json={'email': BENCHMARK_USER_EMAIL, 'password': BENCHMARK_USER_PASSWORD}, timeout=30)
+        if token.status_code != 200:
+            raise CommandError(f'Could not log in as {BENCHMARK_USER_EMAIL} ({token.status_code}). Run with --seed-only against the server database first.')
+        auth = {'Authorization': f"Bearer {token.json()['access']}"}
+
+        def send(stats, name, method, path, data=None, authenticated=False):
+            started = time.perf_counter()
+            response = session.request(method, base_url.rstrip('/') + path, json=data, headers=auth if authenticated else None, timeout=30)
+            elapsed = time.perf_counter() - started
+            queries = _SERVER_TIMING_QUERIES.search(response.headers.get('Server-Timing', ''))
+            stats.setdefault(name, EndpointStats(name)).record(elapsed, int(queries.group(1)) if queries else 0, response.status_code)
+            return response.status_code, (response.json() if response.content else None)
+        return send
+
+    # --- Scenarios ---
+
+    def _scenario_product_list(self, send, stats, rng, product_ids, variation_ids):
+        # Most shoppers stay on the first pages.
+        page = 1 if rng.random() < 0.7 else rng.randint(2, 10)
+        send(stats, 'GET products', 'get', f"{reverse('product-list')}?page={page}")
+
+    def _scenario_product_list_filtered(self, send, stats, rng, product_ids, variation_ids):
+        query = rng.choice([
+            f'category={rng.choice(list(CATEGORIES))}',
+            f'brand={rng.choice(BRANDS)}',
+            f'min_price={rng.randint(10, 60)}&max_price={rng.randint(70, 150)}',
+            f'search={rng.choice(SEARCH_TERMS)}',
+            f"ordering={rng.choice(['name', 'price', '-price'])}",
+        ])
+        send(stats, 'GET products (filtered)', 'get', f"{reverse('product-list')}?{query}")
+
+    def _scenario_product_detail(self, send, stats, rng, product_ids, variation_ids):
+        send(stats, 'GET product detail', 'get', reverse('product-detail', kwargs={'id': rng.choice(product_ids)}))
+
+    def _scenario_cart(self, send, stats, rng, product_ids, variation_ids):
+        cart_url = reverse('cart-list')
+        variation_id = rng.choice(variation_ids)
+        status, cart = send(stats, 'POST cart', 'post', cart_url, {'product_variation': variation_id, 'qty': 1}, authenticated=True)
+        send(stats, 'GET cart', 'get', cart_url, authenticated=True)
+        item_ids = [item['id'] for item in cart['items'] if item['product_variation'] == variation_id] if status in (200, 201) else []
+        if item_ids:
+            item_url = reverse('cart-detail', kwargs={'pk': item_ids[0]})
+            send(stats, 'PATCH cart item', 'patch', item_url, {'qty': 2}, authenticated=True)
+            send(stats, 'DELETE cart item', 'delete', item_url, authenticated=True)
+
+    def _scenario_token(self, send, stats, rng, product_ids, variation_ids):
+        send(stats, 'POST token', 'post', reverse('token_obtain_pair'), {'email': BENCHMARK_USER_EMAIL, 'password': BENCHMARK_USER_PASSWORD})
+
+    # --- Baselines ---
+
+    def _load_baselines(self, path):
+        try:
+            return json.loads(Path(path).read_text())
+        except FileNotFoundError:
+            return {}
+
+    def _write_baseline(self, options, results):
+        baselines = self._load_baselines(options['baseline'])
+        baselines[str(options['products'])] = {
+            result['name']: {'p95_ms': round(result['p95_ms'], 2), 'mean_queries': round(result['mean_queries'], 2)}
+            for result in results
+        }
+        Path(options['baseline']).write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+        self.stdout.write(self.style.SUCCESS(f"Baseline for {options['products']} products written to {options['baseline']}."))
+
+    def _check(self, options, results):
+        baseline = self._load_baselines(options['baseline']).get(str(options['products']))
+        if baseline is None:
+            raise CommandError(f"No baseline for {options['products']} products in {options['baseline']}; run with --update-baseline first.")
+        failures = []
+        for result in results:
+            name = result['name']
+            server_errors = sum(count for status, count in result['statuses'].items() if status >= 500)
+            if server_errors:
+                failures.append(f'{name}: {server_errors} server errors')
+            expected = baseline.get(name)
+            if expected is None:
+                continue
+            limit = expected['p95_ms'] * (1 + options['latency_tolerance'])
+            if result['p95_ms'] > limit:
+                failures.append(f"{name}: p95 {result['p95_ms']:.2f}ms > {limit:.2f}ms (baseline {expected['p95_ms']:.2f}ms)")
+            # Query counts do not depend on the machine, so any increase is a regression.
+            if result['mean_queries'] > expected['mean_queries'] + 0.01:
+                failures.append(f"{name}: {result['mean_queries']:.2f} queries per request > baseline {expected['mean_queries']:.2f}")
+        return failures
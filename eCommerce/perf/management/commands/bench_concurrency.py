@@ -0,0 +1,139 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from perf.benchmark import EndpointStats, format_table
+
+SERVER_MODES = ['wsgi', 'asgi']
+
+class Command(BaseCommand):
+    """
+    Load-tests the API over real HTTP connections at increasing concurrency.
+
+    Unlike the other benchmarks, requests go through a real server, so the numbers
+    include worker scheduling: a sync worker serves one request at a time, while an
+    ASGI worker can overlap requests that wait on the database or cache.
+    By default it starts gunicorn once per server mode (see gunicorn.conf.py) with the
+    same worker count, against the configured database, and compares them. Pass --url
+    to measure an already running server instead. Only read-only endpoints should be used.
+    """
+    help = 'Compares throughput and latency percentiles of the WSGI and ASGI servers under concurrent load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server to measure instead of starting gunicorn.')
+        parser.add_argument('--modes', nargs='+', choices=SERVER_MODES, default=SERVER_MODES, help='Server modes to start and compare.')
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers per server (default: 2).')
+        parser.add_argument('--paths', nargs='+', default=['/api/v1/products/'], help='Read-only endpoints to request (default: /api/v1/products/).')
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 8, 32], help='Concurrent connections to test (default: 1 8 32).')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per connection at each level (default: 20).')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        results = []
+        if options['url']:
+            results.extend(self._run_levels(options['url'].rstrip('/'), 'external', options))
+        else:
+            for mode in options['modes']:
+                with self._server(mode, options['workers']) as base_url:
+                    results.extend(self._run_levels(base_url, mode, options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(format_table(results, ['server', 'path', 'concurrency', 'requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps']))
+
+    def _run_levels(self, base_url, server, options):
+        results = []
+        for path in options['paths']:
+            self._fetch(requests.Session(), base_url + path)  # Warm up imports and caches
+            for concurrency in options['concurrency']:
+                stats = EndpointStats(f'{server}: {path}')
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    batches = list(pool.map(
+                        lambda _: self._connection(base_url + path, options['requests']),
+                        range(concurrency),
+                    ))
+                wall_time = time.perf_counter() - started
+                for batch in batches:
+                    for elapsed, status_code in batch:
+                        stats.record(elapsed, 0, status_code)
+
+                summary = stats.summary()
+                errors = sum(count for code, count in summary['statuses'].items() if code == 'error' or code >= 400)
+                results.append({
+                    'server': server,
+                    'path': path,
+                    'concurrency': concurrency,
+                    'requests': summary['requests'],
+                    'errors': errors,
+                    'p50_ms': summary['p50_ms'],
+                    'p95_ms': summary['p95_ms'],
+                    'p99_ms': summary['p99_ms'],
+                    # Overall requests per second across all connections, not per connection.
+                    'throughput_rps': summary['requests'] / wall_time if wall_time else 0.0,
+                })
+        return results
+
+    def _connection(self, url, count):
+        """One keep-alive client connection making `count` sequential requests."""
+        session = requests.Session()
+        return [self._fetch(session, url) for _ in range(count)]
+
+    def _fetch(self, session, url):
+        started = time.perf_counter()
+        try:
+            status_code = session.get(url, timeout=30).status_code
+        except requests.RequestException:
+            status_code = 'error'
+        return time.perf_counter() - started, status_code
+
+    def _server(self, mode, workers):
+        return _GunicornServer(mode, workers, self.stderr)
+
+class _GunicornServer:
+    """Runs gunicorn in the given SERVER_MODE on a free local port for the duration of a with block."""
+    def __init__(self, mode, workers, stderr):
+        self.mode = mode
+        self.workers = workers
+        self.stderr = stderr
+        self.process = None
+
+    def __enter__(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        project_dir = Path(settings.BASE_DIR)
+        env = {**os.environ, 'SERVER_MODE': self.mode, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'eCommerce.settings')}
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', str(project_dir / 'gunicorn.conf.py'),
+             '--bind', f'127.0.0.1:{port}', '--workers', str(self.workers), '--log-level', 'warning'],
+            cwd=project_dir, env=env,
+        )
+        base_url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f'gunicorn exited while starting in {self.mode} mode.')
+            try:
+                requests.get(base_url + '/healthz/', timeout=1)
+                return base_url
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise CommandError(f'gunicorn did not start in {self.mode} mode within 30 seconds.')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
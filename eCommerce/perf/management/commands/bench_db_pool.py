@@ -0,0 +1,102 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from perf.benchmark import (
+    EndpointStats,
+    benchmark_environment,
+    format_table,
+    make_client,
+    timed_request,
+)
+
+MODES = ['none', 'persistent', 'pool']
+
+class Command(BaseCommand):
+    """
+    Measures request latency with and without database connection reuse.
+
+    Django's test client does not fire the request_finished handler that closes
+    connections, so this command calls close_old_connections() after each request,
+    exactly like a gunicorn worker would. Modes:
+      none       - CONN_MAX_AGE=0: a new connection for every request
+      persistent - CONN_MAX_AGE=60 with health checks
+      pool       - psycopg connection pool (PostgreSQL with psycopg 3 only)
+    Only read-only endpoints should be used, since nothing is rolled back.
+    """
+    help = 'Benchmarks request latency with no connection reuse, persistent connections and a psycopg pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per mode (default: 200).')
+        parser.add_argument('--path', default='/api/v1/products/', help='Read-only endpoint to request (default: /api/v1/products/).')
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES, help='Connection modes to compare.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        original = {
+            'CONN_MAX_AGE': connection.settings_dict['CONN_MAX_AGE'],
+            'CONN_HEALTH_CHECKS': connection.settings_dict.get('CONN_HEALTH_CHECKS', False),
+            'OPTIONS': dict(connection.settings_dict.get('OPTIONS', {})),
+        }
+        pool_options = original['OPTIONS'].get('pool') or {'min_size': 2, 'max_size': 4}
+
+        opened = []
+        def count_connection(sender, connection, **kwargs):
+            opened.append(connection.alias)
+        connection_created.connect(count_connection)
+
+        results = []
+        try:
+            for mode in options['modes']:
+                if mode == 'pool' and not self._pool_supported():
+                    self.stderr.write(self.style.WARNING('Skipping pool mode: it needs PostgreSQL with psycopg 3 and psycopg_pool.'))
+                    continue
+                self._configure(mode, original, pool_options)
+                stats = EndpointStats(mode)
+                client = make_client()
+                with benchmark_environment(rollback=False):
+                    timed_request(client, 'get', options['path'])  # Warm up imports and caches
+                    close_old_connections()
+                    opened.clear()
+                    for _ in range(options['requests']):
+                        timed_request(client, 'get', options['path'], stats)
+                        close_old_connections()
+                results.append({**stats.summary(), 'mode': mode, 'connections_opened': len(opened)})
+        finally:
+            connection_created.disconnect(count_connection)
+            connection.close()
+            if connection.settings_dict['OPTIONS'].get('pool') and not original['OPTIONS'].get('pool'):
+                connection.close_pool()
+            connection.settings_dict.update(original)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(format_table(results, ['mode', 'requests', 'connections_opened', 'p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps']))
+
+    def _pool_supported(self):
+        if connection.vendor != 'postgresql':
+            return False
+        try:
+            import psycopg_pool  # noqa: F401
+            from django.db.backends.postgresql.psycopg_any import is_psycopg3
+        except ImportError:
+            return False
+        return is_psycopg3
+
+    def _configure(self, mode, original, pool_options):
+        """Switches the default connection to the given reuse strategy."""
+        connection.close()
+        options = {key: value for key, value in original['OPTIONS'].items() if key != 'pool'}
+        if mode == 'pool':
+            options['pool'] = pool_options
+            connection.settings_dict.update({'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': options})
+        else:
+            if connection.settings_dict['OPTIONS'].get('pool'):
+                connection.close_pool()
+            connection.settings_dict.update({
+                'CONN_MAX_AGE': 0 if mode == 'none' else 60,
+                'CONN_HEALTH_CHECKS': mode == 'persistent',
+                'OPTIONS': options,
+            })
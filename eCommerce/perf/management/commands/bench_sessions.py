@@ -0,0 +1,65 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import reverse
+from perf.benchmark import (
+    EndpointStats,
+    benchmark_environment,
+    format_table,
+    make_client,
+    timed_request,
+)
+from product.models import ProductVariation
+
+class Command(BaseCommand):
+    """
+    Compares guest cart requests across session engines.
+
+    Each simulated guest makes a first visit (GET /cart/, which creates the session),
+    adds an item, and then views the cart again a few times. All database changes are
+    rolled back afterwards. Run with a Redis REDIS_URL/CACHE_URL for meaningful
+    `cache` and `cached_db` numbers; with the default memory cache they are a lower bound.
+    """
+    help = 'Benchmarks DB queries and latency per guest cart request for each session engine.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--guests', type=int, default=50, help='Number of simulated guests per mode (default: 50).')
+        parser.add_argument('--views', type=int, default=3, help='Cart views per guest after adding an item (default: 3).')
+        parser.add_argument('--modes', nargs='+', choices=list(settings.SESSION_ENGINES), default=list(settings.SESSION_ENGINES), help='Session modes to compare.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        variation = ProductVariation.objects.filter(qty_in_stock__gt=0).first()
+        if variation is None:
+            raise CommandError('No product variation in stock. Run seed_db first.')
+
+        cart_url = reverse('cart-list')
+        results = []
+        for mode in options['modes']:
+            stats = {
+                'first_visit': EndpointStats(f'{mode}: first visit'),
+                'add_item': EndpointStats(f'{mode}: add item'),
+                'return_visit': EndpointStats(f'{mode}: return visit'),
+            }
+            with benchmark_environment(), override_settings(SESSION_ENGINE=settings.SESSION_ENGINES[mode]):
+                for _ in range(options['guests']):
+                    # A new client per guest picks up the overridden SESSION_ENGINE.
+                    client = make_client()
+                    timed_request(client, 'get', cart_url, stats['first_visit'])
+                    timed_request(
+                        client, 'post', cart_url, stats['add_item'],
+                        data={'product_variation': variation.id, 'qty': 1},
+                        content_type='application/json',
+                    )
+                    for _ in range(options['views']):
+                        timed_request(client, 'get', cart_url, stats['return_visit'])
+            for scenario, scenario_stats in stats.items():
+                results.append({'mode': mode, 'scenario': scenario, **scenario_stats.summary()})
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(format_table(results, ['mode', 'scenario', 'requests', 'mean_queries', 'p50_ms', 'p95_ms', 'p99_ms']))
@@ -0,0 +1,167 @@
+import json
+import secrets
+from dataclasses import asdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.urls import reverse
+from eCommerce.db_router import pin_to_primary
+from perf.benchmark import benchmark_environment, format_table, make_client
+from cart.models import ShoppingCart, ShoppingCartItem
+from perf.explain import explain, postgresql_findings, sqlite_findings, table_rows
+from product.models import Brand, Product, ProductCategory, ProductVariation
+from product.stock import low_stock_rows
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.models import Country, SiteUser, UserAddress
+
+class Command(BaseCommand):
+    """
+    Runs EXPLAIN on every SELECT issued by the API endpoints (and the check_stock scan)
+    against the current database, and flags sequential scans of large tables, sorts
+    without an index, and row-estimate blowups.
+
+    Endpoints are requested in-process with the test client; all database changes are
+    rolled back and every read is pinned to the primary. Authenticated endpoints use the
+    first active user, whose password is replaced (and restored by the rollback) so that
+    token issuance can be audited too. Run it against a database with
+    production-sized data: on a small database the planner rightly prefers full scans,
+    so scans of tables smaller than --min-rows are not reported.
+    """
+    help = 'EXPLAINs the queries behind each API endpoint and flags sequential scans and bad row estimates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-rows', type=int, default=1000, help='Only flag full scans of tables with at least this many rows (default: 1000).')
+        parser.add_argument('--blowup-factor', type=float, default=10.0, help='Flag row estimates off by this factor or more (default: 10).')
+        parser.add_argument('--no-analyze', action='store_true', help='Use plain EXPLAIN on PostgreSQL instead of EXPLAIN ANALYZE (no row-estimate checks).')
+        parser.add_argument('--show-sql', action='store_true', help='Print the SQL of every flagged query.')
+        parser.add_argument('--fail-on-findings', action='store_true', help='Exit with an error if anything is flagged (for CI).')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'EXPLAIN analysis is not supported on {connection.vendor}.')
+
+        self._row_counts = {}
+        results = []
+        queries = {}  # sql -> query number, so each distinct query is explained once
+        with pin_to_primary(), benchmark_environment():
+            for source, captured in self._captured_queries():
+                for sql, params in captured:
+                    if sql in queries:
+                        continue
+                    queries[sql] = len(queries) + 1
+                    for finding in self._analyse(sql, params, options):
+                        results.append({'query': queries[sql], 'source': source, **asdict(finding), 'sql': sql})
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        elif results:
+            self.stdout.write(format_table(results, ['query', 'source', 'kind', 'table', 'detail']))
+            if options['show_sql']:
+                flagged = {result['query']: result['sql'] for result in results}
+                for number, sql in flagged.items():
+                    self.stdout.write(f"\n[{number}] {sql}")
+        else:
+            self.stdout.write(self.style.SUCCESS(f'No issues found in {len(queries)} distinct queries.'))
+
+        if results and options['fail_on_findings']:
+            raise CommandError(f'{len(results)} query plan issue(s) found.')
+
+    def _captured_queries(self):
+        """Yields (source name, [(sql, params), ...]) for each endpoint and command query."""
+        client = make_client()
+        for name, method, path, kwargs in self._endpoints():
+            queries = []
+            def capture(execute, sql, params, many, context):
+                if sql.lstrip().upper().startswith('SELECT') and not many:
+                    queries.append((sql, params))
+                return execute(sql, params, many, context)
+            with connection.execute_wrapper(capture):
+                getattr(client, method)(path, **kwargs)
+            yield name, queries
+
+        queries = []
+        def capture(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+        with connection.execute_wrapper(capture):
+            for _ in low_stock_rows():
+                pass
+        yield 'check_stock', queries
+
+    def _endpoints(self):
+        """(name, client method, path, request kwargs) for each endpoint, using existing rows for lookups."""
+        products_url = reverse('product-list')
+        cart_url = reverse('cart-list')
+        endpoints = [
+            ('GET products', 'get', products_url, {}),
+            ('GET products ?ordering=name', 'get', products_url + '?ordering=name', {}),
+            ('GET products ?ordering=-price', 'get', products_url + '?ordering=-price', {}),
+            ('GET products ?min_price&max_price', 'get', products_url + '?min_price=20&max_price=60', {}),
+            ('GET products ?search', 'get', products_url + '?search=shirt', {}),
+            ('GET categories', 'get', reverse('category-list'), {}),
+            ('GET brands', 'get', reverse('brand-list'), {}),
+            ('GET cart', 'get', cart_url, {}),
+        ]
+        category = ProductCategory.objects.order_by('id').first()
+        if category:
+            endpoints.append(('GET products ?category', 'get', f'{products_url}?category={category.name}', {}))
+        brand = Brand.objects.order_by('id').first()
+        if brand:
+            endpoints.append(('GET products ?brand', 'get', f'{products_url}?brand={brand.name}', {}))
+        product = Product.objects.order_by('id').first()
+        if product:
+            endpoints.append(('GET product detail', 'get', reverse('product-detail', kwargs={'id': product.id}), {}))
+        variation = ProductVariation.objects.filter(qty_in_stock__gt=0).order_by('id').first()
+        if variation:
+            endpoints.append(('POST cart', 'post', cart_url, {'data': {'product_variation': variation.id, 'qty': 1}, 'content_type': 'application/json'}))
+        user = SiteUser.objects.filter(is_active=True).order_by('id').first()
+        if user:
+            endpoints += self._user_endpoints(user, variation)
+        return endpoints
+
+    def _user_endpoints(self, user, variation):
+        """Endpoints for `user`: addresses, cart items and, last, token issuance with a guest cart to merge."""
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+        json_body = {'content_type': 'application/json', **auth}
+        addresses_url = reverse('user-address-list')
+        endpoints = [('GET addresses', 'get', addresses_url, auth)]
+        country = Country.objects.order_by('id').first()
+        if country:
+            address = {'address_line1': '1 Audit St', 'city': 'Audit', 'region': 'Audit', 'postal_code': '0000', 'country_id': country.id}
+            endpoints.append(('POST address', 'post', addresses_url, {'data': {'address': address}, **json_body}))
+        user_address = UserAddress.objects.filter(user=user).order_by('id').first()
+        if user_address:
+            address_url = reverse('user-address-detail', kwargs={'pk': user_address.pk})
+            endpoints += [
+                ('GET address', 'get', address_url, auth),
+                ('PATCH address', 'patch', address_url, {'data': {'is_default': True}, **json_body}),
+            ]
+        if variation:
+            cart, _ = ShoppingCart.objects.get_or_create(user=user)
+            item, _ = ShoppingCartItem.objects.get_or_create(cart=cart, product_variation=variation, defaults={'qty': 1})
+            item_url = reverse('cart-detail', kwargs={'pk': item.pk})
+            endpoints += [
+                ('PATCH cart item', 'patch', item_url, {'data': {'qty': 1}, **json_body}),
+                ('DELETE cart item', 'delete', item_url, auth),
+            ]
+        password = secrets.token_urlsafe()
+        user.set_password(password)
+        user.save(update_fields=['password'])
+        endpoints.append(('POST token', 'post', reverse('token_obtain_pair'), {'data': {'email': user.email, 'password': password}, 'content_type': 'application/json'}))
+        return endpoints
+
+    def _analyse(self, sql, params, options):
+        plan = explain(connection, sql, params, analyze=not options['no_analyze'])
+        if connection.vendor == 'postgresql':
+            return postgresql_findings(plan, self._table_rows, options['min_rows'], options['blowup_factor'])
+        return sqlite_findings(plan, self._table_rows, options['min_rows'])
+
+    def _table_rows(self, table):
+        if table not in self._row_counts:
+            try:
+                self._row_counts[table] = table_rows(connection, table)
+            except DatabaseError:
+                # Not a real table name (e.g. an alias for a self-join).
+                self._row_counts[table] = 0
+        return self._row_counts[table]
@@ -0,0 +1,79 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from eCommerce.db_router import pin_to_primary
+from perf.benchmark import format_table
+from perf.synthetic import MAX_CATEGORY_DEPTH, BulkCreateWriter, CopyWriter, generate
+from product.cache import invalidate_catalog_cache
+
+class Command(BaseCommand):
+    """
+    Generates a production-scale synthetic catalog, users and carts for benchmarking.
+
+    Rows are appended to whatever the database already holds (lookup rows such as
+    brands, colours and categories are reused by name), with the distributions
+    described in perf/synthetic.py. On PostgreSQL each batch is streamed with COPY;
+    other databases fall back to bulk_create. The rows written and rows per second for
+    every table are reported at the end. Nothing else should write to the same tables
+    while it runs, since primary keys are assigned up front.
+    """
+    help = 'Generates millions of synthetic products, variations, users and cart items using COPY on PostgreSQL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help='Products to generate (default: 10000).')
+        parser.add_argument('--users', type=int, default=1000, help='Users to generate (default: 1000).')
+        parser.add_argument('--cart-rate', type=float, default=0.6, help='Share of users with a cart (default: 0.6).')
+        parser.add_argument('--brands', type=int, default=200, help='Distinct brands (default: 200).')
+        parser.add_argument('--category-depth', type=int, default=3, choices=range(1, MAX_CATEGORY_DEPTH + 1), help='Levels of nested categories (default: 3).')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the generated data (default: 0).')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Products or users per batch and transaction (default: 5000).')
+        parser.add_argument('--method', choices=['auto', 'copy', 'bulk'], default='auto', help='copy (PostgreSQL only), bulk (bulk_create) or auto (default).')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to write to (default: default).')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        if options['products'] < 0 or options['users'] < 0 or options['batch_size'] < 1 or options['brands'] < 1:
+            raise CommandError('--products and --users must not be negative, --batch-size and --brands must be positive.')
+        if not 0 <= options['cart_rate'] <= 1:
+            raise CommandError('--cart-rate must be between 0 and 1.')
+
+        connection = connections[options['database']]
+        method = options['method']
+        if method == 'auto':
+            method = 'copy' if connection.vendor == 'postgresql' else 'bulk'
+        elif method == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError(f'COPY needs PostgreSQL; the {connection.alias} database is {connection.vendor}.')
+        writer = (CopyWriter if method == 'copy' else BulkCreateWriter)(connection)
+
+        started = time.perf_counter()
+        with pin_to_primary():
+            generate(
+                writer,
+                options['products'],
+                options['users'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                category_depth=options['category_depth'],
+                brands=options['brands'],
+                cart_rate=options['cart_rate'],
+                progress=lambda kind, done: self.stderr.write(f"  {done}/{options[kind]} {kind}"),
+            )
+        elapsed = time.perf_counter() - started
+        # Rows written behind the ORM's back leave cached catalog responses stale.
+        invalidate_catalog_cache()
+
+        results = [
+            {'table': table, 'rows': rows, 'seconds': seconds, 'rows_per_s': rows / max(seconds, 1e-9)}
+            for table, (rows, seconds) in writer.stats.items()
+        ]
+        total_rows = sum(result['rows'] for result in results)
+        if options['json']:
+            self.stdout.write(json.dumps({'method': method, 'seconds': elapsed, 'tables': results}, indent=2))
+            return
+        self.stdout.write(format_table(results, ['table', 'rows', 'seconds', 'rows_per_s']))
+        self.stdout.write(
+            f'\n{total_rows} rows with {method} in {elapsed:.1f}s '
+            f'({total_rows / max(elapsed, 1e-9):.0f} rows/s including generation)'
+        )
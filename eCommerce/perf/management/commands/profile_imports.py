@@ -0,0 +1,54 @@
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+from perf.benchmark import format_table
+from perf.importtime import profile_startup, self_time_by_package
+
+class Command(BaseCommand):
+    """
+    Reports where Django's cold start goes: time spent loading settings, populating the
+    app registry and importing the URLconf (views, serializers), the slowest modules by
+    cumulative import time, and the packages with the most self time.
+
+    Each run starts a fresh interpreter, so the numbers match a new gunicorn worker or
+    management command. Use --runs to average out noise.
+    """
+    help = 'Profiles import time during Django start-up (settings, app loading, URLconf).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help='Number of modules and packages to list (default: 15).')
+        parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters to average over (default: 3).')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        runs = []
+        for _ in range(max(1, options['runs'])):
+            try:
+                runs.append(profile_startup())
+            except subprocess.CalledProcessError as exc:
+                raise CommandError(f'Django failed to start in the profiling interpreter:\n{exc.stderr[-2000:]}')
+
+        phases = {phase: sum(run[0][phase] for run in runs) / len(runs) * 1000 for phase in runs[0][0]}
+        # Module timings come from the last run; earlier runs warm the filesystem cache.
+        modules = runs[-1][1]
+        slowest = sorted((m for m in modules if m['depth'] <= 1), key=lambda m: m['cumulative_us'], reverse=True)[:options['top']]
+        packages = self_time_by_package(modules)[:options['top']]
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'phases_ms': phases,
+                'slowest_modules': slowest,
+                'packages_self_us': dict(packages),
+            }, indent=2))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Start-up phases (mean of %d runs)' % len(runs)))
+        self.stdout.write(format_table([{'phase': phase, 'ms': ms} for phase, ms in phases.items()], ['phase', 'ms']))
+        self.stdout.write(self.style.SUCCESS('\nSlowest imports (cumulative)'))
+        self.stdout.write(format_table(
+            [{'module': m['module'], 'cumulative_ms': m['cumulative_us'] / 1000, 'self_ms': m['self_us'] / 1000} for m in slowest],
+            ['module', 'cumulative_ms', 'self_ms'],
+        ))
+        self.stdout.write(self.style.SUCCESS('\nSelf time by package'))
+        self.stdout.write(format_table([{'package': name, 'self_ms': us / 1000} for name, us in packages], ['package', 'self_ms']))
@@ -0,0 +1,178 @@
+"""
+Per-request SQL instrumentation.
+
+QueryInstrumentationMiddleware records every query a request runs (on every configured
+database) through connection.execute_wrapper, and then:
+  - adds a Server-Timing header with the database time, query count and total time
+    (when SQL_SERVER_TIMING is set, by default only under DEBUG),
+  - logs requests slower than SQL_SLOW_REQUEST_MS with their most repeated SQL shapes,
+  - flags N+1 patterns: the same SELECT shape run SQL_N_PLUS_ONE_THRESHOLD or more times.
+    These raise NPlusOneError when SQL_N_PLUS_ONE_RAISE is set (the default in tests)
+    and are logged otherwise; views decorated with allow_repeated_queries are skipped.
+It works in both sync and async middleware chains, so ASGI requests are not adapted into
+a thread on its account.
+"""
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_WHITESPACE = re.compile(r'\s+')
+
+class NPlusOneError(Exception):
+    """Raised when a request repeats the same SELECT once per row of an earlier query."""
+
+def allow_repeated_queries(view):
+    """
+    Exempts a view function from N+1 detection, e.g. one that applies a batch in chunks
+    with the same queries per chunk. View classes set `allow_repeated_queries = True`.
+    """
+    view.allow_repeated_queries = True
+    return view
+
+def _allows_repeated_queries(request):
+    match = request.resolver_match
+    if match is None:
+        return False
+    # Class-based views: Django's as_view sets view_class, DRF's ViewSets set cls.
+    view = getattr(match.func, 'view_class', None) or getattr(match.func, 'cls', None) or match.func
+    return getattr(match.func, 'allow_repeated_queries', False) or getattr(view, 'allow_repeated_queries', False)
+
+def sql_shape(sql):
+    """Normalises SQL so queries differing only in parameters (or IN-list length) match."""
+    return _IN_LIST.sub('(%s...)', _WHITESPACE.sub(' ', sql).strip())
+
+class QueryRecorder:
+    """An execute_wrapper that counts queries and their time per SQL shape and per database."""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shape_counts = Counter()
+        self.shape_durations = defaultdict(float)
+        self.alias_counts = Counter()
+        self.alias_durations = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            shape = sql_shape(sql)
+            self.count += 1
+            self.duration += elapsed
+            self.shape_counts[shape] += 1
+            self.shape_durations[shape] += elapsed
+            alias = context['connection'].alias
+            self.alias_counts[alias] += 1
+            self.alias_durations[alias] += elapsed
+
+    @contextmanager
+    def installed(self):
+        """Records the queries of every configured database inside the block."""
+        with ExitStack() as stack:
+            for connection in connections.all(initialized_only=False):
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def repeated_selects(self, threshold):
+        """Returns [(shape, count)] for SELECT shapes run at least `threshold` times, most repeated first."""
+        return [
+            (shape, count) for shape, count in self.shape_counts.most_common()
+            if count >= threshold and shape.upper().startswith('SELECT')
+        ]
+
+    def top_shapes(self, limit=3):
+        """Returns [(shape, count, seconds)] for the most repeated shapes."""
+        return [(shape, count, self.shape_durations[shape]) for shape, count in self.shape_counts.most_common(limit)]
+
+class QueryRecordingMiddleware:
+    """
+    Base for middleware reporting on the queries of a request: the rest of the chain runs
+    with a QueryRecorder installed, which is passed to record() with the response. The
+    recorder is kept on the request, so middleware further in reuse the outer one instead
+    of wrapping every query again. Sync and async capable.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        recorder = getattr(request, '_query_recorder', None)
+        if recorder is not None:
+            response = self.get_response(request)
+        else:
+            request._query_recorder = recorder = QueryRecorder()
+            with recorder.installed():
+                response = self.get_response(request)
+        return self.record(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        recorder = getattr(request, '_query_recorder', None)
+        if recorder is not None:
+            response = await self.get_response(request)
+        else:
+            request._query_recorder = recorder = QueryRecorder()
+            # Connections are per thread, and async views run their queries on the request's
+            # sync thread (sync_to_async is thread-sensitive), so the wrappers go there.
+            stack = ExitStack()
+            await sync_to_async(stack.enter_context)(recorder.installed())
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        return self.record(request, response, recorder, time.perf_counter() - started)
+
+    def record(self, request, response, recorder, elapsed):
+        """Reports on the request; returns the response."""
+        raise NotImplementedError
+
+class QueryInstrumentationMiddleware(QueryRecordingMiddleware):
+    """Counts queries and DB time per request; see the module docstring."""
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def record(self, request, response, recorder, total):
+        if settings.SQL_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+                f'total;dur={total * 1000:.1f}'
+            )
+
+        if total * 1000 >= settings.SQL_SLOW_REQUEST_MS:
+            shapes = '\n'.join(
+                f"  {count}x {seconds * 1000:.1f}ms  {shape[:300]}"
+                for shape, count, seconds in recorder.top_shapes()
+            )
+            logger.warning(
+                "Slow request %s %s: %.1fms, %d queries, %.1fms in the database. Top queries:\n%s",
+                request.method, request.path, total * 1000, recorder.count, recorder.duration * 1000, shapes,
+            )
+
+        repeated = recorder.repeated_selects(settings.SQL_N_PLUS_ONE_THRESHOLD)
+        if repeated and not _allows_repeated_queries(request):
+            shape, count = repeated[0]
+            message = f"Possible N+1 in {request.method} {request.path}: {count}x {shape[:300]}"
+            if settings.SQL_N_PLUS_ONE_RAISE:
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return response
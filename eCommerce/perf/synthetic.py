@@ -0,0 +1,257 @@
+"""
+Synthetic production-scale data: a catalog plus users and their carts.
+
+generate() appends rows with explicit primary keys, so child rows can point at their
+parents without reading ids back, and hands each table's rows to a writer one batch at a
+time: CopyWriter streams them into PostgreSQL with COPY, BulkCreateWriter falls back to
+bulk_create elsewhere. The distributions follow a real shop rather than uniform noise:
+brand popularity and the products that end up in carts follow a power law, categories are
+nested up to four levels deep, most products come in one or two colours, items carry a
+consecutive run of sizes, some stock is sold out and abandoned carts age over weeks.
+"""
+import math
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from cart.models import ShoppingCart, ShoppingCartItem
+from product.models import Brand, Colour, Product, ProductCategory, ProductImage, ProductItem, ProductVariation, SizeOption
+
+SYNTHETIC_PASSWORD = 'synthetic-password'
+
+# Department > group > product type > collection; products are filed at --category-depth.
+DEPARTMENTS = {'Women': 45, 'Men': 40, 'Kids': 15}
+GROUPS = {
+    'Tops': {'T-Shirts': ['Crewneck Tee', 'V-Neck Tee', 'Graphic Tee'], 'Shirts': ['Oxford Shirt', 'Flannel Shirt', 'Linen Shirt'], 'Hoodies': ['Pullover Hoodie', 'Zip-Up Hoodie'], 'Sweaters': ['Crew Sweater', 'Cardigan']},
+    'Bottoms': {'Jeans': ['Slim Jeans', 'Straight Jeans', 'Bootcut Jeans'], 'Trousers': ['Chinos', 'Cargo Trousers'], 'Shorts': ['Chino Shorts', 'Athletic Shorts']},
+    'Outerwear': {'Jackets': ['Denim Jacket', 'Bomber Jacket', 'Windbreaker'], 'Coats': ['Parka', 'Trench Coat']},
+    'Footwear': {'Sneakers': ['Running Shoe', 'Court Sneaker', 'High-Top'], 'Boots': ['Chelsea Boot', 'Hiking Boot']},
+    'Accessories': {'Hats': ['Baseball Cap', 'Beanie', 'Bucket Hat'], 'Bags': ['Tote Bag', 'Backpack']},
+}
+GROUP_WEIGHTS = {'Tops': 35, 'Bottoms': 25, 'Outerwear': 12, 'Footwear': 15, 'Accessories': 13}
+# Median price per group; prices are log-normal around it.
+GROUP_PRICES = {'Tops': 30, 'Bottoms': 55, 'Outerwear': 110, 'Footwear': 90, 'Accessories': 25}
+COLLECTIONS = ['Essentials', 'Performance', 'Heritage', 'Limited']
+MAX_CATEGORY_DEPTH = 4
+
+COLOUR_WEIGHTS = {
+    'Black': 20, 'White': 15, 'Navy': 10, 'Grey': 10, 'Blue': 8, 'Red': 6, 'Green': 6,
+    'Beige': 5, 'Brown': 5, 'Olive': 4, 'Pink': 4, 'Yellow': 3, 'Purple': 2, 'Orange': 2,
+}
+COLOURS_PER_PRODUCT = {1: 45, 2: 25, 3: 15, 4: 8, 5: 5, 6: 2}
+# Size system per group, in display order.
+APPAREL_SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+SHOE_SIZES = [str(size) for size in range(38, 47)]
+SIZE_SYSTEMS = {'Footwear': SHOE_SIZES, 'Accessories': ['One Size']}
+
+BRAND_PREFIXES = ['North', 'Urban', 'Blue', 'Iron', 'Wild', 'Silver', 'Stone', 'Red', 'True', 'High', 'Old', 'Bright', 'Coast', 'Field', 'Summit', 'Harbor', 'Pine', 'Golden', 'Swift', 'Grand']
+BRAND_SUFFIXES = ['line', 'wear', 'craft', 'works', 'thread', 'supply', 'ridge', 'goods', 'mode', 'loom', 'peak', 'row', 'stitch', 'form', 'cloth', 'trail', 'yard', 'hive', 'mill', 'port']
+ADJECTIVES = ['Classic', 'Essential', 'Vintage', 'Sport', 'Everyday', 'Premium', 'Relaxed', 'Organic', 'Lightweight', 'Heavyweight', 'Recycled', 'Tailored']
+DESCRIPTION_SENTENCES = [
+    'Cut for an easy, relaxed fit.', 'Made from responsibly sourced materials.', 'Reinforced seams for everyday wear.',
+    'Garment-dyed for a soft, lived-in feel.', 'Pairs with everything in your wardrobe.', 'Breathable fabric keeps you cool.',
+    'Designed to layer through the seasons.', 'Finished with tonal stitching.', 'Pre-washed to minimise shrinkage.',
+]
+CARE_INSTRUCTIONS = ['Machine wash cold. Tumble dry low.', 'Hand wash only. Dry flat.', 'Wipe clean with a damp cloth.', 'Dry clean only.']
+
+def brand_name(index):
+    """The index-th synthetic brand name: Northline, Urbanline, ..., then numbered repeats."""
+    combinations = len(BRAND_PREFIXES) * len(BRAND_SUFFIXES)
+    name = BRAND_PREFIXES[index % len(BRAND_PREFIXES)] + BRAND_SUFFIXES[index // len(BRAND_PREFIXES) % len(BRAND_SUFFIXES)]
+    return name if index < combinations else f'{name} {index // combinations + 1}'
+
+class RowWriter:
+    """Writes batches of rows, given as tuples of values for `fields`, and times them per table."""
+    def __init__(self, connection):
+        self.connection = connection
+        self.stats = {}  # db_table -> [rows, seconds]
+
+    def write(self, model, fields, rows):
+        started = time.perf_counter()
+        self._write(model, fields, rows)
+        stats = self.stats.setdefault(model._meta.db_table, [0, 0.0])
+        stats[0] += len(rows)
+        stats[1] += time.perf_counter() - started
+
+    def finish(self, models):
+        """Moves each model's id sequence past the explicit ids that were written."""
+        with self.connection.cursor() as cursor:
+            for sql in self.connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+class CopyWriter(RowWriter):
+    """Streams rows into PostgreSQL with COPY ... FROM STDIN (psycopg 3)."""
+    def _write(self, model, fields, rows):
+        quote = self.connection.ops.quote_name
+        columns = ', '.join(quote(model._meta.get_field(field).column) for field in fields)
+        with self.connection.cursor() as cursor:
+            with cursor.copy(f'COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(row)
+
+class BulkCreateWriter(RowWriter):
+    """Inserts rows with bulk_create, for databases without COPY."""
+    def _write(self, model, fields, rows):
+        manager = model.objects.using(self.connection.alias)
+        objs = manager.bulk_create([model(**dict(zip(fields, row))) for row in rows], batch_size=2000)
+        # bulk_create stamps auto_now and auto_now_add fields with the current time; restore the generated values.
+        stamped = [index for index, field in enumerate(fields) if getattr(model._meta.get_field(field), 'auto_now', False) or getattr(model._meta.get_field(field), 'auto_now_add', False)]
+        if stamped and objs:
+            for obj, row in zip(objs, rows):
+                for index in stamped:
+                    setattr(obj, fields[index], row[index])
+            manager.bulk_update(objs, [fields[index] for index in stamped], batch_size=500)
+
+def _next_id(model, using):
+    return (model.objects.using(using).aggregate(last=Max('id'))['last'] or 0) + 1
+
+def _cumulative(weights):
+    total, cumulative = 0, []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+def _named_ids(model, field, names, using, defaults=None):
+    """Returns {name: id}, reusing existing rows with those names and creating the rest."""
+    ids = dict(model.objects.using(using).filter(**{f'{field}__in': names}).values_list(field, 'id'))
+    created = model.objects.using(using).bulk_create(model(**{field: name, **(defaults or {}).get(name, {})}) for name in names if name not in ids)
+    ids.update((getattr(obj, field), obj.id) for obj in created)
+    return ids
+
+def _category_ids(depth, using):
+    """Returns {path: id} for every category path up to `depth` levels, reusing existing rows."""
+    existing = {(parent, name): id for id, parent, name in ProductCategory.objects.using(using).values_list('id', 'parent_category_id', 'name')}
+    levels = [list(DEPARTMENTS), list(GROUPS), None, COLLECTIONS]
+    ids, paths = {}, [()]
+    for level in range(depth):
+        children = []
+        for path in paths:
+            # Product types depend on the group above them.
+            names = levels[level] if levels[level] is not None else list(GROUPS[path[1]])
+            children.extend(path + (name,) for name in names)
+        missing = [path for path in children if (ids.get(path[:-1]), path[-1]) not in existing]
+        created = ProductCategory.objects.using(using).bulk_create(ProductCategory(parent_category_id=ids.get(path[:-1]), name=path[-1]) for path in missing)
+        existing.update(((obj.parent_category_id, obj.name), obj.id) for obj in created)
+        ids.update((path, existing[(ids.get(path[:-1]), path[-1])]) for path in children)
+        paths = children
+    return ids
+
+def generate(writer, products, users, seed=0, batch_size=5000, category_depth=3, brands=200, cart_rate=0.6, progress=None):
+    """
+    Appends `products` products (with their colours, default images and sizes) and
+    `users` users, a share `cart_rate` of them with a cart, through `writer`. Each batch of
+    `batch_size` products or users is written in its own transaction. The generated
+    values (apart from timestamps) depend only on the arguments. `progress(kind, done)`
+    is called after every batch.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    using = writer.connection.alias
+    categories = _category_ids(category_depth, using)
+    brand_names = [brand_name(index) for index in range(brands)]
+    brand_name_ids = _named_ids(Brand, 'name', brand_names, using)
+    brand_ids = [brand_name_ids[name] for name in brand_names]
+    brand_weights = _cumulative(1 / (rank + 1) ** 1.1 for rank in range(len(brand_ids)))
+    colour_ids = _named_ids(Colour, 'colour_name', list(COLOUR_WEIGHTS), using)
+    colours, colour_weights = list(COLOUR_WEIGHTS), _cumulative(COLOUR_WEIGHTS.values())
+    size_names = APPAREL_SIZES + SHOE_SIZES + ['One Size']
+    size_ids = _named_ids(SizeOption, 'size_name', size_names, using, {name: {'sort_order': index} for index, name in enumerate(size_names)})
+    departments, department_weights = list(DEPARTMENTS), _cumulative(DEPARTMENTS.values())
+    groups, group_weights = list(GROUPS), _cumulative(GROUP_WEIGHTS[group] for group in GROUPS)
+    colour_counts, colour_count_weights = list(COLOURS_PER_PRODUCT), _cumulative(COLOURS_PER_PRODUCT.values())
+
+    product_id, item_id, image_id, variation_id = (_next_id(model, using) for model in (Product, ProductItem, ProductImage, ProductVariation))
+    first_variation_id = variation_id
+    for start in range(0, products, batch_size):
+        product_rows, item_rows, image_rows, variation_rows = [], [], [], []
+        for _ in range(min(batch_size, products - start)):
+            department = rng.choices(departments, cum_weights=department_weights)[0]
+            group = rng.choices(groups, cum_weights=group_weights)[0]
+            product_type = rng.choice(list(GROUPS[group]))
+            path = (department, group, product_type, rng.choice(COLLECTIONS))[:category_depth]
+            name = f'{rng.choice(ADJECTIVES)} {rng.choice(GROUPS[group][product_type])}'
+            product_rows.append((
+                product_id, categories[path], rng.choices(brand_ids, cum_weights=brand_weights)[0], name,
+                ' '.join(rng.sample(DESCRIPTION_SENTENCES, 3)), rng.choice(CARE_INSTRUCTIONS), '',
+            ))
+
+            sizes = SIZE_SYSTEMS.get(group, APPAREL_SIZES)
+            median_price = GROUP_PRICES[group]
+            product_colours = []
+            for _ in range(rng.choices(colour_counts, cum_weights=colour_count_weights)[0]):
+                colour = rng.choices(colours, cum_weights=colour_weights)[0]
+                if colour not in product_colours:
+                    product_colours.append(colour)
+            for colour in product_colours:
+                original_price = Decimal(max(5.0, round(median_price * math.exp(rng.gauss(0, 0.4)), 0)) - 0.01).quantize(Decimal('0.01'))
+                on_sale = rng.random() < 0.15
+                sale_price = (original_price * Decimal(1 - rng.choice([0.1, 0.2, 0.3, 0.4]))).quantize(Decimal('0.01')) if on_sale else None
+                sku = f'SYN-{item_id:09d}'
+                item_rows.append((item_id, product_id, colour_ids[colour], sku, original_price, sale_price))
+                image_rows.append((image_id, item_id, f'products/synthetic/{sku}.jpg', True))
+                image_id += 1
+
+                # Mostly full size runs; the rest drop sizes from either end.
+                count = len(sizes) - min(int(rng.expovariate(1.0)), len(sizes) - 1)
+                first = rng.randint(0, len(sizes) - count)
+                for size in sizes[first:first + count]:
+                    qty = 0 if rng.random() < 0.08 else min(1 + int(rng.expovariate(1 / 25)), 500)
+                    variation_rows.append((variation_id, item_id, size_ids[size], qty))
+                    variation_id += 1
+                item_id += 1
+            product_id += 1
+
+        with transaction.atomic(using=using):
+            writer.write(Product, ['id', 'category_id', 'brand_id', 'name', 'description', 'care_instructions', 'about'], product_rows)
+            writer.write(ProductItem, ['id', 'product_id', 'colour_id', 'sku_base', 'original_price', 'sale_price'], item_rows)
+            writer.write(ProductImage, ['id', 'product_item_id', 'image_filename', 'is_default'], image_rows)
+            writer.write(ProductVariation, ['id', 'product_item_id', 'size_id', 'qty_in_stock'], variation_rows)
+        if progress:
+            progress('products', start + len(product_rows))
+
+    variations = variation_id - first_variation_id
+    User = get_user_model()
+    password = make_password(SYNTHETIC_PASSWORD)  # Hashed once; hashing per user would dominate the run
+    user_id, cart_id, cart_item_id = (_next_id(model, using) for model in (User, ShoppingCart, ShoppingCartItem))
+    for start in range(0, users, batch_size):
+        user_rows, cart_rows, cart_item_rows = [], [], []
+        for _ in range(min(batch_size, users - start)):
+            joined = now - timedelta(days=rng.uniform(0, 730))
+            user_rows.append((
+                user_id, password, None, False, f'synthetic-{user_id}', 'Synthetic', f'User {user_id}',
+                f'synthetic-{user_id}@example.com', False, True, joined, None,
+            ))
+            if variations and rng.random() < cart_rate:
+                # Recent activity is most likely; abandoned carts trail off over weeks.
+                updated = max(joined, now - timedelta(days=rng.expovariate(1 / 7)))
+                cart_rows.append((cart_id, user_id, None, max(joined, updated - timedelta(hours=rng.expovariate(1 / 24))), updated))
+                chosen = set()
+                for _ in range(1 + min(int(rng.expovariate(1 / 2.5)), 19)):
+                    # Low ids are the popular variations: a power law over the catalog.
+                    chosen.add(first_variation_id + int(variations * rng.random() ** 3))
+                for chosen_id in sorted(chosen):
+                    cart_item_rows.append((cart_item_id, cart_id, chosen_id, rng.choices([1, 2, 3], [80, 15, 5])[0]))
+                    cart_item_id += 1
+                cart_id += 1
+            user_id += 1
+
+        with transaction.atomic(using=using):
+            writer.write(User, [
+                'id', 'password', 'last_login', 'is_superuser', 'username', 'first_name', 'last_name',
+                'email', 'is_staff', 'is_active', 'date_joined', 'phone_number',
+            ], user_rows)
+            writer.write(ShoppingCart, ['id', 'user_id', 'session_key', 'created_at', 'updated_at'], cart_rows)
+            writer.write(ShoppingCartItem, ['id', 'cart_id', 'product_variation_id', 'qty'], cart_item_rows)
+        if progress:
+            progress('users', start + len(user_rows))
+
+    writer.finish([Product, ProductItem, ProductImage, ProductVariation, User, ShoppingCart, ShoppingCartItem])
@@ -0,0 +1,54 @@
+"""
+Query-budget assertions for API tests.
+
+A view that runs a query per row passes correctness tests on the handful of rows a test
+creates and falls over on a real catalog. QueryBudgetMixin runs the same request against
+a small and a large dataset and checks that both run the same number of queries, and no
+more than the budget declared for the view.
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+from perf.middleware import sql_shape
+
+# Related rows created for the small and the large run.
+QUERY_BUDGET_SIZES = (5, 200)
+
+class QueryBudgetMixin:
+    """Mixin for TestCase/APITestCase classes; see assertQueryBudget."""
+    query_budget_sizes = QUERY_BUDGET_SIZES
+
+    def assertQueryBudget(self, budget, populate, request, status_code=200):
+        """
+        For each size in query_budget_sizes, calls populate(size) to create that many
+        related rows, then request(populated) where `populated` is whatever populate
+        returned, and counts the request's queries. Each size runs in a savepoint that is
+        rolled back, so both runs start from the same state.
+
+        Fails if a response has an unexpected status, if the query count changes with the
+        size (listing the queries that were added), or if it exceeds `budget`.
+        """
+        runs = {}
+        for size in self.query_budget_sizes:
+            queries = []
+            def record(execute, sql, params, many, context):
+                queries.append(sql)  # Unformatted, so the same query with other parameters has the same shape
+                return execute(sql, params, many, context)
+
+            with transaction.atomic():
+                populated = populate(size)
+                with connection.execute_wrapper(record):
+                    response = request(populated)
+                transaction.set_rollback(True)
+            self.assertEqual(response.status_code, status_code, f'Unexpected status with {size} rows: {getattr(response, "data", response)}')
+            runs[size] = queries
+
+        (small, small_sql), (large, large_sql) = runs.items()
+        if len(small_sql) != len(large_sql):
+            added = Counter(map(sql_shape, large_sql)) - Counter(map(sql_shape, small_sql))
+            details = '\n'.join(f'  +{count}x {shape[:300]}' for shape, count in added.most_common(5))
+            self.fail(f'{len(small_sql)} queries with {small} rows but {len(large_sql)} with {large} rows:\n{details}')
+        self.assertLessEqual(
+            len(large_sql), budget,
+            f'{len(large_sql)} queries exceed the budget of {budget}:\n' + '\n'.join(f'  {sql[:300]}' for sql in large_sql),
+        )
@@ -0,0 +1,390 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from asgiref.sync import iscoroutinefunction
+from cart.models import ShoppingCart, ShoppingCartItem
+from django.core.management import CommandError, call_command
+from django.http import JsonResponse
+from django.db import connection
+from django.test import Client, LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import path, reverse
+from django.utils import timezone
+from perf.benchmark import EndpointStats, percentile
+from perf.dataset import seed_dataset
+from perf.explain import explain, postgresql_findings, sqlite_findings
+from perf.management.commands.bench_db_pool import Command as BenchDbPoolCommand
+from perf.importtime import parse_importtime, self_time_by_package
+from perf.middleware import NPlusOneError, QueryInstrumentationMiddleware, allow_repeated_queries, sql_shape
+from perf.synthetic import CopyWriter
+from product.models import Brand, Colour, Product, ProductCategory, ProductImage, ProductItem, ProductVariation, SizeOption
+from users.models import Address, Country, SiteUser, UserAddress
+
+def n_plus_one_view(request):
+    """Loads each product's brand with its own query."""
+    return JsonResponse({'brands': [product.brand.name for product in Product.objects.all()]})
+
+@allow_repeated_queries
+def batch_view(request):
+    """Runs the same query per chunk on purpose."""
+    return n_plus_one_view(request)
+
+def select_related_view(request):
+    return JsonResponse({'brands': [product.brand.name for product in Product.objects.select_related('brand')]})
+
+async def async_select_related_view(request):
+    return JsonResponse({'brands': [product.brand.name async for product in Product.objects.select_related('brand')]})
+
+urlpatterns = [
+    path('n-plus-one/', n_plus_one_view),
+    path('batch/', batch_view),
+    path('select-related/', select_related_view),
+    path('async-select-related/', async_select_related_view),
+]
+
+class BenchmarkHelperTests(TestCase):
+    """
+    Tests for the shared benchmark helpers.
+    """
+    def test_percentile_interpolates(self):
+        values = [1, 2, 3, 4, 5]
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile(values, 50), 3)
+        self.assertEqual(percentile(values, 100), 5)
+        self.assertAlmostEqual(percentile([10, 20], 95), 19.5)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_endpoint_stats_summary(self):
+        stats = EndpointStats('demo')
+        stats.record(0.010, 3, 200)
+        stats.record(0.030, 5, 200)
+        summary = stats.summary()
+        self.assertEqual(summary['requests'], 2)
+        self.assertEqual(summary['mean_queries'], 4)
+        self.assertEqual(summary['max_queries'], 5)
+        self.assertAlmostEqual(summary['p50_ms'], 20.0)
+        self.assertEqual(summary['statuses'], {200: 2})
+
+class ImportTimeTests(TestCase):
+    """
+    Tests for the `-X importtime` parser used by `profile_imports`.
+    """
+    def test_parses_modules_and_sums_packages(self):
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |     django.utils",
+            "import time:       300 |        400 |   django.db",
+            "import time:        50 |         50 |   redis",
+            "import time:        20 |        470 | eCommerce.settings",
+        ])
+        modules = parse_importtime(output)
+        self.assertEqual([m['module'] for m in modules], ['django.utils', 'django.db', 'redis', 'eCommerce.settings'])
+        self.assertEqual([m['depth'] for m in modules], [2, 1, 1, 0])
+        self.assertEqual(modules[1]['cumulative_us'], 400)
+        self.assertEqual(self_time_by_package(modules), [('django', 400), ('redis', 50), ('eCommerce', 20)])
+
+class BenchSessionsCommandTests(TestCase):
+    """
+    Smoke tests for the `bench_sessions` management command.
+    """
+    def setUp(self):
+        product = Product.objects.create(
+            name='Bench Tee',
+            category=ProductCategory.objects.create(name='Apparel'),
+            brand=Brand.objects.create(name='Bench'),
+        )
+        item = ProductItem.objects.create(product=product, colour=Colour.objects.create(colour_name='Red'), sku_base='BENCH-TEE-RED', original_price=10)
+        ProductVariation.objects.create(product_item=item, size=SizeOption.objects.create(size_name='M'), qty_in_stock=1000)
+
+    def test_cache_sessions_use_fewer_queries_than_db_sessions(self):
+        out = StringIO()
+        call_command('bench_sessions', guests=2, views=2, modes=['db', 'cache', 'signed_cookies'], json=True, stdout=out)
+        results = {(r['mode'], r['scenario']): r for r in json.loads(out.getvalue())}
+
+        self.assertEqual(results[('db', 'return_visit')]['statuses'], {'200': 4})
+        self.assertLess(results[('cache', 'return_visit')]['mean_queries'], results[('db', 'return_visit')]['mean_queries'])
+        self.assertLess(results[('signed_cookies', 'first_visit')]['mean_queries'], results[('db', 'first_visit')]['mean_queries'])
+
+class BenchDbPoolCommandTests(TransactionTestCase):
+    """
+    Smoke tests for the `bench_db_pool` management command. It closes and reopens the
+    connection, so it cannot run inside a test transaction.
+    """
+    def test_reports_each_supported_mode_and_restores_settings(self):
+        before = dict(connection.settings_dict)
+        out = StringIO()
+        call_command('bench_db_pool', requests=3, modes=['none', 'persistent', 'pool'], json=True, stdout=out, stderr=StringIO())
+        results = json.loads(out.getvalue())
+
+        # Pool mode needs PostgreSQL with psycopg 3; elsewhere it is skipped.
+        expected = ['none', 'persistent'] + (['pool'] if BenchDbPoolCommand()._pool_supported() else [])
+        self.assertEqual([r['mode'] for r in results], expected)
+        self.assertTrue(all(r['requests'] == 3 for r in results))
+        opened = {r['mode']: r['connections_opened'] for r in results}
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # The in-memory test database is never closed, so no mode opens a connection.
+            self.assertEqual(opened, dict.fromkeys(expected, 0))
+        else:
+            self.assertEqual((opened['none'], opened['persistent']), (3, 0))
+        self.assertEqual(connection.settings_dict['CONN_MAX_AGE'], before['CONN_MAX_AGE'])
+
+class BenchApiCommandTests(TestCase):
+    """
+    Tests for the benchmark dataset and the `bench_api` command. The command runs with
+    --in-place, so it uses the test database instead of creating another one.
+    """
+    def catalog_snapshot(self):
+        return list(ProductVariation.objects.order_by('product_item__sku_base', 'size__sort_order').values_list(
+            'product_item__product__name', 'product_item__sku_base', 'product_item__original_price',
+            'product_item__sale_price', 'size__size_name', 'qty_in_stock',
+        ))
+
+    def test_dataset_is_deterministic(self):
+        counts = seed_dataset(25, seed=7, batch_size=10)
+        self.assertEqual(counts['products'], 25)
+        first = self.catalog_snapshot()
+        for model in (Product, ProductCategory, Brand, Colour, SizeOption):
+            model.objects.all().delete()
+
+        seed_dataset(25, seed=7, batch_size=10)
+        self.assertEqual(self.catalog_snapshot(), first)
+
+    def run_benchmark(self, baseline, *args):
+        call_command(
+            'bench_api', '--in-place', '--products', '30', '--requests', '30', '--warmup', '0',
+            '--baseline', str(baseline), *args, stdout=StringIO(), stderr=StringIO(),
+        )
+
+    def test_baseline_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = Path(directory) / 'baselines.json'
+            self.run_benchmark(baseline, '--update-baseline')
+            endpoints = json.loads(baseline.read_text())['30']
+            self.assertTrue({'GET products', 'GET product detail', 'POST cart', 'GET cart'} <= set(endpoints))
+            # The same dataset and request mix run the same queries.
+            self.run_benchmark(baseline, '--check', '--latency-tolerance', '1000')
+
+            endpoints['GET products']['mean_queries'] -= 1
+            baseline.write_text(json.dumps({'30': endpoints}))
+            with self.assertRaisesMessage(CommandError, 'GET products'):
+                self.run_benchmark(baseline, '--check', '--latency-tolerance', '1000')
+
+    def test_check_requires_a_baseline_for_the_dataset_size(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaisesMessage(CommandError, 'No baseline for 30 products'):
+                self.run_benchmark(Path(directory) / 'missing.json', '--check')
+
+class GenerateCatalogCommandTests(TestCase):
+    """Tests for the synthetic data generator, using its bulk_create path on SQLite."""
+    def generate(self, *args):
+        stdout = StringIO()
+        call_command('generate_catalog', '--products', '40', '--users', '20', '--batch-size', '15', '--brands', '5', *args, stdout=stdout, stderr=StringIO())
+        return stdout.getvalue()
+
+    def test_generates_catalog_users_and_carts(self):
+        output = self.generate('--cart-rate', '1', '--category-depth', '4')
+        self.assertIn('rows with bulk', output)
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(ProductImage.objects.count(), ProductItem.objects.count())
+        self.assertFalse(Product.objects.filter(items__isnull=True).exists())
+        self.assertFalse(ProductItem.objects.filter(variations__isnull=True).exists())
+        self.assertEqual(Brand.objects.count(), 5)
+        # Products are filed under Department > Group > Type > Collection.
+        self.assertFalse(Product.objects.filter(category__parent_category__parent_category__parent_category__isnull=True).exists())
+        self.assertEqual(SiteUser.objects.filter(cart__isnull=False).count(), 20)
+        self.assertTrue(ShoppingCartItem.objects.exists())
+        # Cart ages come from the generator, not from auto_now.
+        self.assertLess(ShoppingCart.objects.order_by('updated_at').first().updated_at, timezone.now() - timezone.timedelta(minutes=1))
+
+    def test_appends_and_reuses_lookup_rows(self):
+        self.generate('--seed', '1')
+        categories, colours = ProductCategory.objects.count(), Colour.objects.count()
+        self.generate('--seed', '2')
+        self.assertEqual(Product.objects.count(), 80)
+        self.assertEqual(SiteUser.objects.count(), 40)
+        self.assertEqual((ProductCategory.objects.count(), Colour.objects.count()), (categories, colours))
+        # Sequences continue after the explicit ids.
+        Brand.objects.create(name='Added later')
+
+    def test_every_query_uses_the_target_database(self):
+        # A query left to the router would go to the unknown alias and fail.
+        with patch('eCommerce.db_router.ReplicaRouter.db_for_read', return_value='nowhere'), \
+                patch('eCommerce.db_router.ReplicaRouter.db_for_write', return_value='nowhere'):
+            self.generate('--database', 'default')
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(Brand.objects.count(), 5)
+
+    def test_copy_requires_postgresql(self):
+        with self.assertRaisesMessage(CommandError, 'COPY needs PostgreSQL'):
+            self.generate('--method', 'copy')
+
+    def test_copy_writer_streams_rows(self):
+        connection = MagicMock()
+        connection.ops.quote_name = lambda name: f'"{name}"'
+        cursor = connection.cursor.return_value.__enter__.return_value
+        copy = cursor.copy.return_value.__enter__.return_value
+        writer = CopyWriter(connection)
+        writer.write(Brand, ['id', 'name'], [(1, 'Northline'), (2, 'Urbanline')])
+
+        cursor.copy.assert_called_once_with('COPY "product_brand" ("id", "name") FROM STDIN')
+        self.assertEqual([call.args[0] for call in copy.write_row.call_args_list], [(1, 'Northline'), (2, 'Urbanline')])
+        self.assertEqual(writer.stats['product_brand'][0], 2)
+
+class BenchConcurrencyCommandTests(LiveServerTestCase):
+    """
+    Smoke tests for the `bench_concurrency` management command against a live server.
+    """
+    def test_reports_each_concurrency_level(self):
+        out = StringIO()
+        call_command('bench_concurrency', url=self.live_server_url, concurrency=[1, 2], requests=2, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+
+        self.assertEqual([r['concurrency'] for r in results], [1, 2])
+        self.assertEqual([r['requests'] for r in results], [2, 4])
+        self.assertTrue(all(r['errors'] == 0 for r in results))
+
+class ExplainAnalysisTests(TestCase):
+    """
+    Tests for the query plan analysis used by `explain_queries`.
+    """
+    def test_sqlite_flags_full_scans_of_large_tables_and_sorts(self):
+        plan = [
+            (2, 0, 0, 'SCAN product_product'),
+            (3, 0, 0, 'SCAN product_brand'),
+            (4, 0, 0, 'SEARCH product_productitem USING INDEX product_productitem_product_id (product_id=?)'),
+            (5, 0, 0, 'USE TEMP B-TREE FOR ORDER BY'),
+        ]
+        row_counts = {'product_product': 5000, 'product_brand': 10, 'product_productitem': 8000}.get
+        findings = sqlite_findings(plan, row_counts, min_rows=1000)
+        self.assertEqual([(f.kind, f.table) for f in findings], [('seq_scan', 'product_product'), ('temp_sort', '')])
+
+    def test_postgresql_flags_seq_scans_and_row_estimate_blowups(self):
+        plan = {
+            'Node Type': 'Nested Loop', 'Plan Rows': 10, 'Actual Rows': 4000, 'Actual Loops': 1,
+            'Plans': [
+                {'Node Type': 'Seq Scan', 'Relation Name': 'product_productvariation', 'Plan Rows': 20, 'Actual Rows': 25, 'Actual Loops': 1},
+                {'Node Type': 'Index Scan', 'Relation Name': 'product_productitem', 'Plan Rows': 1, 'Actual Rows': 1, 'Actual Loops': 25},
+            ],
+        }
+        findings = postgresql_findings(plan, lambda table: 50000, min_rows=1000, blowup_factor=10)
+        self.assertEqual(
+            [(f.kind, f.table) for f in findings],
+            [('row_estimate', ''), ('seq_scan', 'product_productvariation')],
+        )
+
+    def test_other_databases_are_rejected(self):
+        connection = MagicMock(vendor='mysql')
+        with self.assertRaisesMessage(ValueError, 'not supported on mysql'):
+            explain(connection, 'SELECT 1', [])
+
+class ExplainQueriesCommandTests(TestCase):
+    """
+    Smoke tests for the `explain_queries` management command on the test database.
+    """
+    def setUp(self):
+        product = Product.objects.create(
+            name='Audit Tee',
+            category=ProductCategory.objects.create(name='Apparel'),
+            brand=Brand.objects.create(name='Audit'),
+        )
+        item = ProductItem.objects.create(product=product, colour=Colour.objects.create(colour_name='Red'), sku_base='AUDIT-TEE-RED', original_price=10)
+        ProductVariation.objects.create(product_item=item, size=SizeOption.objects.create(size_name='M'), qty_in_stock=3)
+        self.user = SiteUser.objects.create_user(email='audit@example.com', username='audit', password='secret')
+        address = Address.objects.create(address_line1='1 Main St', city='Town', region='Region', postal_code='1000', country=Country.objects.create(name='Testland'))
+        UserAddress.objects.create(user=self.user, address=address)
+
+    def test_audits_authenticated_endpoints_and_rolls_back(self):
+        requests = []
+        original = Client.request
+        def record(client, **request):
+            response = original(client, **request)
+            requests.append((request['REQUEST_METHOD'], request['PATH_INFO'], response.status_code))
+            return response
+
+        with patch.object(Client, 'request', record):
+            call_command('explain_queries', json=True, stdout=StringIO())
+        self.assertFalse([request for request in requests if request[2] >= 400])
+        requested = {(method, path) for method, path, _ in requests}
+        for method, path in [
+            ('GET', reverse('user-address-list')), ('POST', reverse('user-address-list')),
+            ('PATCH', reverse('user-address-detail', kwargs={'pk': UserAddress.objects.get().pk})),
+            ('POST', reverse('token_obtain_pair')),
+        ]:
+            self.assertIn((method, path), requested)
+        self.assertEqual({method for method, path in requested if path.startswith(reverse('cart-list')) and path != reverse('cart-list')}, {'PATCH', 'DELETE'})
+        # The audit password and every row written are rolled back.
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('secret'))
+        self.assertEqual((UserAddress.objects.count(), ShoppingCart.objects.count()), (1, 0))
+
+    def test_reports_scans_and_uses_the_stock_index(self):
+        out = StringIO()
+        call_command('explain_queries', min_rows=0, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+
+        sources = {result['source'] for result in results}
+        self.assertIn('GET products ?search', sources)
+        # The low-stock scan is served by product_var_qty_idx, not a full scan.
+        self.assertFalse([r for r in results if r['source'] == 'check_stock' and r['table'] == 'product_productvariation'])
+
+    def test_small_tables_are_not_flagged_by_default(self):
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+        self.assertIn('No issues found', out.getvalue())
+
+@override_settings(ROOT_URLCONF='perf.tests')
+class QueryInstrumentationMiddlewareTests(TestCase):
+    """
+    Tests for the per-request SQL instrumentation middleware.
+    """
+    def setUp(self):
+        category = ProductCategory.objects.create(name='Apparel')
+        for index in range(6):
+            Product.objects.create(name=f'Tee {index}', category=category, brand=Brand.objects.create(name=f'Brand {index}'))
+
+    def test_sql_shape_ignores_in_list_length(self):
+        self.assertEqual(
+            sql_shape('SELECT * FROM t WHERE id IN (%s, %s)'),
+            sql_shape('SELECT  *\nFROM t WHERE id IN (%s, %s, %s)'),
+        )
+
+    @override_settings(SQL_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get('/select-related/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="1 queries", total;dur=[\d.]+$')
+
+    @override_settings(SQL_SERVER_TIMING=False)
+    def test_server_timing_header_is_off_by_setting(self):
+        self.assertNotIn('Server-Timing', self.client.get('/select-related/'))
+
+    @override_settings(SQL_SERVER_TIMING=True)
+    async def test_async_requests_are_recorded(self):
+        middleware = QueryInstrumentationMiddleware(async_select_related_view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await self.async_client.get('/async-select-related/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="1 queries"')
+
+    def test_n_plus_one_raises_in_tests(self):
+        with self.assertRaisesMessage(NPlusOneError, '6x SELECT'):
+            self.client.get('/n-plus-one/')
+
+    @patch('perf.middleware.logger')
+    def test_views_can_allow_repeated_queries(self, mock_logger):
+        self.assertEqual(self.client.get('/batch/').status_code, 200)
+        mock_logger.warning.assert_not_called()
+
+    @override_settings(SQL_N_PLUS_ONE_RAISE=False)
+    @patch('perf.middleware.logger')
+    def test_n_plus_one_is_logged_when_not_raising(self, mock_logger):
+        self.assertEqual(self.client.get('/n-plus-one/').status_code, 200)
+        self.assertIn('Possible N+1 in GET /n-plus-one/', mock_logger.warning.call_args.args[0])
+
+    @override_settings(SQL_SLOW_REQUEST_MS=0)
+    @patch('perf.middleware.logger')
+    def test_slow_requests_are_logged_with_top_queries(self, mock_logger):
+        self.client.get('/select-related/')
+        args = mock_logger.warning.call_args.args
+        self.assertTrue(args[0].startswith('Slow request'))
+        self.assertIn('1x', args[-1])
@@ -1,14 +1,145 @@
 from django.contrib import admin
-from .models import Product, ProductImage, ProductItem, ProductVariation, ProductCategory, SizeOption, Brand, Colour
+from .models import (
+    Brand,
+    Colour,
+    InventoryChangeLog,
+    InventoryWatermark,
+    Product,
+    ProductCategory,
+    ProductImage,
+    ProductItem,
+    ProductVariation,
+    SizeOption,
+)
 
-# Register your models here.
-admin.site.register(Product)
-admin.site.register(ProductImage)
-admin.site.register(ProductItem)
-admin.site.register(ProductVariation)
-admin.site.register(ProductCategory)
-admin.site.register(SizeOption)
-admin.site.register(Brand)
-admin.site.register(Colour)
+# Every changelist selects the rows its __str__ and columns read, foreign keys to large
+# tables use autocomplete or raw id widgets instead of <select>s of the whole table, and
+# changelists of large tables skip the unfiltered COUNT(*).
 
+class PrefetchedChoicesMixin:
+    """
+    For inlines: builds the <select> options of the lookup foreign keys in
+    `prefetched_choice_fields` with one query per page. Django would otherwise query the
+    lookup table for every inline row (and autocomplete or raw id widgets would query
+    the selected row for every inline row).
+    """
+    prefetched_choice_fields = []
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name in self.prefetched_choice_fields:
+            # The admin builds the formset more than once per request; read the table once.
+            cache = request.__dict__.setdefault('_prefetched_choices', {})
+            if db_field not in cache:
+                cache[db_field] = [choice for choice in field.choices]  # Not list(), which runs a COUNT first
+            field.choices = cache[db_field]
+        return field
+
+# --- Lookup tables ---
+
+@admin.register(Brand)
+class BrandAdmin(admin.ModelAdmin):
+    search_fields = ['name']
+
+@admin.register(Colour)
+class ColourAdmin(admin.ModelAdmin):
+    search_fields = ['colour_name']
+
+@admin.register(SizeOption)
+class SizeOptionAdmin(admin.ModelAdmin):
+    list_display = ['size_name', 'sort_order']
+    search_fields = ['size_name']
+
+@admin.register(ProductCategory)
+class ProductCategoryAdmin(admin.ModelAdmin):
+    list_display = ['name', 'parent_category']
+    list_select_related = ['parent_category__parent_category']
+    search_fields = ['name']
+    autocomplete_fields = ['parent_category']
+
+# --- Catalog ---
+
+class ProductItemInline(PrefetchedChoicesMixin, admin.TabularInline):
+    model = ProductItem
+    extra = 0
+    show_change_link = True
+    prefetched_choice_fields = ['colour']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product', 'colour')
+
+class ProductImageInline(admin.TabularInline):
+    model = ProductImage
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product_item__product', 'product_item__colour')
+
+class ProductVariationInline(PrefetchedChoicesMixin, admin.TabularInline):
+    model = ProductVariation
+    extra = 0
+    prefetched_choice_fields = ['size']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product_item__product', 'product_item__colour', 'size')
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ['name', 'brand', 'category']
+    list_select_related = ['brand', 'category__parent_category']
+    search_fields = ['name']
+    autocomplete_fields = ['brand', 'category']
+    inlines = [ProductItemInline]
+    show_full_result_count = False
+
+@admin.register(ProductItem)
+class ProductItemAdmin(admin.ModelAdmin):
+    list_display = ['sku_base', 'product', 'colour', 'original_price', 'sale_price']
+    list_select_related = ['product', 'colour']
+    search_fields = ['sku_base', 'product__name']
+    autocomplete_fields = ['product', 'colour']
+    inlines = [ProductImageInline, ProductVariationInline]
+    show_full_result_count = False
+
+@admin.register(ProductImage)
+class ProductImageAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'image_filename', 'is_default']
+    list_select_related = ['product_item__product', 'product_item__colour']
+    list_filter = ['is_default']
+    search_fields = ['product_item__sku_base']
+    autocomplete_fields = ['product_item']
+    show_full_result_count = False
+
+@admin.register(ProductVariation)
+class ProductVariationAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'sku', 'qty_in_stock', 'low_stock_threshold']
+    list_select_related = ['product_item__product', 'product_item__colour', 'size']
+    search_fields = ['product_item__sku_base']
+    autocomplete_fields = ['product_item', 'size']
+    show_full_result_count = False
+
+    @admin.display(ordering='product_item__sku_base')
+    def sku(self, obj):
+        return obj.product_item.sku_base
+
+# --- Inventory ---
+
+@admin.register(InventoryChangeLog)
+class InventoryChangeLogAdmin(admin.ModelAdmin):
+    """Read-only: the log is written by stock changes, not edited."""
+    list_display = ['created_at', 'variation', 'old_qty', 'new_qty', 'source']
+    list_select_related = ['variation__product_item__product', 'variation__product_item__colour', 'variation__size']
+    list_filter = ['source']
+    search_fields = ['variation__product_item__sku_base']
+    raw_id_fields = ['variation']
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(InventoryWatermark)
+class InventoryWatermarkAdmin(admin.ModelAdmin):
+    list_display = ['name', 'last_change_id', 'updated_at']
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProductConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'product'
+
+    def ready(self):
+        # Register signal handlers
+        from . import signals  # noqa: F401
@@ -0,0 +1,45 @@
+"""
+Versioned response cache for the public catalog endpoints.
+
+Every cache key embeds the current catalog version, so invalidation is a single
+write of a new version token: old entries simply stop being read and expire on their
+own. The version is replaced by signal handlers on catalog model changes (see
+product/signals.py) and explicitly, once per batch, by bulk operations that bypass
+signals. The token is random, so a version key that was evicted never comes back
+with a value whose responses are still cached.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from healthcheck.metrics import record_cache_lookup
+
+CATALOG_VERSION_KEY = 'product:catalog:version'
+
+def _response_key(version, request):
+    # The absolute URL, since paginated responses embed absolute next/previous links.
+    digest = hashlib.md5(request.build_absolute_uri().encode(), usedforsecurity=False).hexdigest()
+    return f"product:catalog:{version}:{digest}"
+
+def invalidate_catalog_cache():
+    """Makes every cached catalog response stale."""
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+async def aget_catalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        # First process to look wins; everybody else reads the same value back.
+        await cache.aadd(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(CATALOG_VERSION_KEY)
+    return version
+
+async def aget_cached_response(request):
+    """Returns (cache_key, cached_payload_or_None) for the request's absolute URL."""
+    key = _response_key(await aget_catalog_version(), request)
+    payload = await cache.aget(key)
+    record_cache_lookup('catalog', payload is not None)
+    return key, payload
+
+async def aset_cached_response(key, payload):
+    await cache.aset(key, payload, timeout=settings.CATALOG_CACHE_TIMEOUT)
@@ -0,0 +1,94 @@
+"""
+Full product feed for marketplaces and partners: one row per ProductVariation.
+
+feed_rows() reads the whole catalog from a single joined query through a server-side
+cursor (QuerySet.iterator), and feed_content() turns them into CSV or JSON Lines,
+optionally gzipped, in chunks of about FEED_BUFFER_SIZE. Every stage is a generator, so
+memory stays flat whatever the catalog size. The feed endpoint and the `export_feed`
+command stream the same bytes.
+"""
+import csv
+import json
+from urllib.parse import urljoin
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import OuterRef, Subquery
+from django.utils.text import compress_sequence
+from .models import ProductImage, ProductVariation
+
+# Columns of the feed, in order.
+FEED_FIELDS = [
+    'variation_id', 'sku', 'product_id', 'product', 'brand', 'category', 'colour', 'size',
+    'price', 'original_price', 'sale_price', 'qty_in_stock', 'image_url',
+]
+FEED_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+# Rows are joined into chunks of about this many characters before being sent or compressed.
+FEED_BUFFER_SIZE = 64 * 1024
+
+def feed_rows(chunk_size=2000, base_url=''):
+    """
+    Streams the feed as dicts keyed by FEED_FIELDS, in variation id order. Image URLs
+    point at the colour's default image, joined to `base_url` when given.
+    """
+    default_image = ProductImage.objects.filter(product_item=OuterRef('product_item'), is_default=True).values('image_filename')[:1]
+    rows = (
+        ProductVariation.objects
+        .order_by('id')
+        .annotate(image=Subquery(default_image))
+        .values_list(
+            'id', 'product_item__sku_base', 'product_item__product_id', 'product_item__product__name',
+            'product_item__product__brand__name', 'product_item__product__category__name',
+            'product_item__colour__colour_name', 'size__size_name', 'product_item__original_price',
+            'product_item__sale_price', 'qty_in_stock', 'image',
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    for id, sku, product_id, product, brand, category, colour, size, original_price, sale_price, qty, image in rows:
+        yield {
+            'variation_id': id,
+            'sku': sku,
+            'product_id': product_id,
+            'product': product,
+            'brand': brand,
+            'category': category,
+            'colour': colour,
+            'size': size,
+            'price': sale_price or original_price,  # As ProductItem.price
+            'original_price': original_price,
+            'sale_price': sale_price,
+            'qty_in_stock': qty,
+            'image_url': urljoin(base_url, default_storage.url(image)) if image else None,
+        }
+
+class _Echo:
+    """A file-like object whose write() returns the line, so csv.writer can format one row at a time."""
+    def write(self, value):
+        return value
+
+def encode_feed(rows, format):
+    """Yields the rows as CSV (with a header) or JSON Lines text, in chunks of about FEED_BUFFER_SIZE."""
+    if format == 'csv':
+        writer = csv.writer(_Echo())
+        encode = lambda row: writer.writerow([row[field] for field in FEED_FIELDS])
+        buffer = [writer.writerow(FEED_FIELDS)]
+    elif format == 'jsonl':
+        encode = lambda row: json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+        buffer = []
+    else:
+        raise ValueError(f'Unknown feed format {format!r}; expected csv or jsonl.')
+    size = sum(map(len, buffer))
+    for row in rows:
+        line = encode(row)
+        buffer.append(line)
+        size += len(line)
+        if size >= FEED_BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+def feed_content(rows, format, gzip=False):
+    """Encodes feed rows as a stream of bytes; gzip compresses them as one gzip member."""
+    chunks = (chunk.encode() for chunk in encode_feed(rows, format))
+    return compress_sequence(chunks) if gzip else chunks
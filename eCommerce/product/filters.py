@@ -1,5 +1,6 @@
 from django_filters import rest_framework as filters
-from .models import Product
+from django.db.models import Exists, OuterRef
+from .models import Product, ProductItem
 
 
 class ProductFilter(filters.FilterSet):
@@ -13,13 +14,28 @@ class ProductFilter(filters.FilterSet):
     # Filter by the name of the related brand (case-insensitive)
     brand = filters.CharFilter(field_name='brand__name', lookup_expr='iexact')
 
-    # Filter for items with a price greater than or equal to the given value
-    min_price = filters.NumberFilter(field_name="items__original_price", lookup_expr='gte')
+    # Filter for products with an item priced greater than or equal to the given value
+    min_price = filters.NumberFilter(method='filter_min_price')
     
-    # Filter for items with a price less than or equal to the given value
-    max_price = filters.NumberFilter(field_name="items__original_price", lookup_expr='lte')
+    # Filter for products with an item priced less than or equal to the given value
+    max_price = filters.NumberFilter(method='filter_max_price')
 
     class Meta:
         model = Product
         # These fields are now explicitly defined above for more control
         fields = ['category', 'brand', 'min_price', 'max_price']
+
+    def filter_min_price(self, queryset, name, value):
+        return queryset.filter(self._has_item(original_price__gte=value))
+
+    def filter_max_price(self, queryset, name, value):
+        return queryset.filter(self._has_item(original_price__lte=value))
+
+    @staticmethod
+    def _has_item(**lookups):
+        """
+        EXISTS rather than filtering through `items`: each filter() on a multi-valued
+        relation adds another join, so min_price and max_price together would multiply
+        every product's rows by its colour count squared before the price is aggregated.
+        """
+        return Exists(ProductItem.objects.filter(product=OuterRef('pk'), **lookups))
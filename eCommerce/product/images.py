@@ -0,0 +1,136 @@
+"""
+Resized renditions of product images, and picking the right one for an image slot.
+
+render() reads an uploaded original once and writes a WebP and a JPEG copy at every
+IMAGE_RENDITION_WIDTHS width smaller than the original. Renditions are named after a
+hash of the original's content, so identical uploads (e.g. the seeder's placeholders)
+share their renditions, a rendition that already exists is not rendered again, and a
+replaced image never reuses the URL of the old one. generate_renditions() renders many
+images on a thread pool and records their sizes and rendition paths on ProductImage.
+It runs in the Celery task queued when an image is saved, and in the
+`generate_renditions` command.
+
+The serializers call image_url() and image_srcset() so list and cart thumbnails get a
+rendition sized for their slot instead of the full upload.
+"""
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from .cache import invalidate_catalog_cache
+from .models import ProductImage
+
+logger = logging.getLogger(__name__)
+
+RENDITION_DIR = 'products/renditions'
+# (Pillow format, file extension, save options) for each rendition format.
+RENDITION_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# CSS widths of the image slots; renditions are picked for twice these on high-density screens via srcset.
+LIST_IMAGE_WIDTH = 320
+CART_IMAGE_WIDTH = 160
+
+def _save_once(storage, path, content):
+    """
+    Writes a content-addressed file unless it exists. Another worker rendering the same
+    original may write it first, in which case storage saves ours under a suffixed name;
+    the copies are identical, so that one is deleted.
+    """
+    if storage.exists(path):
+        return
+    saved = storage.save(path, ContentFile(content))
+    if saved != path:
+        storage.delete(saved)
+
+def render(name, widths=None, storage=default_storage):
+    """
+    Writes the renditions of the image stored at `name`. Returns (width, height,
+    renditions), where renditions lists {'width', 'height', 'webp', 'jpeg'} (storage
+    paths) from the smallest up. Raises OSError if the file is missing or not an image.
+    """
+    from PIL import ExifTags, Image, ImageOps
+
+    widths = sorted(set(settings.IMAGE_RENDITION_WIDTHS if widths is None else widths))
+    with storage.open(name, 'rb') as stream:
+        data = stream.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    with Image.open(io.BytesIO(data)) as original:
+        # Sizes are as displayed, after the EXIF orientation; reading them decodes nothing.
+        rotated = original.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8)
+        width, height = original.size[::-1] if rotated else original.size
+        targets = [target for target in widths if target < width]
+        planned = [
+            (target, round(height * target / width), {key: f'{RENDITION_DIR}/{digest}-{target}w.{extension}' for key, (_, extension, _) in RENDITION_FORMATS.items()})
+            for target in targets
+        ]
+        missing = [plan for plan in planned if not all(storage.exists(path) for path in plan[2].values())]
+        if missing:
+            # JPEGs decode straight to a fraction of their size, which is much faster than decoding in full and then resizing.
+            largest = missing[-1][:2]
+            original.draft('RGB', largest[::-1] if rotated else largest)
+            image = ImageOps.exif_transpose(original)
+            if image.mode != 'RGB':
+                rgba = image.convert('RGBA')
+                image = Image.new('RGB', image.size, 'white')  # JPEG has no transparency
+                image.paste(rgba, mask=rgba)
+            for target, target_height, paths in missing:
+                resized = image.resize((target, target_height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+                for key, (format, _, options) in RENDITION_FORMATS.items():
+                    buffer = io.BytesIO()
+                    resized.save(buffer, format=format, **options)
+                    _save_once(storage, paths[key], buffer.getvalue())
+    return width, height, [{'width': target, 'height': target_height, **paths} for target, target_height, paths in planned]
+
+def generate_renditions(images, workers=4, batch_size=200, progress=None):
+    """
+    Renders every ProductImage in `images` (a queryset or iterable) on `workers` threads
+    and saves their dimensions and renditions, one bulk UPDATE per batch. Images whose
+    file is missing or unreadable are logged and skipped. Returns the number rendered.
+    """
+    images = iter(images)
+    rendered = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while batch := list(islice(images, batch_size)):
+            # Database access stays on this thread; workers only read and write files.
+            futures = [(image, executor.submit(render, image.image_filename.name)) for image in batch if image.image_filename]
+            updated = []
+            for image, future in futures:
+                try:
+                    image.width, image.height, image.renditions = future.result()
+                except OSError as exc:
+                    logger.warning(f"Cannot render {image.image_filename.name} (image {image.pk}): {exc}")
+                    continue
+                updated.append(image)
+            ProductImage.objects.bulk_update(updated, ['width', 'height', 'renditions'])
+            rendered += len(updated)
+            if progress:
+                progress(rendered)
+    if rendered:
+        # bulk_update bypasses the signals; cached list pages still point at the originals.
+        invalidate_catalog_cache()
+    return rendered
+
+def _absolute(name, request):
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+def image_url(image, width, request=None):
+    """URL of the smallest JPEG rendition at least `width` wide; the original if there is none."""
+    rendition = next((rendition for rendition in image.renditions if rendition['width'] >= width), None)
+    return _absolute(rendition['jpeg'] if rendition else image.image_filename.name, request)
+
+def image_srcset(image, request=None):
+    """A srcset of the WebP renditions and the original, or None before renditions exist."""
+    if not image.renditions:
+        return None
+    candidates = [(rendition['webp'], rendition['width']) for rendition in image.renditions]
+    if image.width:
+        candidates.append((image.image_filename.name, image.width))
+    return ', '.join(f'{_absolute(name, request)} {width}w' for name, width in candidates)
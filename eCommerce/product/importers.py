@@ -0,0 +1,376 @@
+"""
+Streaming catalog import from CSV or JSON Lines, upserting by SKU.
+
+Each input row is one size of one colour of a product, with the product and colour
+columns repeated on every size. Rows are read lazily and applied in chunks, each in its
+own transaction and with a fixed number of queries: ProductItem is upserted on sku_base
+and ProductVariation on (product_item, size) with bulk_create(update_conflicts=True).
+Products have no natural key, so a row's product is the one its SKU already belongs to,
+or else the product with the same brand and name. Brands, colours, sizes and categories
+are resolved from in-memory maps loaded once per import and extended as new names appear.
+
+Optional columns that are missing or empty leave the current value unchanged.
+"""
+import csv
+import io
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from .cache import invalidate_catalog_cache
+from .models import Brand, Colour, Product, ProductCategory, ProductImage, ProductItem, ProductVariation, SizeOption
+from .stock import log_stock_changes
+from .tasks import queue_image_renditions
+
+REQUIRED_COLUMNS = ['sku', 'product', 'brand', 'category', 'colour', 'original_price']
+OPTIONAL_COLUMNS = ['size', 'qty_in_stock', 'low_stock_threshold', 'sale_price', 'description', 'care_instructions', 'about', 'image']
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+# Errors kept in the report; the rest are only counted.
+MAX_REPORTED_ERRORS = 100
+
+MAX_LENGTHS = {
+    'sku': ProductItem._meta.get_field('sku_base').max_length,
+    'product': Product._meta.get_field('name').max_length,
+    'brand': Brand._meta.get_field('name').max_length,
+    'colour': Colour._meta.get_field('colour_name').max_length,
+    'size': SizeOption._meta.get_field('size_name').max_length,
+    'image': ProductImage._meta.get_field('image_filename').max_length,
+}
+CATEGORY_MAX_LENGTH = ProductCategory._meta.get_field('name').max_length
+
+class CatalogImportError(Exception):
+    """The input cannot be imported at all (unknown format, missing columns)."""
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    imported: int = 0
+    products_created: int = 0
+    products_updated: int = 0
+    items_created: int = 0
+    items_updated: int = 0
+    variations_created: int = 0
+    variations_updated: int = 0
+    images_created: int = 0
+    images_updated: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)  # [{'line': ..., 'error': ...}], at most MAX_REPORTED_ERRORS
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {**asdict(self), 'rows_per_second': round(self.rows_per_second, 1)}
+
+def guess_format(filename):
+    for suffix, format in FORMATS.items():
+        if filename.lower().endswith(suffix):
+            return format
+    raise CatalogImportError(f'Cannot tell the format of {filename!r}; use a .csv or .jsonl file or pass the format.')
+
+def text_lines(stream):
+    """
+    Yields the lines of a text stream, raising CatalogImportError at one holding a NUL
+    character: the csv module accepts those since Python 3.11, but PostgreSQL cannot
+    store them in text columns.
+    """
+    for line, text in enumerate(stream, start=1):
+        if '\x00' in text:
+            raise CatalogImportError(f'Line {line} contains a NUL character; is this a binary file?')
+        yield text
+
+def unreadable_file_error(exc, line):
+    """
+    The CatalogImportError for a file that cannot be read past `line`: text that is not
+    UTF-8 (UnicodeDecodeError) or a CSV the csv module rejects (csv.Error, e.g. an
+    unclosed quote running past the field size limit).
+    """
+    if isinstance(exc, UnicodeDecodeError):
+        # Text is decoded in blocks, so the failing line is not known.
+        return CatalogImportError('The file is not UTF-8 text; export it as UTF-8 and retry.')
+    return CatalogImportError(f'Malformed CSV after line {line}: {exc}.')
+
+def read_rows(stream, format):
+    """
+    Yields (line number, raw row) from a text stream; a raw row is a dict or a ValueError.
+    Raises CatalogImportError if the file itself cannot be read; earlier rows are kept.
+    """
+    if format == 'csv':
+        reader = csv.DictReader(text_lines(stream))
+        try:
+            missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise CatalogImportError(f"The CSV header lacks required columns: {', '.join(missing)}.")
+            for raw in reader:
+                yield reader.line_num, raw
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise unreadable_file_error(exc, reader.line_num) from exc
+    elif format == 'jsonl':
+        line = 0
+        try:
+            for line, text in enumerate(text_lines(stream), start=1):
+                if not text.strip():
+                    continue
+                try:
+                    raw = json.loads(text)
+                except ValueError as exc:
+                    yield line, ValueError(f'invalid JSON: {exc}')
+                    continue
+                yield line, raw if isinstance(raw, dict) else ValueError('each line must be a JSON object')
+        except UnicodeDecodeError as exc:
+            raise unreadable_file_error(exc, line) from exc
+    else:
+        raise CatalogImportError(f'Unknown format {format!r}; expected csv or jsonl.')
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+def _decimal(value, column):
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'{column} is not a number: {value!r}')
+    if not number.is_finite() or number < 0 or number.as_tuple().exponent < -2 or number >= 10 ** 8:
+        raise ValueError(f'{column} must be a price with at most two decimals: {value!r}')
+    return number
+
+def _count(value, column):
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f'{column} is not a whole number: {value!r}')
+    if number < 0:
+        raise ValueError(f'{column} must not be negative: {value!r}')
+    return number
+
+def parse_row(raw):
+    """Validates a raw row and returns a dict of the columns it sets; raises ValueError."""
+    if isinstance(raw, ValueError):
+        raise raw
+    row = {}
+    for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS:
+        value = _text(raw.get(column))
+        if value:
+            if len(value) > MAX_LENGTHS.get(column, len(value)):
+                raise ValueError(f'{column} is longer than {MAX_LENGTHS[column]} characters')
+            row[column] = value
+        elif column in REQUIRED_COLUMNS:
+            raise ValueError(f'{column} is required')
+
+    row['original_price'] = _decimal(row['original_price'], 'original_price')
+    if 'sale_price' in row:
+        row['sale_price'] = _decimal(row['sale_price'], 'sale_price')
+    for column in ('qty_in_stock', 'low_stock_threshold'):
+        if column in row:
+            row[column] = _count(row[column], column)
+            if 'size' not in row:
+                raise ValueError(f'{column} needs a size')
+    # "Clothing > Men > T-Shirts" is a path from a top-level category.
+    row['category'] = tuple(part.strip() for part in row['category'].split('>') if part.strip())
+    if not row['category'] or any(len(part) > CATEGORY_MAX_LENGTH for part in row['category']):
+        raise ValueError(f'category must be a path of names of at most {CATEGORY_MAX_LENGTH} characters')
+    return row
+
+class CatalogImporter:
+    """Applies parsed rows chunk by chunk; see the module docstring."""
+    def __init__(self, chunk_size=1000, progress=None):
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.report = ImportReport()
+        self._brands = dict(Brand.objects.values_list('name', 'id'))
+        self._colours = dict(Colour.objects.values_list('colour_name', 'id'))
+        self._sizes = dict(SizeOption.objects.values_list('size_name', 'id'))
+        self._categories = {(parent, name): id for id, parent, name in ProductCategory.objects.values_list('id', 'parent_category_id', 'name')}
+
+    def run(self, rows):
+        """Imports (line number, raw row) pairs and returns the ImportReport."""
+        started = time.perf_counter()
+        chunk = []
+        try:
+            for line, raw in rows:
+                self.report.rows += 1
+                try:
+                    chunk.append(parse_row(raw))
+                except ValueError as exc:
+                    self.report.add_error(line, str(exc))
+                if len(chunk) >= self.chunk_size:
+                    self._apply(chunk)
+                    chunk = []
+                    self._progress(started)
+            if chunk:
+                self._apply(chunk)
+            self._progress(started)
+        finally:
+            if self.report.imported:
+                # Bulk writes bypass the signals that keep the catalog cache fresh.
+                invalidate_catalog_cache()
+        return self.report
+
+    def _progress(self, started):
+        self.report.seconds = time.perf_counter() - started
+        if self.progress:
+            self.progress(self.report)
+
+    # --- Lookups ---
+
+    def _lookup_ids(self, ids, model, field, names):
+        """Adds ids for `names` to the `ids` map, creating the missing rows."""
+        missing = [name for name in dict.fromkeys(names) if name not in ids]
+        for obj in model.objects.bulk_create(model(**{field: name}) for name in missing):
+            ids[getattr(obj, field)] = obj.id
+
+    def _category_ids(self, paths):
+        """Returns {path: id}, creating missing categories level by level."""
+        ids = {}
+        for depth in range(1, max(map(len, paths), default=0) + 1):
+            level = sorted({path[:depth] for path in paths if len(path) >= depth})
+            missing = [path for path in level if (ids.get(path[:-1]), path[-1]) not in self._categories]
+            for obj in ProductCategory.objects.bulk_create(ProductCategory(parent_category_id=ids.get(path[:-1]), name=path[-1]) for path in missing):
+                self._categories[(obj.parent_category_id, obj.name)] = obj.id
+            ids.update((path, self._categories[(ids.get(path[:-1]), path[-1])]) for path in level)
+        return ids
+
+    # --- Chunks ---
+
+    @transaction.atomic
+    def _apply(self, chunk):
+        # Later rows win: one item per SKU and one variation per (SKU, size).
+        items, variations = {}, {}
+        for row in chunk:
+            items[row['sku']] = {**items.get(row['sku'], {}), **row}
+            if 'size' in row:
+                variations[(row['sku'], row['size'])] = row
+
+        self._lookup_ids(self._brands, Brand, 'name', [row['brand'] for row in items.values()])
+        self._lookup_ids(self._colours, Colour, 'colour_name', [row['colour'] for row in items.values()])
+        self._lookup_ids(self._sizes, SizeOption, 'size_name', [size for _, size in variations])
+        categories = self._category_ids({row['category'] for row in items.values()})
+
+        existing_items = {item.sku_base: item for item in ProductItem.objects.filter(sku_base__in=items).select_related('product')}
+        products = self._upsert_products(items, existing_items, categories)
+        item_ids = self._upsert_items(items, existing_items, products)
+        self._upsert_images(items, item_ids)
+        self._upsert_variations(variations, item_ids)
+        self.report.imported += len(chunk)
+
+    def _upsert_products(self, items, existing_items, categories):
+        """Creates or updates each SKU's product; returns {sku: product}."""
+        keys = {(self._brands[row['brand']], row['product']) for sku, row in items.items() if sku not in existing_items}
+        by_key = {}
+        if keys:
+            candidates = Product.objects.filter(brand_id__in={brand for brand, _ in keys}, name__in={name for _, name in keys}).order_by('-id')
+            by_key = {(product.brand_id, product.name): product for product in candidates if (product.brand_id, product.name) in keys}
+
+        products, created, updated = {}, {}, {}
+        for sku, row in items.items():
+            key = (self._brands[row['brand']], row['product'])
+            product = existing_items[sku].product if sku in existing_items else by_key.get(key) or created.get(key)
+            if product is None:
+                product = created[key] = Product(description='')
+            values = {'name': row['product'], 'brand_id': key[0], 'category_id': categories[row['category']]}
+            values.update((column, row[column]) for column in ('description', 'care_instructions', 'about') if column in row)
+            if product.pk and any(getattr(product, name) != value for name, value in values.items()):
+                updated[product.pk] = product
+            for name, value in values.items():
+                setattr(product, name, value)
+            products[sku] = product
+
+        Product.objects.bulk_create(created.values())
+        Product.objects.bulk_update(updated.values(), ['name', 'brand', 'category', 'description', 'care_instructions', 'about'])
+        self.report.products_created += len(created)
+        self.report.products_updated += len(updated)
+        return products
+
+    def _upsert_items(self, items, existing_items, products):
+        """Upserts one ProductItem per SKU; returns {sku: item id}."""
+        objs = []
+        for sku, row in items.items():
+            existing = existing_items.get(sku)
+            objs.append(ProductItem(
+                product=products[sku],
+                colour_id=self._colours[row['colour']],
+                sku_base=sku,
+                original_price=row['original_price'],
+                sale_price=row['sale_price'] if 'sale_price' in row else getattr(existing, 'sale_price', None),
+            ))
+        objs = ProductItem.objects.bulk_create(
+            objs, update_conflicts=True, unique_fields=['sku_base'], update_fields=['product', 'colour', 'original_price', 'sale_price'],
+        )
+        item_ids = {obj.sku_base: obj.pk for obj in objs}
+        if None in item_ids.values():  # Backends that cannot return ids from an upsert
+            item_ids = dict(ProductItem.objects.filter(sku_base__in=items).values_list('sku_base', 'id'))
+        self.report.items_created += len(items) - len(existing_items)
+        self.report.items_updated += len(existing_items)
+        return item_ids
+
+    def _upsert_images(self, items, item_ids):
+        """Points each SKU's default image at its `image` column, creating the image if needed."""
+        images = {item_ids[sku]: row['image'] for sku, row in items.items() if 'image' in row}
+        if not images:
+            return
+        defaults = {image.product_item_id: image for image in ProductImage.objects.filter(product_item_id__in=images, is_default=True).order_by('-id')}
+        created, updated = [], []
+        for item_id, filename in images.items():
+            image = defaults.get(item_id)
+            if image is None:
+                created.append(ProductImage(product_item_id=item_id, image_filename=filename, is_default=True))
+            elif image.image_filename.name != filename:
+                image.image_filename = filename
+                image.width, image.height, image.renditions = None, None, []  # Until the new file is rendered
+                updated.append(image)
+        ProductImage.objects.bulk_create(created)
+        ProductImage.objects.bulk_update(updated, ['image_filename', 'width', 'height', 'renditions'])
+        # bulk_create and bulk_update skip the signal that renders new files.
+        queue_image_renditions(image.pk for image in created + updated)
+        self.report.images_created += len(created)
+        self.report.images_updated += len(updated)
+
+    def _upsert_variations(self, variations, item_ids):
+        if not variations:
+            return
+        existing = {
+            (item_id, size_id): (qty, threshold)
+            for item_id, size_id, qty, threshold in ProductVariation.objects
+            .filter(product_item_id__in={item_ids[sku] for sku, _ in variations})
+            .values_list('product_item_id', 'size_id', 'qty_in_stock', 'low_stock_threshold')
+        }
+        objs, old_qtys = [], []
+        for (sku, size), row in variations.items():
+            key = (item_ids[sku], self._sizes[size])
+            qty, threshold = existing.get(key, (None, None))
+            old_qtys.append(qty)
+            objs.append(ProductVariation(
+                product_item_id=key[0],
+                size_id=key[1],
+                qty_in_stock=row.get('qty_in_stock', 0 if qty is None else qty),
+                low_stock_threshold=row.get('low_stock_threshold', threshold),
+            ))
+        ProductVariation.objects.bulk_create(
+            objs, update_conflicts=True, unique_fields=['product_item', 'size'], update_fields=['qty_in_stock', 'low_stock_threshold'],
+        )
+        # The upsert sets primary keys on the objects (PostgreSQL, SQLite 3.35+), so stock changes can be logged.
+        log_stock_changes([(obj.pk, qty, obj.qty_in_stock) for obj, qty in zip(objs, old_qtys) if qty != obj.qty_in_stock], 'import')
+        updated = sum(1 for obj in objs if (obj.product_item_id, obj.size_id) in existing)
+        self.report.variations_created += len(objs) - updated
+        self.report.variations_updated += updated
+
+def import_catalog(stream, format, chunk_size=1000, progress=None):
+    """Imports a CSV or JSON Lines text stream; returns the ImportReport."""
+    return CatalogImporter(chunk_size=chunk_size, progress=progress).run(read_rows(stream, format))
+
+def import_uploaded_file(upload, format=None, chunk_size=1000):
+    """Imports an uploaded file without reading it into memory; the format defaults to its extension."""
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        return import_catalog(stream, format or guess_format(upload.name), chunk_size=chunk_size)
+    finally:
+        stream.detach()  # Leave closing the upload to Django
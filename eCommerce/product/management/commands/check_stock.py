@@ -1,46 +1,73 @@
-from django.core.management.base import BaseCommand
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from product.models import ProductVariation
+from product.stock import LowStockAlert, format_row, low_stock_changes, low_stock_rows, write_csv, write_json
 
 class Command(BaseCommand):
     """
     A Django management command to check for low stock levels.
     This command can be run as a cron job.
+
+    A variation is low on stock when its quantity is at or below its own
+    low_stock_threshold, or --threshold (default LOW_STOCK_THRESHOLD) if it has none.
+    The report is streamed from a single query, so it runs in constant memory on any
+    catalog size. --notify also sends the report as one email to
+    LOW_STOCK_ALERT_RECIPIENTS.
+
+    --incremental reports only the variations that fell to or below their threshold
+    since the previous incremental run, as the periodic Celery task does, reading the
+    inventory change log rather than the whole catalog. It advances the same watermark.
     """
-    help = 'Checks for product variations with low stock and sends a notification.'
-
-    def handle(self, *args, **kwargs):
-        # Define the threshold for what is considered "low stock".
-        low_stock_threshold = 5
-
-        # Find all product variations that are at or below the threshold.
-        low_stock_items = ProductVariation.objects.filter(qty_in_stock__lte=low_stock_threshold)
-
-        if low_stock_items.exists():
-            self.stdout.write(self.style.WARNING(f"Found {low_stock_items.count()} items with low stock (<= {low_stock_threshold} units)."))
-            
-            for item in low_stock_items:
-                self.stdout.write(
-                    f"  - Product: {item.product_item.product.name}, "
-                    f"Color: {item.product_item.colour.colour_name}, "
-                    f"Size: {item.size.size_name}, "
-                    f"Stock: {item.qty_in_stock}"
-                )
-            
-            # --- Placeholder for actual notification logic ---
-            # In a real application, you would send an email or a Slack notification here.
-            # Example:
-            # from django.core.mail import send_mail
-            #
-            # subject = "Low Stock Alert"
-            # message = "The following items are running low on stock:\n"
-            # for item in low_stock_items:
-            #     message += f"- {item}\n"
-            #
-            # send_mail(subject, message, 'noreply@yourdomain.com', ['admin@yourdomain.com'])
-            # -------------------------------------------------
+    help = 'Checks for product variations with low stock and reports them as text, CSV or JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=int, help='Threshold for variations without their own (default: LOW_STOCK_THRESHOLD).')
+        parser.add_argument('--format', choices=['text', 'csv', 'json'], default='text', help='Report format (default: text).')
+        parser.add_argument('--output', help='Write the report to this file instead of stdout.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched from the database at a time (default: 2000).')
+        parser.add_argument('--notify', action='store_true', help='Also email the report to LOW_STOCK_ALERT_RECIPIENTS.')
+        parser.add_argument('--incremental', action='store_true', help='Only report variations that became low since the last incremental run.')
+
+    def handle(self, *args, **options):
+        if options['threshold'] is not None and options['threshold'] < 0:
+            raise CommandError('--threshold must not be negative.')
+        started = time.perf_counter()
+        if options['incremental']:
+            report = low_stock_changes(options['threshold'])
+        else:
+            report = nullcontext(low_stock_rows(options['threshold'], chunk_size=options['chunk_size']))
+        with report as rows:
+            alert = LowStockAlert() if options['notify'] else None
+            if alert:
+                rows = alert.collect(rows)
+
+            stream = open(options['output'], 'w', newline='') if options['output'] else self.stdout
+            try:
+                if options['format'] == 'csv':
+                    count = write_csv(rows, stream)
+                elif options['format'] == 'json':
+                    count = write_json(rows, stream)
+                else:
+                    count = self._write_text(rows, stream)
+            finally:
+                if options['output']:
+                    stream.close()
+            if alert:
+                alert.send()
 
+        # Keep machine-readable output on stdout clean.
+        status = self.stdout if options['format'] == 'text' and not options['output'] else self.stderr
+        elapsed = time.perf_counter() - started
+        if count:
+            status.write(self.style.WARNING(f"Found {count} items with low stock."))
         else:
-            self.stdout.write(self.style.SUCCESS("No items with low stock found."))
+            status.write(self.style.SUCCESS("No items with low stock found."))
+        status.write(self.style.SUCCESS(f"Stock check completed at {timezone.now()} in {elapsed:.2f}s."))
 
-        self.stdout.write(self.style.SUCCESS(f"Stock check completed at {timezone.now()}"))
+    def _write_text(self, rows, stream):
+        count = 0
+        for count, row in enumerate(rows, start=1):
+            stream.write(f"  - {format_row(row)}\n")
+        return count
@@ -0,0 +1,60 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from product.feed import FEED_FORMATS, feed_content, feed_rows
+
+class Command(BaseCommand):
+    """
+    Writes the full product feed (one row per variation) as CSV or JSON Lines.
+
+    The feed is streamed from a server-side cursor straight to the output, so it runs
+    in constant memory on any catalog size. Output ending in .gz, or --gzip, is gzipped.
+    The summary goes to stderr, so the feed can be piped from stdout.
+    """
+    help = 'Exports every product variation as a CSV or JSON Lines feed, optionally gzipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FEED_FORMATS), help='Feed format (default: from the output extension, else csv).')
+        parser.add_argument('--output', help='Write the feed to this file instead of stdout.')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the feed (default when --output ends in .gz).')
+        parser.add_argument('--base-url', default='', help='Prefix for image URLs, e.g. https://shop.example.com.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched from the database at a time (default: 2000).')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+        output = options['output']
+        gzip = options['gzip'] or bool(output and output.endswith('.gz'))
+        format = options['format'] or next(
+            (name for name in FEED_FORMATS if output and output.removesuffix('.gz').endswith(f'.{name}')), 'csv'
+        )
+
+        started = time.perf_counter()
+        self.rows = 0
+        rows = self._count(feed_rows(chunk_size=options['chunk_size'], base_url=options['base_url']))
+        content = feed_content(rows, format, gzip=gzip)
+        try:
+            stream = open(output, 'wb') if output else sys.stdout.buffer
+        except OSError as exc:
+            raise CommandError(str(exc))
+        written = 0
+        try:
+            for chunk in content:
+                stream.write(chunk)
+                written += len(chunk)
+        finally:
+            if output:
+                stream.close()
+            else:
+                stream.flush()
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f'Exported {self.rows} variations as {format} ({written / 1e6:.1f} MB{", gzipped" if gzip else ""}) '
+            f'in {elapsed:.1f}s ({self.rows / max(elapsed, 1e-9):.0f} rows/s).'
+        ))
+
+    def _count(self, rows):
+        for row in rows:
+            self.rows += 1
+            yield row
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from eCommerce.db_router import pin_to_primary
+from product.images import generate_renditions
+from product.models import ProductImage
+
+class Command(BaseCommand):
+    """
+    Renders the resized WebP and JPEG renditions of product images (see product/images.py).
+
+    By default only images without renditions are rendered, which backfills images saved
+    before renditions existed or while the task queue was down. --all re-renders every
+    image, e.g. after IMAGE_RENDITION_WIDTHS changes; renditions that already exist for
+    the same file content and width are kept. Images are rendered by --workers threads
+    and saved with one UPDATE per --batch-size images.
+    """
+    help = 'Renders resized renditions for product images that have none (or all of them with --all).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render every image, not just those without renditions.')
+        parser.add_argument('--workers', type=int, default=4, help='Threads resizing images (default: 4).')
+        parser.add_argument('--batch-size', type=int, default=200, help='Images per UPDATE (default: 200).')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers and --batch-size must be positive.')
+        # Rendering a file name a lagging replica still holds would record stale renditions.
+        with pin_to_primary():
+            images = ProductImage.objects.order_by('id')
+            if not options['all']:
+                # Images smaller than every rendition width are recorded with a width and no renditions.
+                images = images.filter(width__isnull=True)
+            total = images.count()
+
+            started = time.perf_counter()
+            rendered = generate_renditions(
+                images.iterator(chunk_size=options['batch_size']),
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                progress=lambda rendered: self.stdout.write(f'  {rendered}/{total} images'),
+            )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {rendered} of {total} images in {elapsed:.1f}s ({rendered / max(elapsed, 1e-9):.1f} images/s); '
+            f'{total - rendered} skipped.'
+        ))
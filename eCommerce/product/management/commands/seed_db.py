@@ -1,122 +1,58 @@
-import random
-import requests
-from django.core.management.base import BaseCommand
-from django.core.files.base import ContentFile
-from django.db import transaction
-from product.models import (
-    ProductCategory,
-    Brand,
-    Colour,
-    SizeOption,
-    Product,
-    ProductItem,
-    ProductImage,
-    ProductVariation,
-)
-
-# --- Configuration ---
-IMAGE_PROVIDER_URL = "https://picsum.photos/800/800"
-MIN_PRODUCT_COUNT = 25  # The script will run if there are fewer than this many products.
+import time
 
-# --- Sample Data ---
-CATEGORIES = ["T-Shirts", "Hoodies", "Jeans", "Sneakers", "Hats", "Jackets", "Shorts"]
-BRANDS = ["Nike", "Adidas", "Puma", "Levi's", "Vans", "The North Face", "Under Armour"]
-COLOURS = ["Black", "White", "Red", "Blue", "Grey", "Green", "Yellow"]
-SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
-PRODUCT_TEMPLATES = [
-    {"name": "Classic Crewneck", "category": "T-Shirts"},
-    {"name": "Graphic Print Tee", "category": "T-Shirts"},
-    {"name": "V-Neck Tee", "category": "T-Shirts"},
-    {"name": "Pullover Hoodie", "category": "Hoodies"},
-    {"name": "Zip-Up Hoodie", "category": "Hoodies"},
-    {"name": "Lightweight Hoodie", "category": "Hoodies"},
-    {"name": "Slim Fit Jeans", "category": "Jeans"},
-    {"name": "Straight Leg Jeans", "category": "Jeans"},
-    {"name": "Bootcut Jeans", "category": "Jeans"},
-    {"name": "Running Shoes", "category": "Sneakers"},
-    {"name": "High-Top Sneakers", "category": "Sneakers"},
-    {"name": "Skate Shoes", "category": "Sneakers"},
-    {"name": "Baseball Cap", "category": "Hats"},
-    {"name": "Beanie", "category": "Hats"},
-    {"name": "Bucket Hat", "category": "Hats"},
-    {"name": "Denim Jacket", "category": "Jackets"},
-    {"name": "Windbreaker", "category": "Jackets"},
-    {"name": "Bomber Jacket", "category": "Jackets"},
-    {"name": "Cargo Shorts", "category": "Shorts"},
-    {"name": "Athletic Shorts", "category": "Shorts"},
-    {"name": "Chino Shorts", "category": "Shorts"},
-    {"name": "Polo Shirt", "category": "T-Shirts"},
-    {"name": "Long-Sleeve Tee", "category": "T-Shirts"},
-    {"name": "Fleece Jacket", "category": "Jackets"},
-    {"name": "Canvas Sneakers", "category": "Sneakers"},
-]
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from product.models import Brand, Colour, Product, ProductCategory, SizeOption
+from product.seeding import seed_catalog
 
 class Command(BaseCommand):
-    help = "Seeds the database with products, but only if the database is empty."
+    """
+    Seeds the catalog with --products generated products (see product/seeding.py).
+
+    The data is deterministic for a given --seed, so every environment gets the same
+    catalog. Rows are written with bulk_create in batches of --batch-size, each committed
+    on its own, and placeholder images are drawn locally with Pillow and written to media
+    storage by --image-workers threads, which then render their resized renditions: no
+    network access is needed. Nothing is done if the database already holds at least
+    --products products; otherwise the existing catalog is cleared first.
+    """
+    help = "Seeds the database with a deterministic sample catalog, unless it already holds enough products."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=25, help='Products to create (default: 25).')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the generated catalog (default: 0).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Products per bulk insert and transaction (default: 1000).')
+        parser.add_argument('--image-workers', type=int, default=8, help='Threads writing image files (default: 8).')
+        parser.add_argument('--image-size', type=int, default=800, help='Width and height of the placeholder images in pixels (default: 800).')
+        parser.add_argument('--no-images', action='store_true', help='Store image file names without writing the files.')
 
-    @transaction.atomic
     def handle(self, *args, **options):
-        # --- Check if the database is already seeded ---
-        if Product.objects.count() >= MIN_PRODUCT_COUNT:
-            self.stdout.write(self.style.SUCCESS(f"Database already contains {Product.objects.count()} products. Seeding is not required."))
-            return
+        if options['products'] < 1 or options['batch_size'] < 1 or options['image_workers'] < 1:
+            raise CommandError('--products, --batch-size and --image-workers must be positive.')
 
-        self.stdout.write(self.style.SUCCESS("--- Starting Database Seeding ---"))
+        existing = Product.objects.count()
+        if existing >= options['products']:
+            self.stdout.write(self.style.SUCCESS(f"Database already contains {existing} products. Seeding is not required."))
+            return
 
-        # --- Clean Up Old Data (for a clean slate) ---
         self.stdout.write("Clearing old product data...")
-        Product.objects.all().delete()
-        ProductCategory.objects.all().delete()
-        Brand.objects.all().delete()
-        Colour.objects.all().delete()
-        SizeOption.objects.all().delete()
-        self.stdout.write(self.style.SUCCESS("Old data cleared."))
-
-        # --- Create Core Attributes ---
-        self.stdout.write("Creating categories, brands, colours, and sizes...")
-        category_objs = [ProductCategory.objects.create(name=name) for name in CATEGORIES]
-        brand_objs = [Brand.objects.create(name=name) for name in BRANDS]
-        colour_objs = [Colour.objects.create(colour_name=name) for name in COLOURS]
-        size_objs = [SizeOption.objects.create(size_name=name) for name in SIZES]
-        self.stdout.write(self.style.SUCCESS("Core attributes created."))
-
-        # --- Create Products and Variations ---
-        self.stdout.write("Creating products and downloading images...")
-        for template in PRODUCT_TEMPLATES:
-            product_brand = random.choice(brand_objs)
-            product = Product.objects.create(
-                name=template["name"],
-                category=random.choice([c for c in category_objs if c.name == template["category"]]),
-                brand=product_brand,
-                description=f"A high-quality {template['name']} from {product_brand.name}.",
-            )
-
-            product_colour = random.choice(colour_objs)
-            product_item = ProductItem.objects.create(
-                product=product,
-                colour=product_colour,
-                sku_base=f"{product.brand.name.upper()[:3]}-{product.name.replace(' ', '').upper()[:5]}-{product_colour.colour_name.upper()[:3]}",
-                original_price=round(random.uniform(20.0, 100.0), 2),
-            )
-
-            try:
-                response = requests.get(IMAGE_PROVIDER_URL, stream=True, timeout=15)
-                if response.status_code == 200:
-                    image_name = f"{product_item.sku_base}_{random.randint(1000, 9999)}.jpg"
-                    product_image = ProductImage(product_item=product_item, is_default=True)
-                    product_image.image_filename.save(image_name, ContentFile(response.content), save=True)
-                    self.stdout.write(f"  - Image downloaded for {product.name} ({product_colour.colour_name})")
-                else:
-                    self.stdout.write(self.style.WARNING(f"  - Failed to download image for {product.name}. Status: {response.status_code}"))
-            except requests.exceptions.RequestException as e:
-                self.stdout.write(self.style.ERROR(f"  - Error downloading image for {product.name}: {e}"))
-
-            for size in random.sample(size_objs, k=random.randint(2, len(SIZES))):
-                ProductVariation.objects.create(
-                    product_item=product_item,
-                    size=size,
-                    qty_in_stock=random.randint(5, 50),
-                )
-        
-        self.stdout.write(self.style.SUCCESS(f"\nSuccessfully created {len(PRODUCT_TEMPLATES)} products."))
-        self.stdout.write(self.style.SUCCESS("--- Database Seeding Complete ---"))
+        with transaction.atomic():
+            # Deleting products cascades to their items, images and variations.
+            for model in (Product, ProductCategory, Brand, Colour, SizeOption):
+                model.objects.all().delete()
+
+        started = time.perf_counter()
+        counts = seed_catalog(
+            options['products'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            images=not options['no_images'],
+            image_size=options['image_size'],
+            image_workers=options['image_workers'],
+            progress=lambda counts: self.stdout.write(f"  {counts['products']}/{options['products']} products"),
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['products']} products, {counts['items']} colours, {counts['variations']} variations "
+            f"and {counts['images']} images in {elapsed:.1f}s ({counts['products'] / max(elapsed, 1e-9):.0f} products/s)."
+        ))
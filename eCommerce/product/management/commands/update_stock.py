@@ -0,0 +1,82 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from eCommerce.db_router import pin_to_primary
+from product.importers import FORMATS, CatalogImportError, guess_format, text_lines, unreadable_file_error
+from product.stock import parse_stock_update, update_stock_levels
+
+class Command(BaseCommand):
+    """
+    Sets stock levels from a warehouse export in CSV or JSON Lines.
+
+    Each row names a variation by `id`, or by `sku` and `size`, and gives its new `qty`.
+    Rows are applied in chunks of --chunk-size, each with one SELECT and one set-based
+    UPDATE in its own transaction; rows whose quantity is already current are not
+    written. Invalid rows are skipped and reported with their line numbers, as are rows
+    that match no variation.
+    """
+    help = 'Bulk-updates qty_in_stock from a CSV or JSON Lines file of (id or sku+size, qty) rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to read, or - for stdin.')
+        parser.add_argument('--format', choices=sorted(set(FORMATS.values())), help='Input format (default: from the file extension).')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per UPDATE and transaction (default: 1000).')
+        parser.add_argument('--json', action='store_true', help='Print the result as JSON.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+        started = time.perf_counter()
+        self.errors = []
+        try:
+            format = options['format'] or guess_format(options['path'])
+            # The current quantities are diffed against the new ones, so they must come from the primary.
+            with pin_to_primary():
+                if options['path'] == '-':
+                    result = update_stock_levels(self._entries(sys.stdin, format), chunk_size=options['chunk_size'])
+                else:
+                    with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                        result = update_stock_levels(self._entries(stream, format), chunk_size=options['chunk_size'])
+        except (CatalogImportError, OSError) as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+        rows = result['received'] + len(self.errors)
+
+        if options['json']:
+            self.stdout.write(json.dumps({**result, 'errors': self.errors, 'seconds': elapsed}, indent=2))
+            return
+        for error in self.errors:
+            self.stdout.write(self.style.WARNING(f"Line {error['line']}: {error['error']}"))
+        for entry in result['unknown']:
+            self.stdout.write(self.style.WARNING(f'No variation matches {json.dumps(entry)}'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s): "
+            f"{result['updated']} updated, {result['unchanged']} unchanged, "
+            f"{len(result['unknown'])} unknown, {len(self.errors)} invalid."
+        ))
+
+    def _entries(self, stream, format):
+        """Yields parsed updates, recording invalid rows in self.errors."""
+        line = 0
+        try:
+            if format == 'csv':
+                reader = csv.DictReader(text_lines(stream))
+                if 'qty' not in (reader.fieldnames or []):
+                    raise CatalogImportError('The CSV header lacks the qty column.')
+                rows = ((reader.line_num, raw) for raw in reader)
+            else:
+                rows = enumerate(text_lines(stream), start=1)
+            for line, raw in rows:
+                try:
+                    if format != 'csv':
+                        if not raw.strip():
+                            continue
+                        raw = json.loads(raw)
+                    yield parse_stock_update(raw)
+                except ValueError as exc:
+                    self.errors.append({'line': line, 'error': str(exc)})
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise unreadable_file_error(exc, reader.line_num if format == 'csv' else line) from exc
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:38
+
+from django.db import migrations, models
+from eCommerce.db_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ('product', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['name'], name='product_name_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='productimage',
+            index=models.Index(condition=models.Q(('is_default', True)), fields=['product_item'], name='product_image_default_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='productvariation',
+            index=models.Index(fields=['qty_in_stock'], name='product_var_qty_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariation',
+            name='low_stock_threshold',
+            field=models.PositiveIntegerField(blank=True, help_text='Alert when stock is at or below this level. Blank uses LOW_STOCK_THRESHOLD.', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='productvariation',
+            index=models.Index(condition=models.Q(('low_stock_threshold__isnull', False)), fields=['low_stock_threshold'], name='product_var_threshold_idx'),
+        ),
+    ]
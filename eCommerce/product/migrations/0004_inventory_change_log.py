@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0003_low_stock_threshold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_change_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InventoryChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_qty', models.PositiveIntegerField(blank=True, help_text='Blank for new variations, or when the previous level was not loaded.', null=True)),
+                ('new_qty', models.PositiveIntegerField()),
+                ('source', models.CharField(choices=[('save', 'Saved'), ('import', 'Catalog import'), ('stock_update', 'Bulk stock update')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('variation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_changes', to='product.productvariation')),
+            ],
+        ),
+    ]
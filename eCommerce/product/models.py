@@ -54,6 +54,12 @@ class Product(models.Model):
     care_instructions = models.TextField(blank=True)
     about = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            # Backs `?ordering=name` on the product list.
+            models.Index(fields=['name'], name='product_name_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -85,10 +91,28 @@ class ProductImage(models.Model):
     product_item = models.ForeignKey(ProductItem, on_delete=models.CASCADE, related_name='images')
     image_filename = models.ImageField(upload_to='products/', help_text="Uploads to MEDIA_ROOT/products/")
     is_default = models.BooleanField(default=False, help_text="Is this the main image for this color?")
+    # Filled in by the rendition task (product/images.py) after the image is saved. The
+    # database default lets bulk loaders such as perf/synthetic.py leave renditions out.
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    renditions = models.JSONField(default=list, db_default=[], blank=True, editable=False, help_text="Resized WebP and JPEG copies, smallest first.")
+
+    class Meta:
+        indexes = [
+            # Default-image lookups per colour (cart and list serializers); only default rows are indexed.
+            models.Index(fields=['product_item'], condition=models.Q(is_default=True), name='product_image_default_idx'),
+        ]
 
     def __str__(self):
         return f"Image for {self.product_item}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The file as loaded, so a save only renders renditions when it changes (see product/signals.py).
+        instance._loaded_image_filename = instance.__dict__.get('image_filename')
+        return instance
+
 # --- TIER 3: The Inventory Variant (Size) ---
 class ProductVariation(models.Model):
     """
@@ -98,9 +122,53 @@ class ProductVariation(models.Model):
     product_item = models.ForeignKey(ProductItem, on_delete=models.CASCADE, related_name='variations')
     size = models.ForeignKey(SizeOption, on_delete=models.CASCADE)
     qty_in_stock = models.PositiveIntegerField(default=0)
+    low_stock_threshold = models.PositiveIntegerField(null=True, blank=True, help_text="Alert when stock is at or below this level. Blank uses LOW_STOCK_THRESHOLD.")
 
     class Meta:
         unique_together = ('product_item', 'size') # Prevent duplicate Red-Size M entries
+        indexes = [
+            # Low-stock scans (check_stock) filter on the quantity alone for variations without a threshold...
+            models.Index(fields=['qty_in_stock'], name='product_var_qty_idx'),
+            # ...and read the few variations with their own threshold from this partial index.
+            models.Index(fields=['low_stock_threshold'], condition=models.Q(low_stock_threshold__isnull=False), name='product_var_threshold_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_item} - Size {self.size.size_name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stock level as loaded, so a save can log what it changed (see product/signals.py).
+        if 'qty_in_stock' in instance.__dict__:  # Not deferred
+            instance._loaded_qty_in_stock = instance.qty_in_stock
+        return instance
+
+class InventoryChangeLog(models.Model):
+    """
+    Append-only log of stock level changes, written in the same transaction as the change.
+    Incremental low-stock alerts (product/stock.py) read it past a watermark, so they
+    cost in proportion to the changes since the last run rather than to the catalog size.
+    """
+    SOURCES = [
+        ('save', 'Saved'),
+        ('import', 'Catalog import'),
+        ('stock_update', 'Bulk stock update'),
+    ]
+    variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE, related_name='stock_changes')
+    old_qty = models.PositiveIntegerField(null=True, blank=True, help_text="Blank for new variations, or when the previous level was not loaded.")
+    new_qty = models.PositiveIntegerField()
+    source = models.CharField(max_length=20, choices=SOURCES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Variation {self.variation_id}: {self.old_qty} -> {self.new_qty} ({self.source})"
+
+class InventoryWatermark(models.Model):
+    """The last InventoryChangeLog row a consumer (e.g. low-stock alerts) has processed."""
+    name = models.CharField(max_length=50, unique=True)
+    last_change_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.product_item} - Size {self.size.size_name}"
\ No newline at end of file
+        return f"{self.name}: {self.last_change_id}"
\ No newline at end of file
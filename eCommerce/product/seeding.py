@@ -0,0 +1,135 @@
+"""
+Deterministic catalog generation, shared by `seed_db` and the benchmark dataset.
+
+seed_catalog() builds the same categories, brands, products, prices and stock levels
+for a given (products, seed) pair on every run. Rows are written with bulk_create, one
+transaction per batch, so hundreds of thousands of products are practical. Placeholder
+images are drawn locally with Pillow (one per colour, reused) and written to storage by
+a thread pool while the next batch is inserted, then their renditions are rendered.
+"""
+import io
+import random
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from functools import lru_cache
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from .cache import invalidate_catalog_cache
+from .images import generate_renditions
+from .models import Brand, Colour, Product, ProductCategory, ProductImage, ProductItem, ProductVariation, SizeOption
+
+# Category -> product types sold in it.
+CATEGORIES = {
+    'T-Shirts': ['Crewneck Tee', 'Graphic Print Tee', 'V-Neck Tee', 'Polo Shirt', 'Long-Sleeve Tee'],
+    'Hoodies': ['Pullover Hoodie', 'Zip-Up Hoodie', 'Lightweight Hoodie'],
+    'Jeans': ['Slim Fit Jeans', 'Straight Leg Jeans', 'Bootcut Jeans'],
+    'Sneakers': ['Running Shoes', 'High-Top Sneakers', 'Skate Shoes', 'Canvas Sneakers'],
+    'Hats': ['Baseball Cap', 'Beanie', 'Bucket Hat'],
+    'Jackets': ['Denim Jacket', 'Windbreaker', 'Bomber Jacket', 'Fleece Jacket'],
+    'Shorts': ['Cargo Shorts', 'Athletic Shorts', 'Chino Shorts'],
+}
+BRANDS = ['Nike', 'Adidas', 'Puma', "Levi's", 'Vans', 'The North Face', 'Under Armour']
+# Colour name -> RGB used for its placeholder image.
+COLOURS = {
+    'Black': (33, 33, 33), 'White': (240, 240, 240), 'Red': (198, 40, 40), 'Blue': (30, 90, 180),
+    'Grey': (140, 140, 140), 'Green': (46, 125, 50), 'Yellow': (240, 200, 40),
+}
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+ADJECTIVES = ['Classic', 'Essential', 'Vintage', 'Sport', 'Everyday', 'Premium', 'Relaxed', 'Organic']
+
+@lru_cache(maxsize=None)
+def placeholder_jpeg(rgb, size):
+    """Returns JPEG bytes for a square placeholder in the given colour."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', (size, size), rgb)
+    shade = tuple(max(0, channel - 40) for channel in rgb)
+    margin = size // 4
+    ImageDraw.Draw(image).rounded_rectangle((margin, margin, size - margin, size - margin), radius=size // 16, fill=shade)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+def _write_image(name, content):
+    # File names are deterministic, so a re-seed replaces the previous run's files.
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(content))
+
+def seed_catalog(products, seed=0, batch_size=1000, images=True, image_size=800, image_workers=8, progress=None):
+    """
+    Creates `products` products (1-3 colours each, 2-6 consecutive sizes per colour) and
+    the lookup tables. Expects a database without catalog rows. With images=False only
+    the image file names are stored. `progress(counts)` is called after every batch.
+    Returns a dict of row counts.
+    """
+    rng = random.Random(seed)
+    with transaction.atomic():
+        categories = ProductCategory.objects.bulk_create(ProductCategory(name=name) for name in CATEGORIES)
+        brands = Brand.objects.bulk_create(Brand(name=name) for name in BRANDS)
+        colours = Colour.objects.bulk_create(Colour(colour_name=name) for name in COLOURS)
+        sizes = SizeOption.objects.bulk_create(SizeOption(size_name=name, sort_order=index) for index, name in enumerate(SIZES))
+
+    counts = {'products': 0, 'items': 0, 'images': 0, 'variations': 0}
+    with ThreadPoolExecutor(max_workers=image_workers) as executor:
+        pending_writes = []
+        for start in range(0, products, batch_size):
+            with transaction.atomic():
+                product_objs = []
+                for index in range(start, min(start + batch_size, products)):
+                    category = rng.choice(categories)
+                    brand = rng.choice(brands)
+                    name = f'{rng.choice(ADJECTIVES)} {rng.choice(CATEGORIES[category.name])}'
+                    product_objs.append(Product(name=name, category=category, brand=brand, description=f'A high-quality {name} from {brand.name}.'))
+                product_objs = Product.objects.bulk_create(product_objs)
+
+                item_objs = []
+                for index, product in enumerate(product_objs, start=start):
+                    for colour in rng.sample(colours, rng.randint(1, 3)):
+                        original_price = Decimal(rng.randint(1000, 15000)) / 100
+                        on_sale = rng.random() < 0.2
+                        item_objs.append(ProductItem(
+                            product=product,
+                            colour=colour,
+                            sku_base=f'SEED-{index + 1:07d}-{colour.colour_name.upper()}',
+                            original_price=original_price,
+                            sale_price=(original_price * Decimal('0.8')).quantize(Decimal('0.01')) if on_sale else None,
+                        ))
+                item_objs = ProductItem.objects.bulk_create(item_objs)
+
+                image_objs = [ProductImage(product_item=item, image_filename=f'products/seed/{item.sku_base}.jpg', is_default=True) for item in item_objs]
+                ProductImage.objects.bulk_create(image_objs)
+
+                variation_objs = []
+                for item in item_objs:
+                    count = rng.randint(2, len(sizes))
+                    first = rng.randint(0, len(sizes) - count)
+                    variation_objs.extend(
+                        ProductVariation(product_item=item, size=size, qty_in_stock=rng.randint(0, 100))
+                        for size in sizes[first:first + count]
+                    )
+                ProductVariation.objects.bulk_create(variation_objs)
+
+            if images:
+                pending_writes.extend(
+                    executor.submit(_write_image, image.image_filename.name, placeholder_jpeg(COLOURS[image.product_item.colour.colour_name], image_size))
+                    for image in image_objs
+                )
+            counts['products'] += len(product_objs)
+            counts['items'] += len(item_objs)
+            counts['images'] += len(image_objs)
+            counts['variations'] += len(variation_objs)
+            if progress:
+                progress(counts)
+
+        for write in pending_writes:
+            write.result()  # Re-raises the first failed write
+
+    if images:
+        # The placeholders repeat per colour, so only one image per colour is actually resized.
+        generate_renditions(ProductImage.objects.order_by('id').iterator(), workers=image_workers)
+    # bulk_create bypasses the signals that keep the catalog cache fresh.
+    invalidate_catalog_cache()
+    return counts
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .images import LIST_IMAGE_WIDTH, image_srcset, image_url
 from .models import (
     ProductCategory, Brand, Colour, SizeOption,
     Product, ProductItem, ProductImage, ProductVariation
@@ -36,9 +37,14 @@ class ProductVariationSerializer(serializers.ModelSerializer):
 
 # --- Tier 2: Item (Color + Images) ---
 class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImage
-        fields = ['id', 'image_filename', 'is_default']
+        fields = ['id', 'image_filename', 'is_default', 'width', 'height', 'srcset']
+
+    def get_srcset(self, obj):
+        return image_srcset(obj, self.context.get('request'))
 
 class ProductItemSerializer(serializers.ModelSerializer):
     colour = serializers.StringRelatedField()
@@ -62,23 +68,30 @@ class ProductListSerializer(serializers.ModelSerializer):
     # The 'price' field now comes directly from the annotated queryset in the view.
     price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'brand', 'category', 'price', 'image']
+        fields = ['id', 'name', 'brand', 'category', 'price', 'image', 'image_srcset']
 
-    def get_image(self, obj):
-        """Returns the URL of the first default image found for any item."""
+    def _default_image(self, obj):
+        """The first default image found for any item."""
         # The view should have prefetched 'items__images'
         for item in obj.items.all():
             default_image = next((img for img in item.images.all() if img.is_default), None)
             if default_image:
-                request = self.context.get('request')
-                if request:
-                    return request.build_absolute_uri(default_image.image_filename.url)
-                return default_image.image_filename.url
+                return default_image
         return None
 
+    def get_image(self, obj):
+        """Returns the URL of the main image, resized for the catalog grid once its renditions exist."""
+        default_image = self._default_image(obj)
+        return image_url(default_image, LIST_IMAGE_WIDTH, self.context.get('request')) if default_image else None
+
+    def get_image_srcset(self, obj):
+        default_image = self._default_image(obj)
+        return image_srcset(default_image, self.context.get('request')) if default_image else None
+
 class ProductDetailSerializer(serializers.ModelSerializer):
     """
     Heavy serializer for the Product Detail Page.
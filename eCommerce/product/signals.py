@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from .cache import invalidate_catalog_cache
+from .stock import log_stock_changes
+from .tasks import queue_image_renditions
+from .models import (
+    Brand,
+    Colour,
+    Product,
+    ProductCategory,
+    ProductImage,
+    ProductItem,
+    ProductVariation,
+    SizeOption,
+)
+
+# Every model whose data appears in a cached catalog response.
+CATALOG_MODELS = [Brand, Colour, Product, ProductCategory, ProductImage, ProductItem, ProductVariation, SizeOption]
+
+def invalidate_catalog_on_change(sender, **kwargs):
+    """Drops cached catalog responses whenever catalog data changes."""
+    # Invalidate now, and again after commit so no request can cache pre-commit data.
+    invalidate_catalog_cache()
+    transaction.on_commit(invalidate_catalog_cache)
+
+for model in CATALOG_MODELS:
+    post_save.connect(invalidate_catalog_on_change, sender=model, dispatch_uid=f'catalog-cache-save-{model.__name__}')
+    post_delete.connect(invalidate_catalog_on_change, sender=model, dispatch_uid=f'catalog-cache-delete-{model.__name__}')
+
+def log_stock_change_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Logs a variation's stock change when it is saved (admin, API); bulk writers log their own."""
+    if raw or (update_fields is not None and 'qty_in_stock' not in update_fields):
+        return
+    if not created and not hasattr(instance, '_loaded_qty_in_stock'):
+        # Loaded with qty_in_stock deferred (or built by hand), so the old level is unknown;
+        # logging None would read as a new variation.
+        instance._loaded_qty_in_stock = instance.qty_in_stock
+        return
+    old_qty = None if created else instance._loaded_qty_in_stock
+    if old_qty != instance.qty_in_stock:
+        log_stock_changes([(instance.pk, old_qty, instance.qty_in_stock)], 'save')
+    instance._loaded_qty_in_stock = instance.qty_in_stock
+
+post_save.connect(log_stock_change_on_save, sender=ProductVariation, dispatch_uid='inventory-change-log-save')
+
+def render_image_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Queues the renditions of an image whose file was uploaded or replaced."""
+    if raw or (update_fields is not None and 'image_filename' not in update_fields):
+        return
+    name = instance.image_filename.name
+    if name and (created or name != getattr(instance, '_loaded_image_filename', None)):
+        if not created and instance.renditions:
+            # The old renditions show the old file; serve the new original until the new ones exist.
+            instance.width, instance.height, instance.renditions = None, None, []
+            ProductImage.objects.filter(pk=instance.pk).update(width=None, height=None, renditions=[])
+        queue_image_renditions([instance.pk])
+    instance._loaded_image_filename = name
+
+post_save.connect(render_image_on_save, sender=ProductImage, dispatch_uid='product-image-renditions-save')
@@ -0,0 +1,309 @@
+"""
+Stock levels: bulk updates from warehouse sync, the inventory change log and low-stock
+reporting.
+
+update_stock_levels() applies thousands of (variation, quantity) pairs with one locking SELECT and
+one set-based UPDATE per chunk, skipping rows whose quantity is unchanged, and drops the
+cached catalog responses once per call instead of once per row.
+
+Every stock change (saves, catalog imports, bulk updates) is appended to the
+InventoryChangeLog by log_stock_changes(). low_stock_changes() reads the log past a
+watermark and reports each variation once per fall to or below its threshold, so the
+periodic alert costs in proportion to the changes since the last run.
+
+low_stock_rows() streams every variation at or below its threshold as flat dicts from a
+single joined query, so a catalog with millions of variations is reported in constant
+memory and without a query per row. It backs the `check_stock` command.
+"""
+import csv
+import io
+import json
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import connection, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .cache import invalidate_catalog_cache
+from .models import InventoryChangeLog, InventoryWatermark, ProductVariation
+
+# Columns of the report, in order.
+LOW_STOCK_FIELDS = ['variation_id', 'sku', 'product', 'colour', 'size', 'qty_in_stock', 'threshold']
+# Variations listed in the body of the alert email; all of them are in the attached CSV.
+EMAIL_BODY_ROWS = 50
+# InventoryWatermark of the incremental low-stock alerts.
+LOW_STOCK_WATERMARK = 'low-stock-alert'
+
+# --- Change log ---
+
+def log_stock_changes(changes, source):
+    """Appends [(variation id, old qty or None, new qty), ...] to the InventoryChangeLog in one INSERT."""
+    InventoryChangeLog.objects.bulk_create(
+        InventoryChangeLog(variation_id=variation_id, old_qty=old_qty, new_qty=new_qty, source=source)
+        for variation_id, old_qty, new_qty in changes
+    )
+
+def prune_inventory_changes(days=None):
+    """
+    Deletes change log rows older than `days` (default INVENTORY_LOG_RETENTION_DAYS)
+    that the low-stock alerts have already processed. Returns the number deleted.
+    """
+    days = settings.INVENTORY_LOG_RETENTION_DAYS if days is None else days
+    watermark = InventoryWatermark.objects.filter(name=LOW_STOCK_WATERMARK).values_list('last_change_id', flat=True).first() or 0
+    deleted, _ = InventoryChangeLog.objects.filter(id__lte=watermark, created_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
+
+# --- Bulk updates ---
+
+def parse_stock_update(raw):
+    """
+    Validates one update: {"id": variation id, "qty": n} or {"sku": ..., "size": ..., "qty": n}.
+    Returns it normalised; raises ValueError.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError('must be an object')
+    qty = raw.get('qty')
+    if isinstance(qty, str) and qty.strip().isdigit():
+        qty = int(qty)
+    if isinstance(qty, bool) or not isinstance(qty, int) or qty < 0:
+        raise ValueError('qty must be a whole number of at least 0')
+    if raw.get('id') not in (None, ''):
+        try:
+            return {'id': int(raw['id']), 'qty': qty}
+        except (TypeError, ValueError):
+            raise ValueError('id must be a variation id')
+    sku, size = str(raw.get('sku') or '').strip(), str(raw.get('size') or '').strip()
+    if not sku or not size:
+        raise ValueError('give either id, or sku and size')
+    return {'sku': sku, 'size': size, 'qty': qty}
+
+def _update_quantities(changes):
+    """Sets qty_in_stock for [(variation id, qty), ...] in a single UPDATE ... FROM (VALUES ...)."""
+    quote = connection.ops.quote_name
+    table = quote(ProductVariation._meta.db_table)
+    id_column = quote(ProductVariation._meta.pk.column)
+    qty_column = quote(ProductVariation._meta.get_field('qty_in_stock').column)
+    # A CTE names the VALUES columns portably (SQLite has no `AS v(id, qty)`); the casts type them for PostgreSQL.
+    values = ', '.join(['(CAST(%s AS bigint), CAST(%s AS integer))'] * len(changes))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH new_stock (id, qty) AS (VALUES {values}) '
+            f'UPDATE {table} SET {qty_column} = new_stock.qty FROM new_stock WHERE {table}.{id_column} = new_stock.id',
+            [value for change in changes for value in change],
+        )
+
+def _apply_stock_chunk(chunk, result):
+    # Later entries for the same variation win.
+    by_id = {entry['id']: entry for entry in chunk if 'id' in entry}
+    by_sku = {(entry['sku'], entry['size']): entry for entry in chunk if 'sku' in entry}
+    condition = Q(id__in=by_id)
+    if by_sku:
+        condition |= Q(product_item__sku_base__in={sku for sku, _ in by_sku})
+    with transaction.atomic():
+        current, resolved = {}, {}
+        # Locked reads run on the primary, so the diff is against the rows being updated, not a
+        # lagging replica, and a concurrent writer cannot change them before the UPDATE.
+        rows = ProductVariation.objects.select_for_update(of=('self',)).filter(condition)
+        for id, sku, size, qty in rows.values_list('id', 'product_item__sku_base', 'size__size_name', 'qty_in_stock'):
+            current[id] = qty
+            if (sku, size) in by_sku:
+                resolved[(sku, size)] = id
+
+        wanted = {id: entry['qty'] for id, entry in by_id.items() if id in current}
+        wanted.update((resolved[key], entry['qty']) for key, entry in by_sku.items() if key in resolved)
+        changes = [(id, qty) for id, qty in wanted.items() if current[id] != qty]
+        if changes:
+            _update_quantities(changes)
+            log_stock_changes([(id, current[id], qty) for id, qty in changes], 'stock_update')
+
+    result['updated'] += len(changes)
+    result['unchanged'] += len(wanted) - len(changes)
+    result['unknown'].extend(entry for id, entry in by_id.items() if id not in current)
+    result['unknown'].extend(entry for key, entry in by_sku.items() if key not in resolved)
+
+def update_stock_levels(entries, chunk_size=1000):
+    """
+    Applies parsed updates (see parse_stock_update) in chunks of `chunk_size`, each in
+    its own transaction. Returns {'received', 'updated', 'unchanged', 'unknown'}, where
+    `unknown` lists the entries that matched no variation.
+    """
+    result = {'received': 0, 'updated': 0, 'unchanged': 0, 'unknown': []}
+    chunk = []
+    try:
+        for entry in entries:
+            result['received'] += 1
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                _apply_stock_chunk(chunk, result)
+                chunk = []
+        if chunk:
+            _apply_stock_chunk(chunk, result)
+    finally:
+        if result['updated']:
+            # Raw UPDATEs bypass the signals that keep the catalog cache fresh.
+            invalidate_catalog_cache()
+            transaction.on_commit(invalidate_catalog_cache)
+    return result
+
+# --- Low-stock reporting ---
+
+def low_stock_variations(threshold=None):
+    """
+    Variations with qty_in_stock at or below their own low_stock_threshold, or at or below
+    `threshold` (default LOW_STOCK_THRESHOLD) when they have none. The two branches are
+    index range scans on product_var_qty_idx and product_var_threshold_idx (hence
+    `>= 0` rather than IS NOT NULL); sorting the result would turn them into a full scan.
+    """
+    threshold = settings.LOW_STOCK_THRESHOLD if threshold is None else threshold
+    return (
+        ProductVariation.objects
+        .filter(
+            Q(low_stock_threshold__isnull=True, qty_in_stock__lte=threshold)
+            | Q(low_stock_threshold__gte=0, qty_in_stock__lte=F('low_stock_threshold'))
+        )
+        .annotate(threshold=Coalesce('low_stock_threshold', Value(threshold)))
+    )
+
+def low_stock_rows(threshold=None, chunk_size=2000, variation_ids=None):
+    """
+    Streams the low-stock report as dicts keyed by LOW_STOCK_FIELDS; with `variation_ids`,
+    only for those variations.
+    """
+    if variation_ids is None:
+        querysets = [low_stock_variations(threshold)]
+    else:
+        ids = sorted(variation_ids)
+        querysets = (low_stock_variations(threshold).filter(id__in=ids[start:start + chunk_size]) for start in range(0, len(ids), chunk_size))
+    for queryset in querysets:
+        rows = queryset.values_list(
+            'id', 'product_item__sku_base', 'product_item__product__name', 'product_item__colour__colour_name',
+            'size__size_name', 'qty_in_stock', 'threshold',
+        ).iterator(chunk_size=chunk_size)
+        for row in rows:
+            yield dict(zip(LOW_STOCK_FIELDS, row))
+
+def low_stock_crossings(after_id, threshold=None, until=None, batch_size=5000):
+    """
+    Reads the InventoryChangeLog past change `after_id` in id order and in batches,
+    stopping at the first change made after `until`. Returns (ids of the variations
+    whose stock fell to or below their threshold, id of the last change read).
+
+    Stopping there, instead of skipping newer changes, keeps the changes read a
+    contiguous run of ids: a change with a lower id that commits late is still ahead
+    of the returned id, and is read by the next run.
+
+    A change counts when it takes the quantity from above the threshold (or from
+    nothing, for a new variation) to at or below it. A variation that stays low is
+    therefore reported once, and again only after it has been restocked.
+    """
+    threshold = settings.LOW_STOCK_THRESHOLD if threshold is None else threshold
+    until = until or timezone.now()
+    changes = InventoryChangeLog.objects.order_by('id').annotate(
+        threshold=Coalesce('variation__low_stock_threshold', Value(threshold)),
+    )
+    crossed, last_id = set(), after_id
+    while True:
+        batch = list(changes.filter(id__gt=last_id).values_list('id', 'variation_id', 'old_qty', 'new_qty', 'threshold', 'created_at')[:batch_size])
+        for id, variation_id, old_qty, new_qty, variation_threshold, created_at in batch:
+            if created_at > until:
+                return crossed, last_id
+            if new_qty <= variation_threshold and (old_qty is None or old_qty > variation_threshold):
+                crossed.add(variation_id)
+            last_id = id
+        if len(batch) < batch_size:
+            return crossed, last_id
+
+@contextmanager
+def low_stock_changes(threshold=None, lag=None, batch_size=5000):
+    """
+    Yields the low-stock report rows (as low_stock_rows) for variations that fell to or
+    below their threshold since the previous run and are still there, and advances the
+    watermark when the block completes.
+
+    The run holds the watermark row in a transaction, so overlapping runs wait for each
+    other and a failed run is repeated in full. Changes younger than `lag` seconds
+    (default LOW_STOCK_ALERT_LAG), and every change after them, wait for the next run,
+    so rows from transactions still in flight are not skipped.
+    """
+    lag = settings.LOW_STOCK_ALERT_LAG if lag is None else lag
+    with transaction.atomic():
+        watermark, _ = InventoryWatermark.objects.select_for_update().get_or_create(name=LOW_STOCK_WATERMARK)
+        crossed, last_id = low_stock_crossings(
+            watermark.last_change_id, threshold, until=timezone.now() - timedelta(seconds=lag), batch_size=batch_size,
+        )
+        yield low_stock_rows(threshold, variation_ids=crossed)
+        if last_id != watermark.last_change_id:
+            watermark.last_change_id = last_id
+            watermark.save(update_fields=['last_change_id', 'updated_at'])
+
+def format_row(row):
+    return f"{row['product']} ({row['sku']}), colour {row['colour']}, size {row['size']}: {row['qty_in_stock']} left (threshold {row['threshold']})"
+
+def write_csv(rows, stream):
+    """Writes rows to `stream` as CSV with a header; returns the number of rows."""
+    writer = csv.DictWriter(stream, LOW_STOCK_FIELDS)
+    writer.writeheader()
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+    return count
+
+def write_json(rows, stream):
+    """Writes rows to `stream` as a JSON array, one object per line; returns the number of rows."""
+    # Every write ends in a newline, as management commands' stdout wrapper expects.
+    stream.write('[\n')
+    count, previous = 0, None
+    for count, row in enumerate(rows, start=1):
+        if previous is not None:
+            stream.write(f'  {previous},\n')
+        previous = json.dumps(row)
+    if previous is not None:
+        stream.write(f'  {previous}\n')
+    stream.write(']\n')
+    return count
+
+class LowStockAlert:
+    """
+    Builds a single email covering every reported row: the first EMAIL_BODY_ROWS in the
+    body and all of them in an attached CSV.
+    """
+    def __init__(self):
+        self.count = 0
+        self._lines = []
+        self._attachment = io.StringIO()
+        self._writer = csv.DictWriter(self._attachment, LOW_STOCK_FIELDS)
+        self._writer.writeheader()
+
+    def add(self, row):
+        self.count += 1
+        self._writer.writerow(row)
+        if self.count <= EMAIL_BODY_ROWS:
+            self._lines.append(f'- {format_row(row)}')
+
+    def collect(self, rows):
+        """Yields rows unchanged, adding each one to the alert on the way."""
+        for row in rows:
+            self.add(row)
+            yield row
+
+    def send(self, recipients=None):
+        """
+        Sends the email to `recipients` (default LOW_STOCK_ALERT_RECIPIENTS) and returns
+        the number of rows reported. Nothing is sent without rows or recipients.
+        """
+        recipients = settings.LOW_STOCK_ALERT_RECIPIENTS if recipients is None else recipients
+        if not self.count or not recipients:
+            return self.count
+        lines = self._lines + ([f'...and {self.count - EMAIL_BODY_ROWS} more.'] if self.count > EMAIL_BODY_ROWS else [])
+        message = EmailMessage(
+            subject=f'Low stock: {self.count} product variation{"s" if self.count != 1 else ""}',
+            body='The following items are at or below their low-stock threshold:\n\n' + '\n'.join(lines) + '\n\nThe full list is attached.\n',
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=recipients,
+        )
+        message.attach('low-stock.csv', self._attachment.getvalue(), 'text/csv')
+        message.send()
+        return self.count
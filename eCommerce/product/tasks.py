@@ -0,0 +1,59 @@
+import logging
+
+from celery import shared_task
+from django.db import transaction
+from eCommerce.db_router import pin_to_primary
+from kombu.exceptions import OperationalError
+from .images import generate_renditions
+from .models import ProductImage
+from .stock import LowStockAlert, low_stock_changes, prune_inventory_changes
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def generate_image_renditions_task(image_ids):
+    """
+    Renders the resized WebP and JPEG copies of the given ProductImages (see
+    product/images.py). Returns the number of images rendered.
+    """
+    # Queued on commit; a lagging replica might not have the images yet, and they would be skipped for good.
+    with pin_to_primary():
+        return generate_renditions(ProductImage.objects.filter(id__in=image_ids).order_by('id'))
+
+def queue_image_renditions(image_ids):
+    """
+    Queues generate_image_renditions_task once the current transaction commits. Until it
+    runs, the serializers fall back to the original image, so a broker outage is logged
+    rather than failing the save; `generate_renditions` backfills what was missed.
+    """
+    image_ids = list(image_ids)
+    if not image_ids:
+        return
+
+    def queue():
+        try:
+            generate_image_renditions_task.delay(image_ids)
+        except OperationalError as exc:
+            logger.warning(f"Cannot queue renditions for {len(image_ids)} images: {exc}")
+
+    transaction.on_commit(queue)
+
+@shared_task
+def send_low_stock_changes_task():
+    """
+    Emails the variations whose stock fell to or below their threshold since the
+    previous run, once per fall, and prunes the processed inventory change log.
+    Runs on Celery beat every LOW_STOCK_CHECK_INTERVAL seconds; its cost follows the
+    number of stock changes, not the catalog size.
+    Returns the number of variations reported.
+    """
+    alert = LowStockAlert()
+    # The change log was written moments ago; a lagging replica would miss the newest changes.
+    with pin_to_primary():
+        with low_stock_changes() as rows:
+            for row in rows:
+                alert.add(row)
+            # Sent before the watermark moves on, so a failed send is retried next run.
+            alert.send()
+        prune_inventory_changes()
+    return alert.count
@@ -1,8 +1,38 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import AsyncRequestFactory, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
-from .models import Product, ProductCategory, Brand, Colour, SizeOption, ProductItem, ProductImage, ProductVariation
+from perf.testing import QueryBudgetMixin
+from users.models import SiteUser
+from eCommerce.streaming import aiterate
+from .cache import CATALOG_VERSION_KEY, invalidate_catalog_cache
+from .feed import FEED_FIELDS
+from .images import RENDITION_DIR, generate_renditions
+from .importers import CatalogImportError, import_catalog, import_uploaded_file
+from .stock import parse_stock_update, update_stock_levels
+from .tasks import generate_image_renditions_task, send_low_stock_changes_task
+from .models import Product, ProductCategory, Brand, Colour, SizeOption, ProductItem, ProductImage, ProductVariation, InventoryChangeLog, InventoryWatermark
+from .views import AsyncProductDetailView, AsyncProductListView
+from datetime import timedelta
 from decimal import Decimal
+from functools import partial
+from unittest.mock import patch
 
 class ProductModelTests(APITestCase):
     """
@@ -163,6 +193,16 @@ class ProductAPITests(APITestCase):
         self.assertEqual(response.data['count'], 1)
         self.assertEqual(response.data['results'][0]['name'], 'Adidas Ultraboost')
 
+    def test_detail_with_many_colours_has_no_n_plus_one(self):
+        """The detail view does not query per colour or size (the SQL instrumentation would raise)."""
+        for index in range(6):
+            item = ProductItem.objects.create(product=self.prod_tshirt, colour=Colour.objects.create(colour_name=f'Shade {index}'), sku_base=f'NIKE-TSHIRT-{index}', original_price=40.00)
+            ProductImage.objects.create(product_item=item, image_filename=f'tshirt_{index}.jpg', is_default=True)
+            ProductVariation.objects.create(product_item=item, size=SizeOption.objects.create(size_name=f'S{index}'), qty_in_stock=3)
+
+        response = self.client.get(reverse('product-detail', kwargs={'id': self.prod_tshirt.id}))
+        self.assertEqual(len(response.data['items']), 7)
+
     def test_404_for_nonexistent_product(self):
         """Test that a 404 is returned for a product ID that does not exist."""
         url = reverse('product-detail', kwargs={'id': 999})
@@ -170,3 +210,852 @@ class ProductAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertIn('errors', response.data)
         self.assertIn('detail', response.data['errors'])
+
+class AsyncProductViewTests(APITestCase):
+    """
+    The async catalog views must return exactly what the sync DRF views return,
+    and must not serve cached responses after catalog data changes.
+    """
+    def setUp(self):
+        category = ProductCategory.objects.create(name='Footwear')
+        brand = Brand.objects.create(name='Nike')
+        colour = Colour.objects.create(colour_name='Red')
+        size = SizeOption.objects.create(size_name='10')
+        self.products = []
+        for index in range(15):  # More than one page (PAGE_SIZE is 12)
+            product = Product.objects.create(name=f'Runner {index}', category=category, brand=brand, description='A shoe')
+            item = ProductItem.objects.create(product=product, colour=colour, sku_base=f'RUN-{index}', original_price=100 + index)
+            ProductImage.objects.create(product_item=item, image_filename=f'runner_{index}.jpg', is_default=True)
+            ProductVariation.objects.create(product_item=item, size=size, qty_in_stock=5)
+            self.products.append(product)
+        self.factory = AsyncRequestFactory()
+
+    def async_get(self, view, path, **kwargs):
+        """Runs an async view to completion and returns (status_code, decoded JSON)."""
+        response = async_to_sync(view.as_view())(self.factory.get(path), **kwargs)
+        return response.status_code, json.loads(response.content)
+
+    def test_list_matches_sync_view(self):
+        """Pagination, filtering, ordering and search produce the same payload as ProductListView."""
+        url = reverse('product-list')
+        for query in ['', '?page=2', '?ordering=-price', '?min_price=105&max_price=108', '?search=Runner%201']:
+            with self.subTest(query=query):
+                expected = self.client.get(url + query).json()
+                status_code, data = self.async_get(AsyncProductListView, url + query)
+                self.assertEqual(status_code, status.HTTP_200_OK)
+                self.assertEqual(data, expected)
+
+    def test_list_invalid_page_is_404(self):
+        """Out-of-range pages are rejected like the sync paginator does."""
+        status_code, data = self.async_get(AsyncProductListView, reverse('product-list') + '?page=9')
+        self.assertEqual(status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn('detail', data['errors'])
+
+    def test_detail_matches_sync_view(self):
+        """The async detail view returns the ProductDetailView payload, and 404s like it."""
+        product = self.products[0]
+        url = reverse('product-detail', kwargs={'id': product.id})
+        status_code, data = self.async_get(AsyncProductDetailView, url, id=product.id)
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(data, self.client.get(url).json())
+
+        status_code, data = self.async_get(AsyncProductDetailView, reverse('product-detail', kwargs={'id': 999}), id=999)
+        self.assertEqual(status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn('detail', data['errors'])
+
+    def test_cached_responses_are_invalidated_on_change(self):
+        """Saving a catalog model bumps the catalog version so the next read is fresh."""
+        product = self.products[0]
+        url = reverse('product-detail', kwargs={'id': product.id})
+        self.async_get(AsyncProductDetailView, url, id=product.id)
+
+        product.name = 'Renamed Runner'
+        product.save()
+
+        _, data = self.async_get(AsyncProductDetailView, url, id=product.id)
+        self.assertEqual(data['name'], 'Renamed Runner')
+
+    def test_evicted_version_does_not_revive_stale_responses(self):
+        """A version key evicted and written again never matches one whose responses are cached."""
+        product = self.products[0]
+        url = reverse('product-detail', kwargs={'id': product.id})
+        self.async_get(AsyncProductDetailView, url, id=product.id)
+
+        Product.objects.filter(pk=product.pk).update(name='Renamed Runner')
+        cache.delete(CATALOG_VERSION_KEY)
+        invalidate_catalog_cache()
+
+        _, data = self.async_get(AsyncProductDetailView, url, id=product.id)
+        self.assertEqual(data['name'], 'Renamed Runner')
+
+class ProductQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """
+    Product endpoints run a fixed number of queries however many products, colours,
+    images and sizes there are.
+    """
+    def setUp(self):
+        self.category = ProductCategory.objects.create(name='Apparel', parent_category=ProductCategory.objects.create(name='Clothing'))
+        self.brand = Brand.objects.create(name='Nike')
+        self.sizes = SizeOption.objects.bulk_create(SizeOption(size_name=name, sort_order=index) for index, name in enumerate(['S', 'M', 'L']))
+
+    def create_product(self, name, colours):
+        """Creates a product with `colours` colours, each with a default image and every size."""
+        product = Product.objects.create(name=name, category=self.category, brand=self.brand, description='Soft cotton')
+        colour_objs = Colour.objects.bulk_create(Colour(colour_name=f'{name} colour {index}') for index in range(colours))
+        items = ProductItem.objects.bulk_create(
+            ProductItem(product=product, colour=colour, sku_base=f'{name}-{index}', original_price=Decimal(20 + index))
+            for index, colour in enumerate(colour_objs)
+        )
+        ProductImage.objects.bulk_create(ProductImage(product_item=item, image_filename=f'{item.sku_base}.jpg', is_default=True) for item in items)
+        ProductVariation.objects.bulk_create(ProductVariation(product_item=item, size=size, qty_in_stock=5) for item in items for size in self.sizes)
+        return product
+
+    def populate_catalog(self, size):
+        """`size` products; the first one also has `size` colours."""
+        self.create_product('Shirt 0', colours=size)
+        for index in range(1, size):
+            self.create_product(f'Shirt {index}', colours=2)
+
+    def test_product_list(self):
+        self.assertQueryBudget(4, self.populate_catalog, lambda _: self.client.get(reverse('product-list')))
+
+    def test_product_list_filtered_and_ordered(self):
+        url = reverse('product-list') + '?min_price=10&max_price=500&brand=Nike&search=shirt&ordering=-price'
+        self.assertQueryBudget(4, self.populate_catalog, lambda _: self.client.get(url))
+
+    def test_product_detail(self):
+        self.assertQueryBudget(
+            4,
+            lambda size: self.create_product('Shirt', colours=size),
+            lambda product: self.client.get(reverse('product-detail', kwargs={'id': product.id})),
+        )
+
+    def test_admin_pages(self):
+        """Admin changelists and change pages with inlines run a fixed number of queries however many rows they show."""
+        # Change pages render a <select> of every colour or size per inline row, which is slow with 200 of each.
+        self.query_budget_sizes = (5, 50)
+        self.client.force_login(SiteUser.objects.create_superuser(email='admin@example.com', username='admin', password='pw'))
+        ContentType.objects.get_for_models(*apps.get_app_config('product').get_models())  # Cached for both runs
+
+        def populate_item(size):
+            """A colour with `size` sizes and images."""
+            item = self.create_product('Shirt', colours=1).items.get()
+            sizes = SizeOption.objects.bulk_create(SizeOption(size_name=f'EU {index}') for index in range(size))
+            ProductVariation.objects.bulk_create(ProductVariation(product_item=item, size=option) for option in sizes)
+            ProductImage.objects.bulk_create(ProductImage(product_item=item, image_filename=f'{index}.jpg') for index in range(size))
+            return item
+
+        def populate_changes(size):
+            self.populate_catalog(size)
+            InventoryChangeLog.objects.bulk_create(InventoryChangeLog(variation=variation, new_qty=1, source='save') for variation in ProductVariation.objects.all())
+
+        change_url = lambda model: lambda obj: self.client.get(reverse(f'admin:product_{model}_change', args=[obj.id]))
+        changelist_url = lambda model: lambda _: self.client.get(reverse(f'admin:product_{model}_changelist'))
+        for page, budget, populate, request in [
+            ('product changelist', 4, self.populate_catalog, changelist_url('product')),
+            ('product change', 8, lambda size: self.create_product('Shirt', colours=size), change_url('product')),
+            ('item changelist', 4, self.populate_catalog, changelist_url('productitem')),
+            ('item change', 10, populate_item, change_url('productitem')),
+            ('image changelist', 4, self.populate_catalog, changelist_url('productimage')),
+            ('variation changelist', 4, self.populate_catalog, changelist_url('productvariation')),
+            ('category changelist', 5, lambda size: ProductCategory.objects.bulk_create(ProductCategory(name=f'Sub {index}', parent_category=self.category) for index in range(size)), changelist_url('productcategory')),
+            ('change log changelist', 4, populate_changes, changelist_url('inventorychangelog')),
+        ]:
+            with self.subTest(page=page):
+                self.assertQueryBudget(budget, populate, request)
+
+class SeedDbCommandTests(TestCase):
+    """Tests for the `seed_db` command, writing its images to a temporary MEDIA_ROOT."""
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = Path(media_root.name)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def seed(self, *args):
+        call_command('seed_db', '--image-size', '32', '--batch-size', '4', *args, stdout=StringIO())
+
+    def catalog_snapshot(self):
+        return list(ProductVariation.objects.order_by('product_item__sku_base', 'size__sort_order').values_list(
+            'product_item__product__name', 'product_item__product__category__name', 'product_item__sku_base',
+            'product_item__original_price', 'product_item__sale_price', 'size__size_name', 'qty_in_stock',
+        ))
+
+    def test_seeds_catalog_with_image_files(self):
+        self.seed('--products', '10')
+        self.assertEqual(Product.objects.count(), 10)
+        images = ProductImage.objects.all()
+        self.assertEqual(images.count(), ProductItem.objects.count())
+        for image in images:
+            self.assertTrue((self.media_root / image.image_filename.name).is_file())
+
+    def test_same_seed_gives_same_catalog(self):
+        self.seed('--products', '10', '--seed', '3')
+        first = self.catalog_snapshot()
+        Product.objects.all().delete()
+        self.seed('--products', '10', '--seed', '3')
+        self.assertEqual(self.catalog_snapshot(), first)
+
+    def test_reseeds_when_too_few_products(self):
+        self.seed('--products', '5', '--no-images')
+        # The existing catalog is cleared rather than added to.
+        self.seed('--products', '8', '--no-images')
+        self.assertEqual(Product.objects.count(), 8)
+        self.assertEqual(Colour.objects.count(), Colour.objects.values('colour_name').distinct().count())
+
+    def test_skips_when_enough_products(self):
+        self.seed('--products', '5', '--no-images')
+        self.assertFalse(any(self.media_root.rglob('*.jpg')))
+        before = self.catalog_snapshot()
+        self.seed('--products', '5')
+        self.assertEqual(self.catalog_snapshot(), before)
+        self.assertFalse(any(self.media_root.rglob('*.jpg')))
+
+@override_settings(IMAGE_RENDITION_WIDTHS=[160, 320, 640])
+class ImageRenditionTests(APITestCase):
+    """Tests for the background image renditions, written to a temporary MEDIA_ROOT."""
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = Path(media_root.name)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        product = Product.objects.create(name='Runner', category=ProductCategory.objects.create(name='Shoes'), brand=Brand.objects.create(name='Nike'), description='Fast')
+        self.item = ProductItem.objects.create(product=product, colour=Colour.objects.create(colour_name='Red'), sku_base='RUN-RED', original_price=Decimal('50.00'))
+
+    def jpeg(self, size=(1200, 900), orientation=None, colour=(198, 40, 40)):
+        from PIL import Image, ImageDraw
+
+        image = Image.new('RGB', size, colour)
+        ImageDraw.Draw(image).ellipse((size[0] // 4, size[1] // 4, size[0] // 2, size[1] // 2), fill=(20, 20, 20))
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90, exif=exif)
+        return buffer.getvalue()
+
+    def create_image(self, content, name='runner.jpg'):
+        return ProductImage.objects.create(product_item=self.item, image_filename=SimpleUploadedFile(name, content), is_default=True)
+
+    def test_renders_smaller_webp_and_jpeg_copies(self):
+        original = self.jpeg()
+        image = self.create_image(original)
+        self.assertEqual(generate_renditions([image]), 1)
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height), (1200, 900))
+        self.assertEqual([(rendition['width'], rendition['height']) for rendition in image.renditions], [(160, 120), (320, 240), (640, 480)])
+        for rendition in image.renditions:
+            for key in ('webp', 'jpeg'):
+                path = self.media_root / rendition[key]
+                self.assertTrue(path.is_file())
+                self.assertLess(path.stat().st_size, len(original))
+        from PIL import Image
+        with Image.open(self.media_root / image.renditions[1]['webp']) as webp:
+            self.assertEqual((webp.format, webp.size), ('WEBP', (320, 240)))
+
+    def test_identical_files_share_renditions(self):
+        content = self.jpeg()
+        first, second = self.create_image(content, 'a.jpg'), self.create_image(content, 'b.jpg')
+        generate_renditions([first])
+        written = sorted((self.media_root / RENDITION_DIR).iterdir())
+        generate_renditions([second])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(second.renditions, first.renditions)
+        self.assertEqual(sorted((self.media_root / RENDITION_DIR).iterdir()), written)
+
+    def test_concurrent_renders_of_the_same_file_write_each_rendition_once(self):
+        content = self.jpeg()
+        images = [self.create_image(content, f'copy-{index}.jpg') for index in range(8)]
+        self.assertEqual(generate_renditions(images, workers=8), 8)
+        # Three widths in two formats, with no suffixed duplicates left behind by racing writers.
+        self.assertEqual(len(list((self.media_root / RENDITION_DIR).iterdir())), 6)
+
+    def test_respects_exif_orientation_and_never_upscales(self):
+        rotated = self.create_image(self.jpeg(size=(400, 200), orientation=6), 'rotated.jpg')
+        small = self.create_image(self.jpeg(size=(120, 120)), 'small.jpg')
+        generate_renditions([rotated, small])
+        rotated.refresh_from_db()
+        small.refresh_from_db()
+        self.assertEqual((rotated.width, rotated.height), (200, 400))
+        self.assertEqual([(rendition['width'], rendition['height']) for rendition in rotated.renditions], [(160, 320)])
+        self.assertEqual((small.width, small.renditions), (120, []))
+
+    def test_skips_missing_files(self):
+        image = ProductImage.objects.create(product_item=self.item, image_filename='products/missing.jpg', is_default=True)
+        with self.assertLogs('product.images', 'WARNING'):
+            self.assertEqual(generate_renditions([image]), 0)
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.renditions), (None, []))
+
+    def test_saving_a_new_file_queues_renditions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self.create_image(self.jpeg())
+        image.refresh_from_db()
+        self.assertEqual(len(image.renditions), 3)
+
+        # Saving other fields keeps the renditions; a new file replaces them.
+        with patch('product.tasks.generate_image_renditions_task.delay') as delay, self.captureOnCommitCallbacks(execute=True):
+            image.is_default = False
+            image.save()
+        delay.assert_not_called()
+        old = image.renditions
+        with self.captureOnCommitCallbacks(execute=True):
+            image.image_filename = SimpleUploadedFile('new.jpg', self.jpeg(colour=(30, 90, 180)))
+            image.save()
+        image.refresh_from_db()
+        self.assertEqual(len(image.renditions), 3)
+        self.assertNotEqual(image.renditions, old)
+
+    def test_serializers_use_renditions_for_their_slot(self):
+        image = self.create_image(self.jpeg())
+        response = self.client.get(reverse('product-list'))
+        self.assertTrue(response.data['results'][0]['image'].endswith(image.image_filename.url))
+        self.assertIsNone(response.data['results'][0]['image_srcset'])
+
+        generate_image_renditions_task([image.id])
+        image.refresh_from_db()
+        listed = self.client.get(reverse('product-list')).data['results'][0]
+        self.assertTrue(listed['image'].endswith(image.renditions[1]['jpeg']))
+        srcset = listed['image_srcset'].split(', ')
+        self.assertEqual([candidate.rsplit(' ', 1)[1] for candidate in srcset], ['160w', '320w', '640w', '1200w'])
+        self.assertTrue(srcset[0].startswith('http://testserver/media/products/renditions/'))
+
+        detail = self.client.get(reverse('product-detail', args=[self.item.product_id])).data
+        detail_image = detail['items'][0]['images'][0]
+        self.assertEqual((detail_image['width'], detail_image['height']), (1200, 900))
+        self.assertEqual(detail_image['srcset'], listed['image_srcset'])
+
+    def test_command_backfills_images_without_renditions(self):
+        done = self.create_image(self.jpeg(), 'done.jpg')
+        generate_renditions([done])
+        pending = self.create_image(self.jpeg(colour=(30, 90, 180)), 'pending.jpg')
+        stdout = StringIO()
+        call_command('generate_renditions', '--workers', '2', stdout=stdout)
+        self.assertIn('Rendered 1 of 1 images', stdout.getvalue())
+        pending.refresh_from_db()
+        self.assertEqual(len(pending.renditions), 3)
+        call_command('generate_renditions', '--all', stdout=stdout)
+        self.assertIn('Rendered 2 of 2 images', stdout.getvalue())
+
+@override_settings(LOW_STOCK_THRESHOLD=5, LOW_STOCK_ALERT_RECIPIENTS=['ops@example.com'])
+class CheckStockTests(TestCase):
+    """Tests for the `check_stock` command and the periodic low-stock email."""
+    def setUp(self):
+        product = Product.objects.create(name='Runner', category=ProductCategory.objects.create(name='Shoes'), brand=Brand.objects.create(name='Nike'), description='Fast')
+        self.item = ProductItem.objects.create(product=product, colour=Colour.objects.create(colour_name='Red'), sku_base='RUN-RED', original_price=Decimal('50.00'))
+        self.sizes = [SizeOption.objects.create(size_name=name, sort_order=index) for index, name in enumerate(['S', 'M', 'L', 'XL'])]
+        # Low by default, fine by default, low by its own threshold, fine by its own threshold.
+        self.stock = [(3, None), (9, None), (9, 10), (2, 1)]
+        for size, (qty, threshold) in zip(self.sizes, self.stock):
+            ProductVariation.objects.create(product_item=self.item, size=size, qty_in_stock=qty, low_stock_threshold=threshold)
+
+    def check_stock(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('check_stock', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_text_report_uses_per_variation_thresholds(self):
+        with self.assertNumQueries(1):
+            stdout, _ = self.check_stock()
+        self.assertIn('size S: 3 left (threshold 5)', stdout)
+        self.assertIn('size L: 9 left (threshold 10)', stdout)
+        self.assertNotIn('size M', stdout)
+        self.assertNotIn('size XL', stdout)
+        self.assertIn('Found 2 items with low stock.', stdout)
+
+    def test_csv_and_json_reports(self):
+        stdout, stderr = self.check_stock('--format', 'csv', '--threshold', '9')
+        lines = stdout.splitlines()
+        self.assertEqual(lines[0], 'variation_id,sku,product,colour,size,qty_in_stock,threshold')
+        self.assertEqual(sorted(line.split(',')[4] for line in lines[1:]), ['L', 'M', 'S'])
+        self.assertIn('Found 3 items', stderr)
+
+        stdout, _ = self.check_stock('--format', 'json')
+        rows = json.loads(stdout)
+        self.assertEqual(sorted((row['size'], row['qty_in_stock'], row['threshold']) for row in rows), [('L', 9, 10), ('S', 3, 5)])
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'low-stock.json'
+            stdout, _ = self.check_stock('--format', 'json', '--output', str(output))
+            self.assertEqual(stdout, '')
+            self.assertEqual(len(json.loads(output.read_text())), 2)
+
+    def test_empty_report(self):
+        ProductVariation.objects.update(qty_in_stock=100)
+        stdout, _ = self.check_stock('--format', 'json')
+        self.assertEqual(json.loads(stdout), [])
+
+    def test_notify_sends_one_email(self):
+        self.check_stock('--notify')
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEqual(message.subject, 'Low stock: 2 product variations')
+        self.assertEqual(message.to, ['ops@example.com'])
+        self.assertIn('Runner (RUN-RED), colour Red, size S', message.body)
+        self.assertEqual(message.attachments[0][0], 'low-stock.csv')
+
+    def test_notify_batches_every_variation_into_one_email(self):
+        ProductVariation.objects.update(qty_in_stock=0, low_stock_threshold=None)
+        sizes = SizeOption.objects.bulk_create(SizeOption(size_name=f'EU {size}') for size in range(60))
+        ProductVariation.objects.bulk_create(ProductVariation(product_item=self.item, size=size, qty_in_stock=1) for size in sizes)
+
+        self.check_stock('--notify')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Low stock: 64 product variations')
+        self.assertIn('...and 14 more.', mail.outbox[0].body)
+        self.assertEqual(len(mail.outbox[0].attachments[0][1].splitlines()), 65)
+
+    @override_settings(LOW_STOCK_ALERT_RECIPIENTS=[])
+    def test_no_email_without_recipients(self):
+        self.check_stock('--notify')
+        self.assertEqual(mail.outbox, [])
+
+@override_settings(LOW_STOCK_THRESHOLD=5, LOW_STOCK_ALERT_RECIPIENTS=['ops@example.com'], LOW_STOCK_ALERT_LAG=0)
+class InventoryChangeLogTests(TestCase):
+    """Tests for the inventory change log and the incremental low-stock alerts built on it."""
+    def setUp(self):
+        product = Product.objects.create(name='Runner', category=ProductCategory.objects.create(name='Shoes'), brand=Brand.objects.create(name='Nike'), description='Fast')
+        self.item = ProductItem.objects.create(product=product, colour=Colour.objects.create(colour_name='Red'), sku_base='RUN-RED', original_price=Decimal('50.00'))
+        # Low by default, fine by default, low by its own threshold, fine by its own threshold.
+        self.variations = {
+            name: ProductVariation.objects.create(product_item=self.item, size=SizeOption.objects.create(size_name=name), qty_in_stock=qty, low_stock_threshold=threshold)
+            for name, qty, threshold in [('S', 3, None), ('M', 9, None), ('L', 9, 10), ('XL', 2, 1)]
+        }
+
+    def set_stock(self, size, qty):
+        variation = ProductVariation.objects.get(id=self.variations[size].id)
+        variation.qty_in_stock = qty
+        variation.save()
+
+    def run_alerts(self):
+        mail.outbox = []
+        return send_low_stock_changes_task.delay().get()
+
+    def test_stock_changes_are_logged(self):
+        self.assertEqual(list(InventoryChangeLog.objects.values_list('old_qty', 'new_qty', 'source')), [(None, 3, 'save'), (None, 9, 'save'), (None, 9, 'save'), (None, 2, 'save')])
+        InventoryChangeLog.objects.all().delete()
+
+        self.set_stock('S', 7)
+        self.set_stock('S', 7)  # Unchanged
+        variation = ProductVariation.objects.get(id=self.variations['M'].id)
+        variation.low_stock_threshold = 2
+        variation.save(update_fields=['low_stock_threshold'])
+        update_stock_levels([{'sku': 'RUN-RED', 'size': 'M', 'qty': 4}, {'sku': 'RUN-RED', 'size': 'L', 'qty': 9}])
+        self.assertEqual(
+            list(InventoryChangeLog.objects.values_list('variation__size__size_name', 'old_qty', 'new_qty', 'source')),
+            [('S', 3, 7, 'save'), ('M', 9, 4, 'stock_update')],
+        )
+
+    def test_saves_with_an_unknown_old_level_are_not_logged(self):
+        InventoryChangeLog.objects.all().delete()
+        variation = ProductVariation.objects.defer('qty_in_stock').get(id=self.variations['S'].id)
+        variation.qty_in_stock = 1
+        variation.save()
+        self.assertFalse(InventoryChangeLog.objects.exists())
+        # From then on the level saved is the one known.
+        variation.qty_in_stock = 0
+        variation.save()
+        self.assertEqual(list(InventoryChangeLog.objects.values_list('old_qty', 'new_qty')), [(1, 0)])
+
+    def test_alerts_once_per_fall_below_threshold(self):
+        self.assertEqual(self.run_alerts(), 2)
+        self.assertIn('size S: 3 left (threshold 5)', mail.outbox[0].body)
+        self.assertIn('size L: 9 left (threshold 10)', mail.outbox[0].body)
+        self.assertEqual(self.run_alerts(), 0)
+        self.assertEqual(mail.outbox, [])
+
+        self.set_stock('S', 2)  # Still low: already reported
+        self.assertEqual(self.run_alerts(), 0)
+        self.set_stock('S', 8)  # Restocked...
+        self.set_stock('S', 4)  # ...and low again
+        self.set_stock('M', 1)  # Low, but restocked before the run
+        self.set_stock('M', 6)
+        self.assertEqual(self.run_alerts(), 1)
+        self.assertIn('size S: 4 left', mail.outbox[0].body)
+
+    def test_reads_only_changes_since_the_watermark(self):
+        self.run_alerts()
+        # A run after more changes reads the new changes, not the log or the catalog.
+        update_stock_levels([{'id': self.variations['M'].id, 'qty': 0}, {'id': self.variations['XL'].id, 'qty': 1}])
+        with self.assertNumQueries(8):  # Including the savepoint, the watermark and pruning
+            self.assertEqual(self.run_alerts(), 2)
+        self.assertEqual(InventoryWatermark.objects.get().last_change_id, InventoryChangeLog.objects.latest('id').id)
+
+    @override_settings(LOW_STOCK_ALERT_LAG=60)
+    def test_recent_changes_wait_for_the_lag(self):
+        self.assertEqual(self.run_alerts(), 0)
+        InventoryChangeLog.objects.update(created_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(self.run_alerts(), 2)
+
+    @override_settings(LOW_STOCK_ALERT_LAG=60)
+    def test_watermark_stops_at_the_first_recent_change(self):
+        """Older changes after a recent one wait too, so the watermark never passes an id it has not read."""
+        InventoryChangeLog.objects.all().delete()
+        self.set_stock('M', 1)
+        self.set_stock('XL', 0)
+        first, second = InventoryChangeLog.objects.order_by('id')
+        # The second change (a higher id) is already old enough; the first is not.
+        InventoryChangeLog.objects.filter(pk=second.pk).update(created_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(self.run_alerts(), 0)
+        self.assertEqual(InventoryWatermark.objects.get().last_change_id, 0)
+
+        InventoryChangeLog.objects.filter(pk=first.pk).update(created_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(self.run_alerts(), 2)
+        self.assertEqual(InventoryWatermark.objects.get().last_change_id, second.pk)
+
+    def test_failed_send_keeps_the_watermark(self):
+        with patch('product.stock.LowStockAlert.send', side_effect=OSError('SMTP down')), self.assertRaises(OSError):
+            self.run_alerts()
+        self.assertFalse(InventoryWatermark.objects.exclude(last_change_id=0).exists())
+        self.assertEqual(self.run_alerts(), 2)
+
+    def test_processed_changes_are_pruned(self):
+        InventoryChangeLog.objects.update(created_at=timezone.now() - timedelta(days=40))
+        self.set_stock('M', 8)
+        self.run_alerts()
+        self.assertEqual(list(InventoryChangeLog.objects.values_list('new_qty', flat=True)), [8])
+
+    def test_check_stock_incremental(self):
+        stdout = StringIO()
+        call_command('check_stock', '--incremental', '--format', 'json', stdout=stdout, stderr=StringIO())
+        self.assertEqual(sorted(row['size'] for row in json.loads(stdout.getvalue())), ['L', 'S'])
+        stdout = StringIO()
+        call_command('check_stock', '--incremental', '--format', 'json', stdout=stdout, stderr=StringIO())
+        self.assertEqual(json.loads(stdout.getvalue()), [])
+
+CATALOG_CSV = """sku,product,brand,category,colour,size,qty_in_stock,original_price,sale_price,description,image
+RUN-RED,Runner,Nike,Shoes > Running,Red,S,3,50.00,,Fast,products/run-red.jpg
+RUN-RED,Runner,Nike,Shoes > Running,Red,M,4,50.00,,Fast,products/run-red.jpg
+RUN-BLU,Runner,Nike,Shoes > Running,Blue,M,7,55.00,45.00,,
+TEE-BLK,Crew Tee,Adidas,Tops,Black,L,10,20.00,,Soft,
+"""
+
+class ProductImportTests(QueryBudgetMixin, APITestCase):
+    """Tests for the streaming catalog import (product/importers.py), its command and its endpoint."""
+    # SQLite splits inserts into batches of 999 parameters, so larger chunks add INSERTs that are not per-row queries.
+    query_budget_sizes = (5, 50)
+
+    def import_csv(self, text, chunk_size=1000):
+        return import_catalog(StringIO(text), 'csv', chunk_size=chunk_size)
+
+    def test_creates_catalog_from_rows(self):
+        report = self.import_csv(CATALOG_CSV, chunk_size=2)
+        self.assertEqual((report.rows, report.imported, report.error_count), (4, 4, 0))
+        self.assertEqual((report.products_created, report.items_created, report.variations_created, report.images_created), (2, 3, 4, 1))
+
+        # Both colours of the runner belong to one product, filed under Shoes > Running.
+        runner = Product.objects.get(name='Runner')
+        self.assertEqual(sorted(runner.items.values_list('sku_base', flat=True)), ['RUN-BLU', 'RUN-RED'])
+        self.assertEqual(str(runner.category), 'Shoes > Running')
+        self.assertEqual(ProductCategory.objects.count(), 3)
+        blue = ProductItem.objects.get(sku_base='RUN-BLU')
+        self.assertEqual((blue.original_price, blue.sale_price), (Decimal('55.00'), Decimal('45.00')))
+        self.assertEqual(ProductImage.objects.get().image_filename.name, 'products/run-red.jpg')
+        self.assertEqual(ProductVariation.objects.get(product_item__sku_base='RUN-RED', size__size_name='M').qty_in_stock, 4)
+
+    def test_reimport_updates_by_sku(self):
+        self.import_csv(CATALOG_CSV)
+        report = self.import_csv(
+            'sku,product,brand,category,colour,size,qty_in_stock,original_price,image\n'
+            'RUN-RED,Runner Pro,Nike,Shoes > Running,Red,M,9,60.00,products/run-red-2.jpg\n'
+            'RUN-RED,Runner Pro,Nike,Shoes > Running,Red,L,2,60.00,\n'
+        )
+        self.assertEqual((report.products_created, report.products_updated), (0, 1))
+        self.assertEqual((report.items_created, report.items_updated), (0, 1))
+        self.assertEqual((report.variations_created, report.variations_updated), (1, 1))
+        self.assertEqual((report.images_created, report.images_updated), (0, 1))
+
+        item = ProductItem.objects.get(sku_base='RUN-RED')
+        self.assertEqual((item.product.name, item.original_price), ('Runner Pro', Decimal('60.00')))
+        # Columns the file leaves out keep their values.
+        self.assertEqual(item.product.description, 'Fast')
+        self.assertEqual(dict(item.variations.values_list('size__size_name', 'qty_in_stock')), {'S': 3, 'M': 9, 'L': 2})
+        self.assertEqual(item.images.get().image_filename.name, 'products/run-red-2.jpg')
+        self.assertEqual(
+            list(InventoryChangeLog.objects.filter(source='import', variation__product_item=item).values_list('variation__size__size_name', 'old_qty', 'new_qty')),
+            [('S', None, 3), ('M', None, 4), ('M', 4, 9), ('L', None, 2)],
+        )
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(Brand.objects.count(), 2)
+
+    def test_invalid_rows_are_skipped_and_reported(self):
+        report = self.import_csv(
+            'sku,product,brand,category,colour,size,qty_in_stock,original_price\n'
+            'A-1,Cap,Nike,Hats,Red,One Size,5,abc\n'
+            'A-2,,Nike,Hats,Red,One Size,5,10\n'
+            'A-3,Cap,Nike,Hats,Red,,5,10\n'
+            'A-4,Cap,Nike,Hats,Red,One Size,-1,10\n'
+            'A-5,Cap,Nike,Hats,Red,One Size,5,10\n'
+        )
+        self.assertEqual((report.rows, report.imported, report.error_count), (5, 1, 4))
+        self.assertEqual([error['line'] for error in report.errors], [2, 3, 4, 5])
+        self.assertIn('original_price is not a number', report.errors[0]['error'])
+        self.assertEqual(list(ProductItem.objects.values_list('sku_base', flat=True)), ['A-5'])
+
+    def test_missing_columns_are_rejected(self):
+        with self.assertRaisesMessage(CatalogImportError, 'lacks required columns: original_price'):
+            self.import_csv('sku,product,brand,category,colour\nA-1,Cap,Nike,Hats,Red\n')
+
+    def test_unreadable_files_are_rejected(self):
+        for name, content, message in [
+            ('latin-1', CATALOG_CSV.replace('Runner', 'Läufer').encode('latin-1'), 'not UTF-8 text'),
+            ('NUL bytes', CATALOG_CSV.encode() + b'A-9,Cap\x00,Nike,Hats,Red,M,1,5\n', 'Line 6 contains a NUL character'),
+            ('unclosed quote', CATALOG_CSV.encode() + b'A-9,"Cap' + b'x' * 200_000, 'Malformed CSV after line 5'),
+        ]:
+            with self.subTest(name), self.assertRaisesMessage(CatalogImportError, message):
+                import_uploaded_file(SimpleUploadedFile('catalog.csv', content))
+            with self.subTest(name), tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / 'catalog.csv'
+                path.write_bytes(content)
+                with self.assertRaisesMessage(CommandError, message):
+                    call_command('import_catalog', str(path), stdout=StringIO(), stderr=StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'catalog.jsonl'
+            path.write_bytes(b'{"sku": "A-1"}\n{"product": "L\xe4ufer"}\n')
+            with self.assertRaisesMessage(CommandError, 'not UTF-8 text'):
+                call_command('import_catalog', str(path), stdout=StringIO(), stderr=StringIO())
+
+    def test_command_imports_json_lines(self):
+        rows = [
+            {'sku': 'CAP-RED', 'product': 'Cap', 'brand': 'Nike', 'category': 'Hats', 'colour': 'Red', 'size': 'One Size', 'qty_in_stock': 5, 'original_price': 12.5},
+            'not an object',
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'catalog.jsonl'
+            path.write_text('\n'.join(json.dumps(row) for row in rows) + '\n{broken\n')
+            stdout = StringIO()
+            call_command('import_catalog', str(path), '--json', stdout=stdout, stderr=StringIO())
+        report = json.loads(stdout.getvalue())
+        self.assertEqual((report['imported'], report['error_count']), (1, 2))
+        self.assertEqual([error['line'] for error in report['errors']], [2, 3])
+        self.assertEqual(ProductItem.objects.get().original_price, Decimal('12.50'))
+
+    def test_endpoint_requires_admin(self):
+        url = reverse('product-import')
+        upload = SimpleUploadedFile('catalog.csv', CATALOG_CSV.encode())
+        self.assertEqual(self.client.post(url, {'file': upload}).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(SiteUser.objects.create_user(email='shopper@example.com', username='shopper', password='pw'))
+        self.assertEqual(self.client.post(url, {'file': upload}).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_endpoint_imports_upload(self):
+        self.client.force_authenticate(SiteUser.objects.create_superuser(email='admin@example.com', username='admin', password='pw'))
+        url = reverse('product-import')
+        response = self.client.post(url, {'file': SimpleUploadedFile('catalog.csv', CATALOG_CSV.encode())})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['items_created'], 3)
+        self.assertIn('rows_per_second', response.data)
+        self.assertEqual(self.client.post(url, {}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'file': SimpleUploadedFile('catalog.xlsx', b'...')})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'file': SimpleUploadedFile('catalog.csv', 'sku,product\nA-1,Läufer\n'.encode('latin-1'))})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('not UTF-8 text', response.data['errors']['file'])
+
+    def test_endpoint_allows_repeated_queries_across_chunks(self):
+        """Each chunk repeats the same lookups; the import has committed, so it must not turn into an error."""
+        self.client.force_authenticate(SiteUser.objects.create_superuser(email='admin@example.com', username='admin', password='pw'))
+        lines = ['sku,product,brand,category,colour,size,qty_in_stock,original_price']
+        lines += [f'NEW-{index},Product {index},Brand,Shoes,Red,M,1,9.99' for index in range(60)]
+        upload = SimpleUploadedFile('catalog.csv', '\n'.join(lines).encode())
+        with patch('product.views.import_uploaded_file', partial(import_uploaded_file, chunk_size=10)):
+            response = self.client.post(reverse('product-import'), {'file': upload})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['items_created'], 60)
+
+    def test_endpoint_query_budget(self):
+        """A chunk takes the same queries however many rows, products and sizes it holds."""
+        self.client.force_authenticate(SiteUser.objects.create_superuser(email='admin@example.com', username='admin', password='pw'))
+        self.import_csv(CATALOG_CSV)  # Existing rows to update alongside the new ones
+
+        def build_file(size):
+            lines = ['sku,product,brand,category,colour,size,qty_in_stock,original_price,image']
+            lines += [f'RUN-RED,Runner,Nike,Shoes > Running,Red,{name},{size},50.00,products/run.jpg' for name in ['S', 'M']]
+            lines += [f'NEW-{index},Product {index},Brand {index % 3},Shoes > Trail,Colour {index % 4},Size {index % 5},{index},9.99,products/new-{index}.jpg' for index in range(size)]
+            return SimpleUploadedFile('catalog.csv', '\n'.join(lines).encode())
+
+        self.assertQueryBudget(
+            20, build_file,
+            lambda upload: self.client.post(reverse('product-import'), {'file': upload}),
+        )
+
+class StockUpdateTests(QueryBudgetMixin, APITestCase):
+    """Tests for bulk stock updates (product/stock.py), the update_stock command and the stock endpoint."""
+    # SQLite splits inserts into batches of 999 parameters, so larger chunks add change log INSERTs that are not per-row queries.
+    query_budget_sizes = (5, 50)
+
+    def setUp(self):
+        import_catalog(StringIO(CATALOG_CSV), 'csv')
+        self.variations = {
+            (sku, size): id for id, sku, size in
+            ProductVariation.objects.values_list('id', 'product_item__sku_base', 'size__size_name')
+        }
+
+    def stock(self):
+        return {key: ProductVariation.objects.get(id=id).qty_in_stock for key, id in self.variations.items()}
+
+    def test_diffs_against_the_primary(self):
+        # A read routed to the replica would fail here; the locked read must use the primary.
+        route = lambda model, **hints: 'lagging_replica' if model is ProductVariation else 'default'
+        with patch('eCommerce.db_router.ReplicaRouter.db_for_read', side_effect=route):
+            result = update_stock_levels([{'sku': 'RUN-RED', 'size': 'S', 'qty': 31}])
+        self.assertEqual(result['updated'], 1)
+        self.assertEqual(self.stock()[('RUN-RED', 'S')], 31)
+
+    def test_updates_by_id_and_sku(self):
+        result = update_stock_levels([
+            {'id': self.variations[('RUN-RED', 'S')], 'qty': 30},
+            {'sku': 'RUN-BLU', 'size': 'M', 'qty': 0},
+            {'sku': 'TEE-BLK', 'size': 'L', 'qty': 10},  # Already 10
+            {'sku': 'TEE-BLK', 'size': 'XL', 'qty': 1},
+            {'id': 999999, 'qty': 1},
+            {'sku': 'RUN-RED', 'size': 'M', 'qty': 8},
+            {'sku': 'RUN-RED', 'size': 'M', 'qty': 9},  # Later entries win
+        ], chunk_size=4)
+        self.assertEqual((result['received'], result['updated'], result['unchanged']), (7, 3, 1))
+        self.assertCountEqual(result['unknown'], [{'sku': 'TEE-BLK', 'size': 'XL', 'qty': 1}, {'id': 999999, 'qty': 1}])
+        self.assertEqual(self.stock(), {('RUN-RED', 'S'): 30, ('RUN-RED', 'M'): 9, ('RUN-BLU', 'M'): 0, ('TEE-BLK', 'L'): 10})
+
+    def test_parse_stock_update(self):
+        self.assertEqual(parse_stock_update({'id': '4', 'qty': '12'}), {'id': 4, 'qty': 12})
+        self.assertEqual(parse_stock_update({'id': '', 'sku': ' A-1 ', 'size': 'M', 'qty': 0}), {'sku': 'A-1', 'size': 'M', 'qty': 0})
+        for raw in [{'id': 1}, {'id': 1, 'qty': -1}, {'id': 1, 'qty': 1.5}, {'id': 1, 'qty': True}, {'sku': 'A-1', 'qty': 1}, {'id': 'x', 'qty': 1}, []]:
+            with self.subTest(raw=raw), self.assertRaises(ValueError):
+                parse_stock_update(raw)
+
+    def test_command_reads_csv(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'stock.csv'
+            path.write_text(
+                'id,sku,size,qty\n'
+                f"{self.variations[('RUN-RED', 'S')]},,,11\n"
+                ',RUN-BLU,M,2\n'
+                ',RUN-BLU,XL,2\n'
+                ',RUN-BLU,M,lots\n'
+            )
+            stdout = StringIO()
+            call_command('update_stock', str(path), '--json', stdout=stdout)
+        result = json.loads(stdout.getvalue())
+        self.assertEqual((result['received'], result['updated'], len(result['unknown'])), (3, 2, 1))
+        self.assertEqual(result['errors'], [{'line': 5, 'error': 'qty must be a whole number of at least 0'}])
+        self.assertEqual(self.stock()[('RUN-RED', 'S')], 11)
+        self.assertEqual(self.stock()[('RUN-BLU', 'M')], 2)
+
+    def test_command_rejects_unreadable_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'stock.csv'
+            path.write_bytes(b'sku,size,qty\nRUN-BLU,M,2\nRUN-BLU,M\x00,3\n')
+            with self.assertRaisesMessage(CommandError, 'Line 3 contains a NUL character'):
+                call_command('update_stock', str(path), stdout=StringIO())
+            path.write_bytes('sku,size,qty\nRUN-BLU,Grö\u00dfe,3\n'.encode('latin-1'))
+            with self.assertRaisesMessage(CommandError, 'not UTF-8 text'):
+                call_command('update_stock', str(path), stdout=StringIO())
+
+    def test_endpoint_requires_admin(self):
+        url = reverse('stock-update')
+        payload = {'updates': [{'sku': 'RUN-BLU', 'size': 'M', 'qty': 1}]}
+        self.assertEqual(self.client.post(url, payload, format='json').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(SiteUser.objects.create_user(email='shopper@example.com', username='shopper', password='pw'))
+        self.assertEqual(self.client.post(url, payload, format='json').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.stock()[('RUN-BLU', 'M')], 7)
+
+    def test_endpoint_validates_before_updating(self):
+        self.client.force_authenticate(SiteUser.objects.create_superuser(email='admin@example.com', username='admin', password='pw'))
+        url = reverse('stock-update')
+        response = self.client.post(url, {'updates': [{'sku': 'RUN-BLU', 'size': 'M', 'qty': 1}, {'sku': 'RUN-BLU', 'qty': 1}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('1', response.data['errors']['updates'])
+        self.assertEqual(self.stock()[('RUN-BLU', 'M')], 7)
+        self.assertEqual(self.client.post(url, {'updates': []}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(url, [{'sku': 'RUN-BLU', 'size': 'M', 'qty': 1}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'received': 1, 'updated': 1, 'unchanged': 0, 'unknown': []})
+        self.assertEqual(self.stock()[('RUN-BLU', 'M')], 1)
+
+    def test_endpoint_query_budget(self):
+        """A chunk takes one SELECT, one UPDATE and one change log INSERT however many variations it changes."""
+        self.client.force_authenticate(SiteUser.objects.create_superuser(email='admin@example.com', username='admin', password='pw'))
+        item = ProductItem.objects.get(sku_base='TEE-BLK')
+
+        def populate(size):
+            sizes = SizeOption.objects.bulk_create(SizeOption(size_name=f'Size {index}', sort_order=index) for index in range(size))
+            variations = ProductVariation.objects.bulk_create(ProductVariation(product_item=item, size=option, qty_in_stock=1) for option in sizes)
+            updates = [{'id': variation.id, 'qty': 5} for variation in variations]
+            return updates + [{'sku': 'RUN-RED', 'size': 'S', 'qty': 6}, {'sku': 'NOPE', 'size': 'S', 'qty': 1}]
+
+        self.assertQueryBudget(
+            6, populate,
+            lambda updates: self.client.post(reverse('stock-update'), {'updates': updates}, format='json'),
+        )
+
+class ProductFeedTests(QueryBudgetMixin, APITestCase):
+    """Tests for the streaming product feed (product/feed.py), its endpoint and the export_feed command."""
+
+    def setUp(self):
+        import_catalog(StringIO(CATALOG_CSV), 'csv')
+
+    def get_feed(self, format, **headers):
+        response = self.client.get(reverse('product-feed', args=[format]), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_feed_has_one_row_per_variation(self):
+        response, content = self.get_feed('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertNotIn('Content-Encoding', response)
+        rows = list(csv.DictReader(StringIO(content.decode())))
+        self.assertEqual(list(rows[0]), FEED_FIELDS)
+        self.assertEqual([(row['sku'], row['size']) for row in rows], [('RUN-RED', 'S'), ('RUN-RED', 'M'), ('RUN-BLU', 'M'), ('TEE-BLK', 'L')])
+        self.assertEqual(rows[0]['image_url'], 'http://testserver/media/products/run-red.jpg')
+        self.assertEqual((rows[2]['price'], rows[2]['original_price'], rows[2]['sale_price'], rows[2]['image_url']), ('45.00', '55.00', '45.00', ''))
+        self.assertEqual((rows[3]['product'], rows[3]['brand'], rows[3]['category'], rows[3]['qty_in_stock']), ('Crew Tee', 'Adidas', 'Tops', '10'))
+
+    def test_jsonl_feed_is_gzipped_on_request(self):
+        response, content = self.get_feed('jsonl', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        rows = [json.loads(line) for line in gzip.decompress(content).decode().splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1], {
+            'variation_id': rows[1]['variation_id'], 'sku': 'RUN-RED', 'product_id': rows[1]['product_id'], 'product': 'Runner',
+            'brand': 'Nike', 'category': 'Running', 'colour': 'Red', 'size': 'M', 'price': '50.00', 'original_price': '50.00',
+            'sale_price': None, 'qty_in_stock': 4, 'image_url': 'http://testserver/media/products/run-red.jpg',
+        })
+
+    def test_unknown_format_is_not_found(self):
+        self.assertEqual(self.client.get(reverse('product-feed', args=['xml'])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_feed_query_budget(self):
+        """The whole feed comes from one query however many variations there are."""
+        item = ProductItem.objects.get(sku_base='TEE-BLK')
+
+        def populate(size):
+            sizes = SizeOption.objects.bulk_create(SizeOption(size_name=f'Size {index}') for index in range(size))
+            ProductVariation.objects.bulk_create(ProductVariation(product_item=item, size=option) for option in sizes)
+
+        def request(_):
+            response = self.client.get(reverse('product-feed', args=['csv']))
+            response.content_length = len(b''.join(response.streaming_content))  # Runs the query
+            return response
+
+        self.assertQueryBudget(1, populate, request)
+
+    def test_feed_streams_to_asgi_one_chunk_at_a_time(self):
+        async def collect(iterator):
+            return [item async for item in aiterate(iterator)]
+        self.assertEqual(async_to_sync(collect)(iter([b'a', b'b'])), [b'a', b'b'])
+
+    def test_command_writes_gzipped_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'feed.jsonl.gz'
+            stderr = StringIO()
+            call_command('export_feed', '--output', str(path), '--base-url', 'https://shop.example.com', stderr=stderr)
+            rows = [json.loads(line) for line in gzip.decompress(path.read_bytes()).decode().splitlines()]
+        self.assertEqual([row['sku'] for row in rows], ['RUN-RED', 'RUN-RED', 'RUN-BLU', 'TEE-BLK'])
+        self.assertEqual(rows[0]['image_url'], 'https://shop.example.com/media/products/run-red.jpg')
+        self.assertIn('Exported 4 variations as jsonl', stderr.getvalue())
@@ -1,14 +1,31 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     ProductListView, 
     ProductDetailView,
     ProductCategoryListView,
-    BrandListView
+    BrandListView,
+    ProductImportView,
+    StockUpdateView,
+    ProductFeedView,
+    AsyncProductListView,
+    AsyncProductDetailView,
 )
 
+# Serve the hot catalog reads from async views when running under ASGI.
+if settings.ASYNC_VIEWS:
+    product_list_view = AsyncProductListView.as_view()
+    product_detail_view = AsyncProductDetailView.as_view()
+else:
+    product_list_view = ProductListView.as_view()
+    product_detail_view = ProductDetailView.as_view()
+
 urlpatterns = [
-    path('', ProductListView.as_view(), name='product-list'),
-    path('<int:id>/', ProductDetailView.as_view(), name='product-detail'),
+    path('', product_list_view, name='product-list'),
+    path('<int:id>/', product_detail_view, name='product-detail'),
     path('categories/', ProductCategoryListView.as_view(), name='category-list'),
     path('brands/', BrandListView.as_view(), name='brand-list'),
+    path('import/', ProductImportView.as_view(), name='product-import'),
+    path('stock/', StockUpdateView.as_view(), name='stock-update'),
+    path('feed.<str:feed_format>', ProductFeedView.as_view(), name='product-feed'),
 ]
@@ -1,7 +1,28 @@
-from django.db.models import Min
+import json
+from math import ceil
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Min, Prefetch
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
 from rest_framework import generics
-from rest_framework.permissions import AllowAny
-from .models import Product, ProductCategory, Brand
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import APIView
+from eCommerce.streaming import aiterate
+from eCommerce.throttling import FeedRateThrottle
+from .cache import aget_cached_response, aset_cached_response
+from .feed import FEED_FORMATS, feed_content, feed_rows
+from .importers import FORMATS, CatalogImportError, import_uploaded_file
+from .models import Product, ProductCategory, Brand, ProductItem, ProductVariation
+from .stock import parse_stock_update, update_stock_levels
 from .serializers import (
     ProductListSerializer, 
     ProductDetailSerializer,
@@ -37,21 +58,34 @@ class ProductListView(generics.ListAPIView):
         Optimized queryset that annotates the minimum price for sorting
         and prefetches related items to prevent N+1 queries.
         """
-        queryset = Product.objects.all().prefetch_related(
+        queryset = Product.objects.select_related('brand', 'category__parent_category').prefetch_related(
             'items__images'
         )
         # Annotate the queryset with the minimum price of its items
         queryset = queryset.annotate(
             price=Min('items__original_price')
         )
+        # The aggregate already groups by product, so joins added by the price filters
+        # cannot duplicate rows and no DISTINCT is needed.
         # Add a default ordering to ensure consistent pagination
-        return queryset.distinct().order_by('id')
+        return queryset.order_by('id')
+
+def product_detail_queryset():
+    """
+    Loads everything ProductDetailSerializer touches up front, so a product detail
+    takes the same number of queries however many colours, images and sizes it has.
+    """
+    return Product.objects.select_related('brand', 'category').prefetch_related(
+        Prefetch('items', queryset=ProductItem.objects.select_related('colour')),
+        'items__images',
+        Prefetch('items__variations', queryset=ProductVariation.objects.select_related('size')),
+    )
 
 class ProductDetailView(generics.RetrieveAPIView):
     """
     API view to retrieve a single product with all its details.
     """
-    queryset = Product.objects.all()
+    queryset = product_detail_queryset()
     serializer_class = ProductDetailSerializer
     permission_classes = [AllowAny]
     lookup_field = 'id'
@@ -71,3 +105,165 @@ class BrandListView(generics.ListAPIView):
     queryset = Brand.objects.all()
     serializer_class = BrandSerializer
     permission_classes = [AllowAny]
+
+class ProductImportView(APIView):
+    """
+    Admin-only bulk catalog import, upserting by SKU.
+
+    POST a CSV or JSON Lines file as the multipart field `file` (the format comes from
+    its extension, or from the `format` field). The upload is streamed into the database
+    in chunked transactions; see product/importers.py for the columns. Responds with the
+    import report: rows created and updated per model, skipped rows with their errors,
+    and rows per second.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+    # Every chunk runs the same lookups; see perf.middleware.allow_repeated_queries.
+    allow_repeated_queries = True
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'Upload a CSV or JSON Lines file.'})
+        format = request.data.get('format') or None
+        if format is not None and format not in FORMATS.values():
+            raise ValidationError({'format': 'Expected csv or jsonl.'})
+        try:
+            report = import_uploaded_file(upload, format)
+        except CatalogImportError as exc:
+            raise ValidationError({'file': str(exc)})
+        return Response(report.as_dict())
+
+class StockUpdateView(APIView):
+    """
+    Admin-only bulk stock update for warehouse sync.
+
+    POST `{"updates": [{"id": 12, "qty": 40}, {"sku": "NK-AIR-BLK", "size": "42", "qty": 0}, ...]}`
+    (or the bare list). Each entry names a variation by id, or by SKU and size, and sets
+    its qty_in_stock. The whole payload is validated first; the updates are then applied
+    with one set-based UPDATE per chunk. Responds with the number of entries received,
+    updated and unchanged, and the entries that matched no variation.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [JSONParser]
+    # Every chunk runs the same lookup and UPDATE; see perf.middleware.allow_repeated_queries.
+    allow_repeated_queries = True
+
+    def post(self, request):
+        raw = request.data.get('updates') if isinstance(request.data, dict) else request.data
+        if not isinstance(raw, list) or not raw:
+            raise ValidationError({'updates': 'Send a non-empty list of stock updates.'})
+        entries, errors = [], {}
+        for index, item in enumerate(raw):
+            try:
+                entries.append(parse_stock_update(item))
+            except ValueError as exc:
+                errors[str(index)] = str(exc)
+        if errors:
+            raise ValidationError({'updates': errors})
+        return Response(update_stock_levels(entries))
+
+class ProductFeedView(APIView):
+    """
+    The full catalog as one download for marketplaces: one row per variation with its
+    product, brand, category, colour, size, prices, stock and default image URL.
+
+    `GET /feed.csv` or `GET /feed.jsonl`. The response is streamed from a server-side
+    cursor as it is generated, so it has no Content-Length, and it is gzipped when the
+    client sends `Accept-Encoding: gzip`. Each download reads the whole catalog, so
+    downloads are throttled per client (THROTTLE_RATE_FEED).
+    """
+    permission_classes = [AllowAny]
+    throttle_classes = [FeedRateThrottle]
+
+    def get(self, request, feed_format):
+        if feed_format not in FEED_FORMATS:
+            raise NotFound()
+        gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+        content = feed_content(feed_rows(base_url=request.build_absolute_uri('/')), feed_format, gzip=gzip)
+        if isinstance(request._request, ASGIRequest):
+            content = aiterate(content)
+        response = StreamingHttpResponse(content, content_type=f'{FEED_FORMATS[feed_format]}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="feed.{feed_format}"'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        if gzip:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+# --- Async variants (served when ASYNC_VIEWS is enabled, e.g. under ASGI) ---
+
+NOT_FOUND_ERROR = {'errors': {'detail': 'The requested resource was not found.'}}
+
+def _json_response(content):
+    return HttpResponse(content, content_type='application/json')
+
+class AsyncProductListView(View):
+    """
+    Async variant of ProductListView with the same filters, ordering, search,
+    pagination and response shape. The page is read with the async ORM and the
+    rendered response is kept in the versioned catalog cache.
+    """
+    async def get(self, request):
+        cache_key, content = await aget_cached_response(request)
+        if content is not None:
+            return _json_response(content)
+
+        drf_request = Request(request)
+        # Reuse the sync view's queryset and filter backends; building a queryset does no I/O.
+        sync_view = ProductListView(request=drf_request, args=(), kwargs={}, format_kwarg=None)
+        try:
+            queryset = sync_view.filter_queryset(sync_view.get_queryset())
+        except ValidationError as exc:
+            return JsonResponse({'errors': exc.detail}, status=400)
+
+        page_size = api_settings.PAGE_SIZE
+        count = await queryset.acount()
+        num_pages = max(1, ceil(count / page_size))
+        page_param = request.GET.get('page', 1)
+        try:
+            page_number = num_pages if page_param == 'last' else int(page_param)
+        except (TypeError, ValueError):
+            return JsonResponse(NOT_FOUND_ERROR, status=404)
+        if not 1 <= page_number <= num_pages:
+            return JsonResponse(NOT_FOUND_ERROR, status=404)
+
+        offset = (page_number - 1) * page_size
+        products = [product async for product in queryset[offset:offset + page_size]]
+
+        url = request.build_absolute_uri()
+        next_link = replace_query_param(url, 'page', page_number + 1) if page_number < num_pages else None
+        if page_number == 1:
+            previous_link = None
+        elif page_number == 2:
+            previous_link = remove_query_param(url, 'page')
+        else:
+            previous_link = replace_query_param(url, 'page', page_number - 1)
+
+        payload = {
+            'count': count,
+            'next': next_link,
+            'previous': previous_link,
+            'results': ProductListSerializer(products, many=True, context={'request': drf_request}).data,
+        }
+        content = json.dumps(payload, cls=DjangoJSONEncoder)
+        await aset_cached_response(cache_key, content)
+        return _json_response(content)
+
+class AsyncProductDetailView(View):
+    """
+    Async variant of ProductDetailView, cached in the versioned catalog cache.
+    """
+    async def get(self, request, id):
+        cache_key, content = await aget_cached_response(request)
+        if content is not None:
+            return _json_response(content)
+
+        try:
+            product = await product_detail_queryset().aget(id=id)
+        except Product.DoesNotExist:
+            return JsonResponse(NOT_FOUND_ERROR, status=404)
+
+        data = ProductDetailSerializer(product, context={'request': Request(request)}).data
+        content = json.dumps(data, cls=DjangoJSONEncoder)
+        await aset_cached_response(cache_key, content)
+        return _json_response(content)
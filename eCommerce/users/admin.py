@@ -1,8 +1,38 @@
 from django.contrib import admin
-from .models import Address, Country, SiteUser, UserAddress
+from .models import Address, Country, EmailOutbox, SiteUser, UserAddress
 
-# Register your models here.
-admin.site.register(Address)
-admin.site.register(Country)
-admin.site.register(SiteUser)
-admin.site.register(UserAddress)
\ No newline at end of file
+# User and address foreign keys use autocomplete widgets, and changelists of large tables
+# skip the unfiltered COUNT(*), so the pages stay fast with millions of users.
+
+@admin.register(SiteUser)
+class SiteUserAdmin(admin.ModelAdmin):
+    list_display = ['email', 'username', 'first_name', 'last_name', 'is_staff', 'date_joined']
+    list_filter = ['is_staff', 'is_superuser', 'is_active']
+    search_fields = ['email', 'username', 'first_name', 'last_name']
+    show_full_result_count = False
+
+@admin.register(Country)
+class CountryAdmin(admin.ModelAdmin):
+    search_fields = ['name']
+
+@admin.register(Address)
+class AddressAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'postal_code', 'country']
+    list_select_related = ['country']
+    search_fields = ['address_line1', 'city', 'postal_code']
+    autocomplete_fields = ['country']
+    show_full_result_count = False
+
+@admin.register(UserAddress)
+class UserAddressAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'is_default']
+    list_select_related = ['user', 'address']
+    search_fields = ['user__email']
+    autocomplete_fields = ['user', 'address']
+    show_full_result_count = False
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'created_at', 'dispatched_at', 'attempts']
+    search_fields = ['subject']
+    show_full_result_count = False
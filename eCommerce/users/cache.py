@@ -0,0 +1,66 @@
+"""
+Process-local cache for the Country lookup table.
+
+Countries change almost never but are read on every address render and validated
+on every address write. Each process keeps its own copy of the table and only
+reloads it when the shared version token in Django's cache has moved on, which
+happens whenever a Country is saved or deleted (see users/signals.py).
+
+Other processes only see a new token through a shared cache (Redis, via REDIS_URL or
+CACHE_URL). With a process-local cache, such as the locmem default, each copy is
+also reloaded after LOCAL_CACHE_TIMEOUT seconds, so changes made elsewhere show up
+within that time.
+"""
+import threading
+import time
+import uuid
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from healthcheck.metrics import record_cache_lookup
+
+COUNTRY_CACHE_VERSION_KEY = 'users:countries:version'
+LOCAL_CACHE_TIMEOUT = 60
+
+_lock = threading.Lock()
+_countries = {}
+_loaded_version = None
+_loaded_at = 0.0
+
+def _current_version():
+    version = cache.get(COUNTRY_CACHE_VERSION_KEY)
+    if version is None:
+        # First process to look wins; everybody else reads the same value back. The token
+        # is random, so a key that was evicted never comes back with a value seen before.
+        cache.add(COUNTRY_CACHE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(COUNTRY_CACHE_VERSION_KEY)
+    return version
+
+def _is_current(version):
+    if version is None or version != _loaded_version:
+        return False
+    if isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return time.monotonic() - _loaded_at < LOCAL_CACHE_TIMEOUT
+    return True
+
+def get_countries():
+    """Returns a {pk: Country} mapping, reloading it if another process changed the table."""
+    global _countries, _loaded_version, _loaded_at
+    from .models import Country
+
+    version = _current_version()
+    current = _is_current(version)
+    record_cache_lookup('countries', current)
+    if not current:
+        with _lock:
+            if not _is_current(version):
+                _countries = {country.pk: country for country in Country.objects.all()}
+                _loaded_version, _loaded_at = version, time.monotonic()
+    return _countries
+
+def invalidate_country_cache():
+    """Replaces the shared version token so every process reloads countries on next access."""
+    global _loaded_version
+    cache.set(COUNTRY_CACHE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    _loaded_version = None
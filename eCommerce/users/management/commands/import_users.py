@@ -0,0 +1,214 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from users.cache import invalidate_country_cache
+from users.models import Address, Country, SiteUser, UserAddress
+
+ADDRESS_FIELDS = [
+    'unit_number', 'street_number', 'address_line1', 'address_line2',
+    'city', 'region', 'postal_code',
+]
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+
+class Command(BaseCommand):
+    """
+    Streams users (and optionally their addresses) from a legacy export into the database.
+
+    Each input row is one user. Supported columns / keys:
+      email, username, first_name, last_name, phone_number, is_active, date_joined,
+      password (an already-hashed Django password string, e.g. 'pbkdf2_sha256$...').
+    Addresses are read from the flat columns address_line1, city, region, postal_code,
+    country, is_default (CSV or JSONL), or from an 'addresses' list of objects (JSONL only).
+
+    Rows are loaded in chunks with bulk_create, one transaction per chunk, so a failure
+    only rolls back the current chunk. Emails already in the database or seen earlier
+    in the file, in any letter case, are skipped.
+    """
+    help = 'Bulk imports users and addresses from a CSV or JSONL file, preserving password hashes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the CSV or JSONL file to import.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format. Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows inserted per transaction (default: 5000).')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+
+        input_format = options['format'] or ('jsonl' if path.suffix in ('.jsonl', '.ndjson') else 'csv')
+        chunk_size = options['chunk_size']
+
+        # Countries are a small lookup table, so keep the whole thing in memory.
+        self.countries = {name.lower(): pk for pk, name in Country.objects.values_list('id', 'name')}
+        self.seen_emails = set()
+        self.stats = {'rows': 0, 'users': 0, 'addresses': 0, 'duplicates': 0, 'invalid': 0}
+
+        started = time.perf_counter()
+        with path.open(newline='', encoding='utf-8') as handle:
+            rows = self._read_rows(handle, input_format)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                self._import_chunk(chunk)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"  {self.stats['rows']} rows processed, {self.stats['users']} users created "
+                    f"({self.stats['rows'] / elapsed:.0f} rows/s)"
+                )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.stats['users']} users and {self.stats['addresses']} addresses from "
+            f"{self.stats['rows']} rows in {elapsed:.2f}s ({self.stats['rows'] / max(elapsed, 1e-9):.0f} rows/s). "
+            f"Skipped {self.stats['duplicates']} duplicates and {self.stats['invalid']} invalid rows."
+        ))
+
+    def _read_rows(self, handle, input_format):
+        if input_format == 'csv':
+            yield from csv.DictReader(handle)
+            return
+        for line_number, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise CommandError(f"Invalid JSON on line {line_number}: {e}")
+
+    def _build_user(self, row):
+        """Returns an unsaved SiteUser for the row, or None if the row cannot be imported."""
+        # Stored as written (with the domain lowercased, as create_user does); compared case-insensitively.
+        email = SiteUser.objects.normalize_email((row.get('email') or '').strip())
+        if not email:
+            return None
+
+        password = row.get('password') or None
+        if password is None:
+            password = make_password(None)  # Unusable password; the user must reset it
+        else:
+            try:
+                identify_hasher(password)
+            except ValueError:
+                return None
+
+        is_active = row.get('is_active', True)
+        if isinstance(is_active, str):
+            is_active = is_active.strip().lower() in TRUE_VALUES
+
+        date_joined = row.get('date_joined')
+        date_joined = parse_datetime(date_joined) if date_joined else None
+
+        return SiteUser(
+            email=email,
+            username=(row.get('username') or email)[:150],
+            first_name=row.get('first_name') or '',
+            last_name=row.get('last_name') or '',
+            phone_number=row.get('phone_number') or None,
+            password=password,
+            is_active=bool(is_active),
+            date_joined=date_joined or timezone.now(),
+        )
+
+    def _row_addresses(self, row):
+        if isinstance(row.get('addresses'), list):
+            return row['addresses']
+        if row.get('address_line1'):
+            return [row]
+        return []
+
+    def _country_id(self, name):
+        return self.countries.get((name or '').strip().lower())
+
+    def _resolve_countries(self, rows):
+        """Creates any countries referenced in the chunk that do not exist yet."""
+        missing = {}
+        for row in rows:
+            for address in self._row_addresses(row):
+                name = (address.get('country') or '').strip()
+                if name and name.lower() not in self.countries:
+                    missing[name.lower()] = name
+        if missing:
+            created = Country.objects.bulk_create([Country(name=name) for name in missing.values()])
+            self.countries.update({country.name.lower(): country.pk for country in created})
+            # bulk_create does not send post_save, so refresh the shared lookup cache by hand.
+            transaction.on_commit(invalidate_country_cache)
+
+    @transaction.atomic
+    def _import_chunk(self, chunk):
+        self.stats['rows'] += len(chunk)
+
+        candidates = []
+        for row in chunk:
+            user = self._build_user(row)
+            if user is None:
+                self.stats['invalid'] += 1
+                continue
+            if user.email.lower() in self.seen_emails:
+                self.stats['duplicates'] += 1
+                continue
+            self.seen_emails.add(user.email.lower())
+            candidates.append((user, row))
+
+        # One query each to drop rows that clash with accounts already in the database.
+        existing_emails = set(SiteUser.objects.alias(email_lower=Lower('email')).filter(
+            email_lower__in=[user.email.lower() for user, _ in candidates]
+        ).values_list(Lower('email'), flat=True))
+        existing_usernames = set(SiteUser.objects.filter(
+            username__in=[user.username for user, _ in candidates]
+        ).values_list('username', flat=True))
+
+        to_create = []
+        for user, row in candidates:
+            if user.email.lower() in existing_emails or user.username in existing_usernames:
+                self.stats['duplicates'] += 1
+                continue
+            existing_usernames.add(user.username)
+            to_create.append((user, row))
+
+        if not to_create:
+            return
+
+        # bulk_create sets primary keys on the instances, which the addresses need below.
+        SiteUser.objects.bulk_create([user for user, _ in to_create])
+        self.stats['users'] += len(to_create)
+
+        self._resolve_countries(row for _, row in to_create)
+        addresses, links = [], []
+        for user, row in to_create:
+            has_default = False
+            for data in self._row_addresses(row):
+                country_id = self._country_id(data.get('country'))
+                if not country_id or not data.get('address_line1'):
+                    continue
+                address = Address(country_id=country_id, **{
+                    field: data.get(field) or ('' if field in ('address_line1', 'city', 'region', 'postal_code') else None)
+                    for field in ADDRESS_FIELDS
+                })
+                is_default = data.get('is_default', False)
+                if isinstance(is_default, str):
+                    is_default = is_default.strip().lower() in TRUE_VALUES
+                # bulk_create skips UserAddress.save(), so enforce a single default here.
+                is_default = bool(is_default) and not has_default
+                has_default = has_default or is_default
+                addresses.append(address)
+                links.append(UserAddress(user=user, address=address, is_default=is_default))
+
+        if addresses:
+            Address.objects.bulk_create(addresses)
+            # Assign the freshly created PKs before inserting the junction rows.
+            for link in links:
+                link.address_id = link.address.pk
+            UserAddress.objects.bulk_create(links)
+            self.stats['addresses'] += len(addresses)
@@ -64,8 +64,33 @@ class UserAddress(models.Model):
     def save(self, *args, **kwargs):
         # Logic: If setting as default, uncheck is_default for all other addresses of this user
         if self.is_default:
-            UserAddress.objects.filter(user=self.user, is_default=True).update(is_default=False)
+            UserAddress.objects.filter(user_id=self.user_id, is_default=True).update(is_default=False)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.email} - {self.address}"
+
+class EmailOutbox(models.Model):
+    """
+    Transactional outbox for outgoing emails.
+    Rows are written in the same transaction as the change that triggers them
+    and relayed to the mail task in batches, so the request path never talks to the broker.
+    """
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=255)
+    recipient_list = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name_plural = "Email Outbox"
+        indexes = [
+            # The relay only ever scans pending rows in insertion order.
+            models.Index(fields=['id'], condition=models.Q(dispatched_at__isnull=True), name='users_outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipient_list)}"
@@ -1,9 +1,12 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import SiteUser, Address, Country, UserAddress
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.exceptions import AuthenticationFailed
 from cart.models import ShoppingCart, ShoppingCartItem
+from cart.session import CART_SESSION_KEY, get_guest_cart_key
+from .cache import get_countries
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
@@ -22,26 +25,32 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
         # Merge guest cart with user cart
         request = self.context.get('request')
-        if request and request.session.session_key:
-            session_key = request.session.session_key
+        cart_key = get_guest_cart_key(request) if request else None
+        if cart_key:
+            # The guest cart is about to belong to the user, so forget it in the session.
+            request.session.pop(CART_SESSION_KEY, None)
             try:
-                guest_cart = ShoppingCart.objects.get(session_key=session_key, user=None)
+                guest_cart = ShoppingCart.objects.get(session_key=cart_key, user=None)
                 
                 # Check if the user already has a cart
                 try:
                     user_cart = ShoppingCart.objects.get(user=self.user)
-                    # Merge items from guest_cart to user_cart
+                    # Merge items from guest_cart to user_cart with a fixed number of queries:
+                    # overlapping items have their quantities summed, the rest are added.
+                    user_items = {item.product_variation_id: item for item in user_cart.items.all()}
+                    new_items, updated_items = [], []
                     for guest_item in guest_cart.items.all():
-                        user_item, created = ShoppingCartItem.objects.get_or_create(
-                            cart=user_cart,
-                            product_variation=guest_item.product_variation,
-                            defaults={'qty': guest_item.qty}
-                        )
-                        if not created:
+                        user_item = user_items.get(guest_item.product_variation_id)
+                        if user_item is None:
+                            new_items.append(ShoppingCartItem(cart=user_cart, product_variation_id=guest_item.product_variation_id, qty=guest_item.qty))
+                        else:
                             user_item.qty += guest_item.qty
-                            user_item.save()
-                    # Delete the guest cart after merging
-                    guest_cart.delete()
+                            updated_items.append(user_item)
+                    with transaction.atomic():
+                        ShoppingCartItem.objects.bulk_create(new_items)
+                        ShoppingCartItem.objects.bulk_update(updated_items, ['qty'])
+                        # Delete the guest cart after merging
+                        guest_cart.delete()
                 except ShoppingCart.DoesNotExist:
                     # No user cart exists, so just assign the guest cart to the user
                     guest_cart.user = self.user
@@ -71,15 +80,15 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        user = SiteUser.objects.create(
+        user = SiteUser(
             email=validated_data['email'],
             username=validated_data['username'],
             first_name=validated_data['first_name'],
-            last_name=validated_data['last_name']
+            last_name=validated_data['last_name'],
+            is_active=False  # Deactivate account until email confirmation
         )
         user.set_password(validated_data['password'])
-        user.is_active = False  # Deactivate account until email confirmation
-        user.save()
+        user.save()  # Single INSERT instead of create() followed by an UPDATE
         return user
 
 class UserDetailSerializer(serializers.ModelSerializer):
@@ -96,9 +105,44 @@ class CountrySerializer(serializers.ModelSerializer):
         model = Country
         fields = '__all__'
 
+def _context_countries(field):
+    """
+    Returns the cached Country map, checking the cache version once per serializer tree
+    rather than once per rendered address.
+    """
+    context = field.context
+    if '_countries' not in context:
+        context['_countries'] = get_countries()
+    return context['_countries']
+
+class CachedCountryNameField(serializers.Field):
+    """Renders an address' country name from the Country cache instead of a JOIN or lookup query."""
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs.setdefault('source', 'country_id')
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        country = _context_countries(self).get(value)
+        return str(country) if country else None
+
+class CachedCountryField(serializers.PrimaryKeyRelatedField):
+    """Validates a country primary key against the Country cache instead of the database."""
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        country = _context_countries(self).get(pk)
+        if country is None:
+            self.fail('does_not_exist', pk_value=data)
+        return country
+
 class AddressSerializer(serializers.ModelSerializer):
-    country = serializers.StringRelatedField(read_only=True)
-    country_id = serializers.PrimaryKeyRelatedField(queryset=Country.objects.all(), source='country', write_only=True)
+    country = CachedCountryNameField()
+    country_id = CachedCountryField(queryset=Country.objects.all(), source='country', write_only=True)
 
     class Meta:
         model = Address
@@ -124,8 +168,10 @@ class UserAddressSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         address_data = validated_data.pop('address', None)
         if address_data:
-            # Update the nested Address instance
-            Address.objects.filter(id=instance.address.id).update(**address_data)
+            # Update the nested Address instance in place so the response reflects the new values
+            for attr, value in address_data.items():
+                setattr(instance.address, attr, value)
+            instance.address.save(update_fields=list(address_data))
         
         # Update the UserAddress instance
         instance.is_default = validated_data.get('is_default', instance.is_default)
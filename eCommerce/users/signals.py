@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import invalidate_country_cache
+from .models import Country
+
+@receiver([post_save, post_delete], sender=Country)
+def invalidate_countries_on_change(sender, **kwargs):
+    """Keeps the process-local Country cache in sync with the table."""
+    # Invalidate now for this process, and again after commit so other
+    # processes cannot reload the old rows in between.
+    invalidate_country_cache()
+    transaction.on_commit(invalidate_country_cache)
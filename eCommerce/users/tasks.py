@@ -1,6 +1,11 @@
 from celery import shared_task
+from django.conf import settings
 from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+from kombu.exceptions import OperationalError
 from smtplib import SMTPException
+from .models import EmailOutbox
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)  # Retry every 60 seconds
 def send_confirmation_email_task(self, subject, message, from_email, recipient_list):
@@ -14,3 +19,54 @@ def send_confirmation_email_task(self, subject, message, from_email, recipient_l
         # The 'self.retry' method will re-run the task.
         # The 'exc' argument logs the exception for debugging.
         self.retry(exc=exc)
+
+@shared_task
+def relay_email_outbox(batch_size=None):
+    """
+    Drains pending EmailOutbox rows in batches and publishes each one to the mail task.
+    Runs on Celery beat. Rows that cannot be published (e.g. the broker is down)
+    stay pending and are picked up again on the next run.
+    Returns the number of emails handed to the broker.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    relayed = 0
+
+    while True:
+        with transaction.atomic():
+            # skip_locked lets several relays run side by side without double-sending.
+            batch = list(
+                EmailOutbox.objects.select_for_update(skip_locked=True)
+                .filter(dispatched_at__isnull=True)
+                .order_by('id')[:batch_size]
+            )
+            if not batch:
+                break
+
+            broker_down = False
+            processed = []
+            for entry in batch:
+                entry.attempts += 1
+                try:
+                    send_confirmation_email_task.delay(
+                        entry.subject,
+                        entry.message,
+                        entry.from_email,
+                        entry.recipient_list
+                    )
+                except OperationalError as exc:
+                    # No point hammering a broker that is down; retry the rest next run.
+                    entry.last_error = str(exc)
+                    processed.append(entry)
+                    broker_down = True
+                    break
+                entry.dispatched_at = timezone.now()
+                entry.last_error = ''
+                processed.append(entry)
+                relayed += 1
+
+            EmailOutbox.objects.bulk_update(processed, ['dispatched_at', 'attempts', 'last_error'])
+
+        if broker_down or len(batch) < batch_size:
+            break
+
+    return relayed
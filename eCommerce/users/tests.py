@@ -6,10 +6,28 @@ from django.core import mail
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
-
-from .models import SiteUser, Address, Country, UserAddress
+from unittest.mock import patch
+from kombu.exceptions import OperationalError
+from django.core.management import call_command
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.contenttypes.models import ContentType
+from io import StringIO
+from importlib import import_module
+import os
+import tempfile
+import time
+
+from .cache import COUNTRY_CACHE_VERSION_KEY, LOCAL_CACHE_TIMEOUT, get_countries
+from .models import SiteUser, Address, Country, UserAddress, EmailOutbox
+from .tasks import relay_email_outbox
 from product.models import Product, ProductCategory, Brand, Colour, SizeOption, ProductItem, ProductVariation
 from cart.models import ShoppingCart, ShoppingCartItem
+from cart.session import CART_SESSION_KEY
+from perf.testing import QueryBudgetMixin
 
 # Use a consistent set of test data
 TEST_USER_DATA = {
@@ -79,7 +97,15 @@ class AuthFlowAPITests(APITestCase):
         user = SiteUser.objects.get(email=TEST_USER_DATA['email'])
         self.assertFalse(user.is_active, "User should be inactive until email is confirmed.")
 
-        # 2. Email Confirmation
+        # 2. The email is queued in the outbox, not sent inline
+        self.assertEqual(len(mail.outbox), 0, "Registration should not talk to the broker.")
+        self.assertEqual(EmailOutbox.objects.filter(dispatched_at__isnull=True).count(), 1)
+
+        # 3. The relay publishes it to the mail task
+        self.assertEqual(relay_email_outbox(), 1)
+        self.assertFalse(EmailOutbox.objects.filter(dispatched_at__isnull=True).exists())
+
+        # 4. Email Confirmation
         self.assertEqual(len(mail.outbox), 1, "An email should be sent.")
         email = mail.outbox[0]
         self.assertEqual(email.to, [TEST_USER_DATA['email']])
@@ -143,6 +169,94 @@ class AuthFlowAPITests(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+class EmailOutboxRelayTests(TestCase):
+    """
+    Tests for the email outbox relay task.
+    """
+    def _queue(self, count):
+        EmailOutbox.objects.bulk_create([
+            EmailOutbox(subject=f'Subject {i}', message='Body', from_email='noreply@example.com', recipient_list=[f'user{i}@example.com'])
+            for i in range(count)
+        ])
+
+    def test_relay_drains_outbox_in_batches(self):
+        """All pending rows are relayed, even when they span several batches."""
+        self._queue(5)
+        self.assertEqual(relay_email_outbox(batch_size=2), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(EmailOutbox.objects.filter(dispatched_at__isnull=True).exists())
+
+        # A second run has nothing left to do
+        self.assertEqual(relay_email_outbox(), 0)
+        self.assertEqual(len(mail.outbox), 5)
+
+    @patch('users.tasks.send_confirmation_email_task.delay', side_effect=OperationalError('broker unreachable'))
+    def test_relay_keeps_rows_pending_when_broker_is_down(self, mock_delay):
+        """A broker outage leaves the email in the outbox for the next run."""
+        self._queue(3)
+        self.assertEqual(relay_email_outbox(), 0)
+        self.assertEqual(mock_delay.call_count, 1, "The relay should stop at the first publish failure.")
+
+        pending = EmailOutbox.objects.filter(dispatched_at__isnull=True)
+        self.assertEqual(pending.count(), 3)
+        first = pending.order_by('id').first()
+        self.assertEqual(first.attempts, 1)
+        self.assertIn('broker unreachable', first.last_error)
+
+class ImportUsersCommandTests(TestCase):
+    """
+    Tests for the `import_users` bulk import management command.
+    """
+    def _write(self, suffix, content):
+        handle = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8')
+        handle.write(content)
+        handle.close()
+        self.addCleanup(os.remove, handle.name)
+        return handle.name
+
+    def test_import_csv_preserves_password_hashes_and_dedupes(self):
+        """Hashed passwords are stored as-is and duplicate emails, in any case, are skipped."""
+        SiteUser.objects.create_user(email='Existing@example.com', username='existing', password='pw')
+        password_hash = make_password('LegacyPassword1!')
+        path = self._write('.csv', (
+            'email,username,first_name,last_name,password,address_line1,city,region,postal_code,country,is_default\n'
+            f'alice@example.com,alice,Alice,A,{password_hash},1 Main St,Harare,Harare,0000,Zimbabwe,true\n'
+            f'ALICE@example.com,alice2,Alice,A,{password_hash},,,,,,\n'
+            f'existing@example.com,existing2,Ex,Isting,{password_hash},,,,,,\n'
+            'bob@example.com,bob,Bob,B,not-a-hash,,,,,,\n'
+            f'Dave.Smith@Example.COM,dave,Dave,S,{password_hash},,,,,,\n'
+        ))
+        out = StringIO()
+        call_command('import_users', path, chunk_size=2, stdout=out)
+
+        alice = SiteUser.objects.get(email='alice@example.com')
+        self.assertEqual(alice.password, password_hash)
+        self.assertTrue(alice.check_password('LegacyPassword1!'))
+        self.assertEqual(SiteUser.objects.count(), 3, "Duplicates and invalid hashes should be skipped.")
+        # Emails keep their case; only the domain is lowercased, as create_user does.
+        self.assertTrue(SiteUser.objects.filter(email='Dave.Smith@example.com').exists())
+        self.assertFalse(SiteUser.objects.filter(email='bob@example.com').exists())
+
+        user_address = UserAddress.objects.select_related('address__country').get(user=alice)
+        self.assertTrue(user_address.is_default)
+        self.assertEqual(user_address.address.country.name, 'Zimbabwe')
+        self.assertIn('rows/s', out.getvalue())
+
+    def test_import_jsonl_with_address_list(self):
+        """JSONL rows may carry a list of addresses; only one can be the default."""
+        path = self._write('.jsonl', (
+            '{"email": "carol@example.com", "first_name": "Carol", "addresses": ['
+            '{"address_line1": "1 A St", "city": "X", "region": "Y", "postal_code": "1", "country": "Kenya", "is_default": true},'
+            '{"address_line1": "2 B St", "city": "X", "region": "Y", "postal_code": "2", "country": "Kenya", "is_default": true}]}\n'
+        ))
+        call_command('import_users', path, stdout=StringIO())
+
+        carol = SiteUser.objects.get(email='carol@example.com')
+        self.assertFalse(carol.has_usable_password())
+        self.assertEqual(carol.user_addresses.count(), 2)
+        self.assertEqual(carol.user_addresses.filter(is_default=True).count(), 1)
+        self.assertEqual(Country.objects.filter(name='Kenya').count(), 1)
+
 class CartMergingTests(APITestCase):
     """
     Tests for the cart merging logic upon user login.
@@ -223,6 +337,29 @@ class CartMergingTests(APITestCase):
         self.assertEqual(item_s.qty, 3, "Quantities of overlapping item should be summed (1 + 2).")
         self.assertEqual(item_m.qty, 3, "New item should be added with its quantity.")
 
+    def test_merge_query_count_does_not_grow_with_cart_size(self):
+        """
+        Merging runs a fixed number of queries however many items the guest cart holds
+        (a per-item query would be flagged as an N+1 by the SQL instrumentation).
+        """
+        product_item = self.variation_s.product_item
+        sizes = [SizeOption.objects.create(size_name=f'X{i}') for i in range(8)]
+        variations = [ProductVariation.objects.create(product_item=product_item, size=size, qty_in_stock=20) for size in sizes]
+        user_cart = ShoppingCart.objects.create(user=self.user)
+        ShoppingCartItem.objects.create(cart=user_cart, product_variation=variations[0], qty=1)
+
+        guest_client = APIClient()
+        for variation in variations:
+            guest_client.post(self.cart_url, {'product_variation': variation.id, 'qty': 1}, format='json')
+
+        login_data = {'email': self.user.email, 'password': TEST_USER_DATA['password']}
+        response = guest_client.post(self.login_url, login_data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(user_cart.items.count(), 8)
+        self.assertEqual(user_cart.items.get(product_variation=variations[0]).qty, 2)
+        self.assertFalse(ShoppingCart.objects.filter(user=None).exists())
+
     def test_login_with_no_guest_cart(self):
         """
         Test that logging in without a guest cart does not create a cart or cause errors.
@@ -304,6 +441,65 @@ class UserProfileAPITests(APITestCase):
         self.assertEqual(len(response.data['results']), 1)
         self.assertEqual(response.data['results'][0]['address']['city'], 'Anytown')
 
+    def test_address_list_query_count_is_constant(self):
+        """Listing addresses must not issue a query per address or per country."""
+        url = reverse('user-address-list')
+        countries = [Country.objects.create(name=f'Country {i}') for i in range(3)]
+
+        def add_addresses(count):
+            for i in range(count):
+                address = Address.objects.create(address_line1=f'{i} Loop Rd', city='Anytown', region='R', postal_code='1', country=countries[i % 3])
+                UserAddress.objects.create(user=self.user, address=address)
+
+        add_addresses(1)
+        self.client.get(url)  # Warm the Country cache
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+
+        add_addresses(6)
+        with self.assertNumQueries(len(small)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 7)
+        self.assertEqual({a['address']['country'] for a in response.data['results']}, {c.name for c in countries})
+
+    def test_address_write_validates_country_from_cache(self):
+        """Unknown countries are rejected and new countries are picked up after they are created."""
+        url = reverse('user-address-list')
+        payload = {'address': {'address_line1': '1 Main St', 'city': 'A', 'region': 'B', 'postal_code': '1', 'country_id': 999999}}
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        country = Country.objects.create(name='Newland')
+        payload['address']['country_id'] = country.id
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['address']['country'], 'Newland')
+
+        # Updating the address returns the new values
+        detail_url = reverse('user-address-detail', kwargs={'pk': response.data['id']})
+        response = self.client.patch(detail_url, {'address': {'city': 'Elsewhere'}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['address']['city'], 'Elsewhere')
+
+    def test_country_cache_reloads_after_the_version_is_evicted(self):
+        """A version key evicted and added again does not match the one this process loaded."""
+        country = Country.objects.create(name='Atlantis')
+        get_countries()
+        # Another process renames it and replaces the version, which is then evicted.
+        Country.objects.filter(pk=country.pk).update(name='Lemuria')
+        cache.set(COUNTRY_CACHE_VERSION_KEY, 'from-another-process')
+        cache.delete(COUNTRY_CACHE_VERSION_KEY)
+        self.assertEqual(get_countries()[country.pk].name, 'Lemuria')
+
+    def test_country_cache_expires_with_a_process_local_cache(self):
+        """The locmem cache is not shared, so other processes' changes show up after a timeout."""
+        country = Country.objects.create(name='Atlantis')
+        get_countries()
+        Country.objects.filter(pk=country.pk).update(name='Lemuria')
+        self.assertEqual(get_countries()[country.pk].name, 'Atlantis')
+        with patch('users.cache.time.monotonic', return_value=time.monotonic() + LOCAL_CACHE_TIMEOUT):
+            self.assertEqual(get_countries()[country.pk].name, 'Lemuria')
+
     def test_unauthenticated_access_fails(self):
         """Ensure unauthenticated users cannot access protected profile endpoints."""
         # Clear authentication credentials
@@ -314,3 +510,76 @@ class UserProfileAPITests(APITestCase):
 
         self.assertEqual(self.client.get(detail_url).status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertEqual(self.client.get(address_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+class UserQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """
+    UserAddressViewSet actions and login (with its cart merge) run a fixed number of
+    queries however many addresses or cart items there are.
+    """
+    def setUp(self):
+        self.user = SiteUser.objects.create_user(**TEST_USER_DATA, is_active=True)
+        self.countries = [Country.objects.create(name=f'Country {index}') for index in range(3)]
+        get_countries()  # Warm the Country cache so both runs find it loaded
+
+    def populate_addresses(self, size):
+        """Gives the user `size` addresses across three countries and returns the first one."""
+        addresses = Address.objects.bulk_create(
+            Address(address_line1=f'{index} Loop Rd', city='Anytown', region='R', postal_code='1', country=self.countries[index % 3])
+            for index in range(size)
+        )
+        user_addresses = UserAddress.objects.bulk_create(UserAddress(user=self.user, address=address) for address in addresses)
+        return user_addresses[0]
+
+    def test_address_actions(self):
+        self.client.force_authenticate(user=self.user)
+        list_url = reverse('user-address-list')
+        new_address = {'address': {'address_line1': '1 Main St', 'city': 'A', 'region': 'B', 'postal_code': '1', 'country_id': self.countries[0].id}}
+        detail_url = lambda user_address: reverse('user-address-detail', kwargs={'pk': user_address.id})
+
+        for action, budget, request, status_code in [
+            ('list', 2, lambda _: self.client.get(list_url), 200),
+            ('retrieve', 1, lambda user_address: self.client.get(detail_url(user_address)), 200),
+            ('create', 2, lambda _: self.client.post(list_url, new_address, format='json'), 201),
+            ('partial_update', 3, lambda user_address: self.client.patch(detail_url(user_address), {'address': {'city': 'Elsewhere'}}, format='json'), 200),
+            ('destroy', 2, lambda user_address: self.client.delete(detail_url(user_address)), 204),
+        ]:
+            with self.subTest(action=action):
+                self.assertQueryBudget(budget, self.populate_addresses, request, status_code=status_code)
+
+    def test_login_merging_guest_cart(self):
+        """Half of the guest items are already in the user's cart."""
+        category = ProductCategory.objects.create(name='Apparel')
+        product = Product.objects.create(name='Test Polo', category=category, brand=Brand.objects.create(name='TestBrand'))
+        product_item = ProductItem.objects.create(product=product, colour=Colour.objects.create(colour_name='Blue'), sku_base='TEST-POLO-BLUE', original_price=50.00)
+        login_data = {'email': self.user.email, 'password': TEST_USER_DATA['password']}
+
+        def populate_carts(size):
+            sizes = SizeOption.objects.bulk_create(SizeOption(size_name=f'S{index}') for index in range(size))
+            variations = ProductVariation.objects.bulk_create(ProductVariation(product_item=product_item, size=option, qty_in_stock=20) for option in sizes)
+            user_cart = ShoppingCart.objects.create(user=self.user)
+            guest_cart = ShoppingCart.objects.create(session_key='guest-cart-key')
+            ShoppingCartItem.objects.bulk_create(ShoppingCartItem(cart=user_cart, product_variation=variation, qty=1) for variation in variations[::2])
+            ShoppingCartItem.objects.bulk_create(ShoppingCartItem(cart=guest_cart, product_variation=variation, qty=1) for variation in variations)
+            session = import_module(settings.SESSION_ENGINE).SessionStore()
+            session[CART_SESSION_KEY] = 'guest-cart-key'
+            session.save()
+            self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+        self.assertQueryBudget(17, populate_carts, lambda _: self.client.post(reverse('token_obtain_pair'), login_data, format='json'))
+
+    def test_admin_pages(self):
+        """User and address admin changelists run a fixed number of queries."""
+        self.client.force_login(SiteUser.objects.create_superuser(email='admin@example.com', username='admin', password='pw'))
+        ContentType.objects.get_for_models(SiteUser, Address, UserAddress)  # Cached for both runs
+
+        def populate_users(size):
+            self.populate_addresses(size)
+            SiteUser.objects.bulk_create(SiteUser(email=f'shopper{index}@example.com', username=f'shopper{index}') for index in range(size))
+
+        for page, budget, url in [
+            ('user changelist', 4, reverse('admin:users_siteuser_changelist')),
+            ('address changelist', 4, reverse('admin:users_address_changelist')),
+            ('user address changelist', 4, reverse('admin:users_useraddress_changelist')),
+        ]:
+            with self.subTest(page=page):
+                self.assertQueryBudget(budget, populate_users, lambda _: self.client.get(url))
@@ -7,8 +7,7 @@ from .serializers import (
     UserAddressSerializer,
     CustomTokenObtainPairSerializer
 )
-from .models import SiteUser, UserAddress
-from .tasks import send_confirmation_email_task  # Import the Celery task
+from .models import SiteUser, UserAddress, EmailOutbox
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.conf import settings
@@ -16,12 +15,15 @@ from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from eCommerce.throttling import LoginRateThrottle, RegistrationRateThrottle
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     """
     Custom token view that uses the custom serializer to check for active users and merge carts.
     """
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [LoginRateThrottle]
 
     def post(self, request, *args, **kwargs):
         # Pass context to the serializer
@@ -32,12 +34,16 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 class UserRegistrationView(generics.CreateAPIView):
     """
     API view for user registration.
-    Creates an inactive user and sends a confirmation email via a background task.
+    Creates an inactive user and queues a confirmation email in the outbox.
+    The email is published to Celery by the `relay_email_outbox` beat task,
+    so registration never waits on (or fails because of) the broker.
     """
     queryset = SiteUser.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [RegistrationRateThrottle]
 
+    @transaction.atomic
     def perform_create(self, serializer):
         user = serializer.save()
         # Generate token and confirmation link
@@ -52,12 +58,12 @@ class UserRegistrationView(generics.CreateAPIView):
         subject = 'Activate Your E-Commerce Account'
         message = f'Hi {user.first_name},\n\nPlease click the link below to confirm your email address and activate your account:\n{confirm_link}'
         
-        # --- Send email asynchronously ---
-        send_confirmation_email_task.delay(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email]
+        # --- Queue the email in the same transaction as the user ---
+        EmailOutbox.objects.create(
+            subject=subject,
+            message=message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[user.email]
         )
 
 class EmailConfirmationView(views.APIView):
@@ -123,7 +129,8 @@ class UserAddressViewSet(viewsets.ModelViewSet):
         if getattr(self, 'swagger_fake_view', False):
             return UserAddress.objects.none()
             
-        return UserAddress.objects.filter(user=self.request.user).order_by('-is_default')
+        # The address is joined in; its country is rendered from the in-process Country cache.
+        return UserAddress.objects.filter(user=self.request.user).select_related('address').order_by('-is_default', 'id')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)